@@ -0,0 +1,205 @@
+"""Backups of the originals ConvertTab's replace mode overwrites, for VidoEdit.
+
+A byte copy of every source before it is replaced would double the I/O of a
+batch. backup() keeps the original in a ".vidoedit-backup" folder next to
+it, using the cheapest way the filesystem offers:
+
+- a reflink (FICLONE) on btrfs, XFS and other copy-on-write filesystems:
+  instant, and no space is used until the blocks diverge,
+- a hard link elsewhere: also instant, and safe because replacing always
+  renames the new file over the old name, so the old inode stays with the
+  backup,
+- copy_file_range() where links aren't possible (server-side copies on
+  NFS/SMB, in-kernel copies otherwise),
+- a streamed copy as the last resort.
+
+Backups sit on the same filesystem as their original, so restore() is a
+rename. ~/.vidoedit/backups.json lists them, oldest first. prune() drops
+the ones older than the configured number of days, then the oldest while
+they take more than the configured size.
+"""
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+INDEX_FILE = Path.home() / ".vidoedit" / "backups.json"
+FOLDER = ".vidoedit-backup"
+
+DEFAULT_KEEP_DAYS = 7
+COPY_BUFFER = 8 * 1024 * 1024
+# ioctl number of FICLONE (linux/fs.h)
+FICLONE = 0x40049409
+
+REFLINK, HARDLINK, COPY_RANGE, COPY = "reflink", "hardlink", "copy_file_range", "copy"
+
+_lock = threading.Lock()
+
+
+class BackupError(OSError):
+    """The original couldn't be backed up, so it must not be replaced"""
+
+
+class Backup(NamedTuple):
+    original: str
+    path: str
+    size: int
+    created: float
+    method: str
+
+
+def _reflink(src: str, dst: str) -> None:
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks not supported")
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+
+
+def _copy_range(src: str, dst: str) -> None:
+    if not hasattr(os, "copy_file_range"):
+        raise OSError(errno.EOPNOTSUPP, "copy_file_range not supported")
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        remaining = os.fstat(fin.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fin.fileno(), fout.fileno(), min(remaining, 1 << 30))
+            if copied == 0:
+                raise OSError(errno.EIO, "copy_file_range stopped early")
+            remaining -= copied
+
+
+def _stream(src: str, dst: str) -> None:
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        shutil.copyfileobj(fin, fout, COPY_BUFFER)
+
+
+def clone(src: str, dst: str) -> str:
+    """Copy src to dst the cheapest way possible; returns the method used"""
+    for method, copy in ((REFLINK, _reflink), (HARDLINK, os.link),
+                         (COPY_RANGE, _copy_range), (COPY, _stream)):
+        try:
+            copy(src, dst)
+        except OSError:
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+            if method == COPY:
+                raise
+            continue
+        if method != HARDLINK:
+            shutil.copystat(src, dst)
+        return method
+    raise AssertionError("unreachable")
+
+
+def _load() -> List[Backup]:
+    try:
+        with open(INDEX_FILE, "r", encoding="utf-8") as f:
+            return [Backup(*entry) for entry in json.load(f)]
+    except Exception:
+        return []
+
+
+def _store(entries: List[Backup]) -> None:
+    try:
+        INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = INDEX_FILE.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump([list(entry) for entry in entries], f, indent=2)
+        os.replace(tmp, INDEX_FILE)
+    except OSError:
+        pass
+
+
+def backup(original: str) -> Backup:
+    """Keep a copy of original before it is replaced; raises BackupError when that fails"""
+    original = os.path.abspath(original)
+    folder = os.path.join(os.path.dirname(original), FOLDER)
+    stem, ext = os.path.splitext(os.path.basename(original))
+    path = os.path.join(folder, f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}{ext}")
+    n = 1
+    while os.path.exists(path):
+        path = os.path.join(folder, f"{stem}.{time.strftime('%Y%m%d-%H%M%S')}-{n}{ext}")
+        n += 1
+    try:
+        os.makedirs(folder, exist_ok=True)
+        method = clone(original, path)
+        entry = Backup(original, path, os.path.getsize(path), time.time(), method)
+    except OSError as e:
+        raise BackupError(f"backup of {os.path.basename(original)} failed: {e.strerror or e}")
+    with _lock:
+        _store(_load() + [entry])
+    return entry
+
+
+def entries(original: Optional[str] = None) -> List[Backup]:
+    """Recorded backups (of original, if given) that still exist, oldest first"""
+    with _lock:
+        found = [b for b in _load() if os.path.exists(b.path)]
+    if original is not None:
+        found = [b for b in found if b.original == os.path.abspath(original)]
+    return found
+
+
+def _drop(backup: Backup) -> None:
+    with _lock:
+        _store([b for b in _load() if b.path != backup.path])
+    try:
+        os.rmdir(os.path.dirname(backup.path))
+    except OSError:
+        pass
+
+
+def restore(original: str) -> Optional[Backup]:
+    """Put the latest backup of original back in place; None when there is none"""
+    found = entries(original)
+    if not found:
+        return None
+    latest = found[-1]
+    try:
+        os.replace(latest.path, latest.original)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # The folder was moved to another filesystem since: copy next to it, then rename
+        part = latest.original + ".part"
+        clone(latest.path, part)
+        os.replace(part, latest.original)
+        os.remove(latest.path)
+    _drop(latest)
+    return latest
+
+
+def prune(keep_days: Optional[float] = DEFAULT_KEEP_DAYS, keep_mb: Optional[int] = None) -> List[Backup]:
+    """Remove backups older than keep_days, then the oldest while all take more than keep_mb"""
+    found = entries()
+    removed = []
+    cutoff = time.time() - keep_days * 86400 if keep_days else None
+    total = sum(b.size for b in found)
+    for entry in found:
+        too_old = cutoff is not None and entry.created < cutoff
+        too_big = keep_mb is not None and total > keep_mb * 1024 * 1024
+        if not (too_old or too_big):
+            continue
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            continue
+        total -= entry.size
+        removed.append(entry)
+        _drop(entry)
+    with _lock:
+        # Forget entries whose files were deleted by hand
+        _store([b for b in _load() if os.path.exists(b.path)])
+    return removed
@@ -0,0 +1,195 @@
+"""CPU core partitioning for concurrent encodes in VidoEdit.
+
+Every libx265/libx264 process sizes its thread pools for the whole
+machine. With several running at once they fight over the same cores and,
+on multi-socket hosts, over memory of the wrong NUMA node. CoreAllocator
+splits the usable cores into disjoint sets, one per running job, taken from
+a single NUMA node where the set fits. The job is pinned to its set and
+told its size (-threads, x265 pools), so its pools match the cores it
+actually gets.
+
+The share of each set follows the concurrency target. When the target
+changes, rebalance() re-partitions the cores and re-pins the running jobs,
+so the sets stay disjoint; their thread pools keep the size they started
+with.
+
+Linux only; elsewhere allocate() returns None and jobs run unpinned.
+"""
+import glob
+import os
+import threading
+from typing import Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Tuple
+
+NODE_GLOB = "/sys/devices/system/node/node[0-9]*"
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """CPUs of a sysfs cpulist like "0-3,8-11" """
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus) -> str:
+    """Inverse of parse_cpulist, for taskset -c"""
+    ordered = sorted(cpus)
+    ranges = []
+    start = prev = None
+    for cpu in ordered:
+        if start is None:
+            start = prev = cpu
+        elif cpu == prev + 1:
+            prev = cpu
+        else:
+            ranges.append((start, prev))
+            start = prev = cpu
+    if start is not None:
+        ranges.append((start, prev))
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+
+def usable_cpus() -> Optional[FrozenSet[int]]:
+    """CPUs this process may run on, None where affinity isn't supported"""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    try:
+        return frozenset(os.sched_getaffinity(0))
+    except OSError:
+        return None
+
+
+def numa_nodes(cpus: FrozenSet[int]) -> List[FrozenSet[int]]:
+    """The usable CPUs grouped by NUMA node; one group when the topology is unknown"""
+    nodes = []
+    for path in sorted(glob.glob(NODE_GLOB), key=lambda p: int(p.rsplit("node", 1)[1])):
+        try:
+            with open(os.path.join(path, "cpulist"), "r") as f:
+                node = frozenset(parse_cpulist(f.read())) & cpus
+        except (OSError, ValueError):
+            continue
+        nodes.append(node)
+    covered = frozenset().union(*nodes) if nodes else frozenset()
+    if not nodes or covered != cpus:
+        return [cpus]
+    return nodes
+
+
+def pin_process(pid: int, cpus: FrozenSet[int]) -> None:
+    """Pin every thread of pid; threads started later inherit it from their creator"""
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        tids = [int(t) for t in os.listdir(f"/proc/{pid}/task")]
+    except OSError:
+        tids = [pid]
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except OSError:
+            pass
+
+
+class CoreSet(NamedTuple):
+    """Cores of one job and how many of them sit on each NUMA node"""
+    cpus: FrozenSet[int]
+    per_node: Tuple[int, ...]
+
+    @property
+    def count(self) -> int:
+        return len(self.cpus)
+
+
+def x265_pools(cores: CoreSet) -> str:
+    """x265 pools value: a thread count per NUMA node, "-" for nodes not used"""
+    return ",".join(str(n) if n else "-" for n in cores.per_node)
+
+
+def encoder_args(encoder: str, cores: Optional[CoreSet]) -> List[str]:
+    """-threads for a software encoder running on cores (hardware encoders: nothing)"""
+    if cores is None or not encoder.startswith("lib"):
+        return []
+    return ["-threads", str(cores.count)]
+
+
+def x265_params(encoder: str, cores: Optional[CoreSet]) -> Optional[str]:
+    """x265-params entry matching cores, to be joined with any other x265 params"""
+    if cores is None or encoder != "libx265":
+        return None
+    return f"pools={x265_pools(cores)}"
+
+
+class CoreAllocator:
+    """Hands out disjoint core sets to running jobs"""
+
+    def __init__(self, cpus: Optional[FrozenSet[int]] = None):
+        self.cpus = cpus if cpus is not None else usable_cpus()
+        self.nodes = numa_nodes(self.cpus) if self.cpus else []
+        self._usage: Dict[int, int] = {cpu: 0 for cpu in (self.cpus or ())}
+        self._jobs: Dict[Hashable, CoreSet] = {}
+        self._pids: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def _take(self, share: int) -> CoreSet:
+        order = lambda cpu: (self._usage[cpu], cpu)  # noqa: E731
+        fitting = [n for n in self.nodes if len(n) >= share]
+        if fitting:
+            # The node with the least used free cores, then the least loaded one,
+            # so jobs spread over the nodes and their memory bandwidth
+            node = min(fitting, key=lambda n: (sum(sorted(self._usage[c] for c in n)[:share]),
+                                                sum(self._usage[c] for c in n),
+                                                self.nodes.index(n)))
+            chosen = sorted(node, key=order)[:share]
+        else:
+            chosen = sorted(self.cpus, key=order)[:share]
+        for cpu in chosen:
+            self._usage[cpu] += 1
+        cpus = frozenset(chosen)
+        return CoreSet(cpus, tuple(len(n & cpus) for n in self.nodes))
+
+    def allocate(self, job: Hashable, slots: int) -> Optional[CoreSet]:
+        """Cores for job when slots jobs share the machine; None = leave unpinned"""
+        if not self.cpus or slots <= 1 or len(self.cpus) < 2:
+            return None
+        share = max(1, len(self.cpus) // slots)
+        with self._lock:
+            cores = self._jobs[job] = self._take(share)
+            return cores
+
+    def attach(self, job: Hashable, pid: int) -> None:
+        """The process to re-pin when job's cores change (call again for each process a job runs)"""
+        with self._lock:
+            if job in self._jobs:
+                self._pids[job] = pid
+
+    def rebalance(self, slots: int) -> None:
+        """Re-partition the cores of the running jobs for a new target of slots jobs"""
+        if not self.cpus or slots <= 1 or len(self.cpus) < 2:
+            return  # the running sets are disjoint already, and never larger than the machine
+        share = max(1, len(self.cpus) // slots)
+        with self._lock:
+            if all(cores.count == share for cores in self._jobs.values()):
+                return
+            self._usage = {cpu: 0 for cpu in self.cpus}
+            moved = []
+            for job in list(self._jobs):
+                cores = self._take(share)
+                if cores.cpus != self._jobs[job].cpus and job in self._pids:
+                    moved.append((self._pids[job], cores.cpus))
+                self._jobs[job] = cores
+        for pid, cpus in moved:
+            pin_process(pid, cpus)
+
+    def release(self, job: Hashable) -> None:
+        with self._lock:
+            cores = self._jobs.pop(job, None)
+            self._pids.pop(job, None)
+            if cores is not None:
+                for cpu in cores.cpus:
+                    self._usage[cpu] -= 1
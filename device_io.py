@@ -0,0 +1,270 @@
+"""Per-device I/O limits for concurrent encodes in VidoEdit.
+
+Several ffmpeg processes reading the same spinning disk or NAS share make
+its head (or the link) seek between them, and all of them slow down while
+the CPUs sit idle. DeviceLimiter resolves the files a job reads and writes
+to their backing device (st_dev, shown by mount point) and caps how many
+running jobs read from and write to each one: two on hard disks and network
+shares by default, no cap on SSDs. The JobScheduler starts queued files on
+idle devices first, so a batch spread over several disks interleaves across
+them instead of queueing behind one.
+
+The bytes each job reads and writes are sampled from /proc/<pid>/io and
+summed per device, giving the read/write throughput of every device in use.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from memory_admission import job_label
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Concurrent readers (and, separately, writers) per device when not configured
+DEFAULT_SLOW_DEVICE_JOBS = 2
+# Linux filesystem types whose reads go over the network
+NETWORK_FS = {
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "ncpfs", "afs", "9p", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.rclone", "fuse.s3fs", "davfs", "fuse.davfs2",
+}
+# Seconds between throughput log lines
+REPORT_SECONDS = 30.0
+
+HDD, SSD, NETWORK, UNKNOWN = "hdd", "ssd", "network", "unknown"
+
+
+def mounts() -> List[tuple]:
+    """(mount point, fs type) from /proc/self/mounts, longest mount points first"""
+    try:
+        with open("/proc/self/mounts", "r") as f:
+            entries = [line.split()[1:3] for line in f if len(line.split()) >= 3]
+    except OSError:
+        return []
+    decoded = [(point.replace("\\040", " "), fstype) for point, fstype in entries]
+    return sorted(decoded, key=lambda e: len(e[0]), reverse=True)
+
+
+def mount_of(path: str, mount_table: Optional[List[tuple]] = None) -> Optional[tuple]:
+    """(mount point, fs type) holding path, None when unknown"""
+    mount_table = mounts() if mount_table is None else mount_table
+    real = os.path.realpath(path)
+    for point, fstype in mount_table:
+        if real == point or real.startswith(point.rstrip("/") + "/"):
+            return point, fstype
+    return None
+
+
+def _rotational(dev: int) -> Optional[bool]:
+    """Whether the block device behind dev spins; None when sysfs doesn't say"""
+    base = os.path.realpath(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    # Partitions have no queue/ of their own, their disk is the parent folder
+    for folder in (base, os.path.dirname(base)):
+        try:
+            with open(os.path.join(folder, "queue", "rotational"), "r") as f:
+                return f.read().strip() == "1"
+        except OSError:
+            continue
+    return None
+
+
+class Device(NamedTuple):
+    dev: int
+    mount: str
+    kind: str
+
+
+def device_of(path: str, mount_table: Optional[List[tuple]] = None) -> Optional[Device]:
+    """The device backing path (or its folder while the file doesn't exist yet)"""
+    try:
+        dev = os.stat(path if os.path.exists(path) else os.path.dirname(path) or ".").st_dev
+    except OSError:
+        return None
+    if os.name == "nt":
+        drive = os.path.splitdrive(os.path.abspath(path))[0]
+        return Device(dev, drive, NETWORK if path.startswith("\\\\") else UNKNOWN)
+    mount = mount_of(path, mount_table)
+    point = mount[0] if mount else os.path.dirname(os.path.abspath(path))
+    if mount and mount[1] in NETWORK_FS:
+        kind = NETWORK
+    else:
+        rotational = _rotational(dev)
+        kind = UNKNOWN if rotational is None else (HDD if rotational else SSD)
+    return Device(dev, point, kind)
+
+
+def io_bytes(pid: int) -> Optional[Tuple[int, int]]:
+    """(bytes read, bytes written) by a process so far, None when it can't be read.
+
+    Counts what the process asked for (rchar/wchar), so reads from network
+    shares and the page cache are included.
+    """
+    try:
+        with open(f"/proc/{pid}/io", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    if psutil is not None:
+        try:
+            counters = psutil.Process(pid).io_counters()
+            return counters.read_bytes, counters.write_bytes
+        except (psutil.Error, AttributeError):
+            return None
+    return None
+
+
+class _Job:
+    def __init__(self, reads: Tuple[int, ...], writes: Tuple[int, ...]):
+        self.reads = reads
+        self.writes = writes
+        self.pid: Optional[int] = None
+        self.last: Optional[Tuple[int, int]] = None
+
+
+class DeviceLimiter:
+    """Readers and writers per device for the running jobs, capped at max_jobs (None = by kind)"""
+
+    def __init__(self, max_jobs: Optional[int] = None, log: Optional[Callable[[str], None]] = None):
+        self.max_jobs = max_jobs
+        self.log = log
+        self._mounts = mounts()
+        self._devices: Dict[int, Device] = {}
+        self._paths: Dict[str, Optional[int]] = {}
+        self._readers: Dict[int, int] = {}
+        self._writers: Dict[int, int] = {}
+        self._jobs: Dict[Hashable, _Job] = {}
+        self._waiting = set()
+        self._bytes: Dict[int, List[int]] = {}
+        self._rates: Dict[int, Tuple[float, float]] = {}
+        self._last_sample: Optional[float] = None
+        self._last_report = time.monotonic()
+        self._lock = threading.Lock()
+
+    def cap(self, device: Device) -> Optional[int]:
+        """Concurrent readers (and writers) allowed on device, None = any number"""
+        if self.max_jobs:
+            return self.max_jobs
+        return DEFAULT_SLOW_DEVICE_JOBS if device.kind in (HDD, NETWORK) else None
+
+    def _resolve(self, paths: Iterable[str]) -> Tuple[int, ...]:
+        devs = []
+        for path in paths:
+            if path not in self._paths:
+                device = device_of(path, self._mounts)
+                self._paths[path] = device.dev if device else None
+                if device is not None:
+                    self._devices.setdefault(device.dev, device)
+            dev = self._paths[path]
+            if dev is not None and dev not in devs:
+                devs.append(dev)
+        return tuple(devs)
+
+    def load(self, reads: Iterable[str], writes: Iterable[str]) -> int:
+        """Running jobs on the devices a job would use, for ordering the queue"""
+        with self._lock:
+            return (sum(self._readers.get(d, 0) for d in self._resolve(reads))
+                    + sum(self._writers.get(d, 0) for d in self._resolve(writes)))
+
+    def _blocking(self, reads: Tuple[int, ...], writes: Tuple[int, ...]) -> Optional[str]:
+        for devs, active, role in ((reads, self._readers, "readers"), (writes, self._writers, "writers")):
+            for dev in devs:
+                cap = self.cap(self._devices[dev])
+                if cap is not None and active.get(dev, 0) >= cap:
+                    return f"{self._devices[dev].mount} ({active[dev]} {role})"
+        return None
+
+    def fits(self, reads: Iterable[str], writes: Iterable[str]) -> bool:
+        """Whether a job's devices all have a reader/writer slot left"""
+        with self._lock:
+            return self._blocking(self._resolve(reads), self._resolve(writes)) is None
+
+    def waiting(self, job: Hashable, reads: Iterable[str], writes: Iterable[str]) -> None:
+        """Note (once) that job is held back by a busy device"""
+        with self._lock:
+            if job in self._waiting:
+                return
+            busy = self._blocking(self._resolve(reads), self._resolve(writes))
+            if busy is None:
+                return
+            self._waiting.add(job)
+        if self.log is not None:
+            self.log(f"{job_label(job)} waits for {busy}")
+
+    def acquire(self, job: Hashable, reads: Iterable[str], writes: Iterable[str]) -> None:
+        with self._lock:
+            entry = self._jobs[job] = _Job(self._resolve(reads), self._resolve(writes))
+            for dev in entry.reads:
+                self._readers[dev] = self._readers.get(dev, 0) + 1
+            for dev in entry.writes:
+                self._writers[dev] = self._writers.get(dev, 0) + 1
+
+    def attach(self, job: Hashable, pid: int) -> None:
+        """The process whose I/O counts for job (call again for each process a job runs)"""
+        with self._lock:
+            entry = self._jobs.get(job)
+            if entry is not None:
+                entry.pid = pid
+                entry.last = None
+
+    def sample(self, now: Optional[float] = None) -> None:
+        """Add the I/O of the running jobs since the last sample to their devices"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            jobs = [entry for entry in self._jobs.values() if entry.pid is not None]
+        moved: Dict[int, List[int]] = {}
+        for entry in jobs:
+            counters = io_bytes(entry.pid)
+            if counters is None:
+                continue
+            if entry.last is not None:
+                for devs, amount, slot in ((entry.reads, counters[0] - entry.last[0], 0),
+                                           (entry.writes, counters[1] - entry.last[1], 1)):
+                    for dev in devs:
+                        # A job spanning several devices is split evenly over them
+                        moved.setdefault(dev, [0, 0])[slot] += max(0, amount) // len(devs)
+            entry.last = counters
+        with self._lock:
+            elapsed = now - self._last_sample if self._last_sample is not None else None
+            self._last_sample = now
+            for dev, (read, written) in moved.items():
+                totals = self._bytes.setdefault(dev, [0, 0])
+                totals[0] += read
+                totals[1] += written
+            if elapsed:
+                self._rates = {dev: (r / elapsed / (1024 * 1024), w / elapsed / (1024 * 1024))
+                               for dev, (r, w) in moved.items()}
+            report = now - self._last_report >= REPORT_SECONDS and any(
+                r or w for r, w in self._rates.values())
+            if report:
+                self._last_report = now
+        if report and self.log is not None:
+            self.log("; ".join(f"{mount} read {r:.1f} MB/s, write {w:.1f} MB/s"
+                               for mount, (r, w) in sorted(self.throughput().items())))
+
+    def throughput(self) -> Dict[str, Tuple[float, float]]:
+        """(read, write) MB/s per device mount point over the last sample interval"""
+        with self._lock:
+            return {self._devices[dev].mount: rates for dev, rates in self._rates.items()
+                    if dev in self._devices}
+
+    def totals(self) -> Dict[str, Tuple[int, int]]:
+        """(read, written) bytes per device mount point since the limiter was created"""
+        with self._lock:
+            return {self._devices[dev].mount: (r, w) for dev, (r, w) in self._bytes.items()
+                    if dev in self._devices}
+
+    def release(self, job: Hashable) -> None:
+        with self._lock:
+            entry = self._jobs.pop(job, None)
+            if entry is None:
+                return
+            for dev in entry.reads:
+                self._readers[dev] -= 1
+            for dev in entry.writes:
+                self._writers[dev] -= 1
+            self._waiting.discard(job)
+
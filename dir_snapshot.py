@@ -0,0 +1,72 @@
+"""Cached directory listings for VidoEdit.
+
+A snapshot lists a directory once with os.scandir (which usually knows the
+entry type without an extra stat) and is reused until the directory's mtime
+changes. Adding, removing or renaming an entry updates the directory mtime,
+so a single stat is enough to tell whether the cached listing is still valid.
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+
+class DirectorySnapshot:
+    """Listing of one directory: all entry names, its regular files and real subfolders"""
+
+    def __init__(self, directory: str, mtime_ns: int, names: List[str], files: List[str],
+                 dirs: Optional[List[str]] = None):
+        self.directory = directory
+        self.mtime_ns = mtime_ns
+        self.names = names
+        self.files = files
+        self.dirs = dirs or []
+        self.name_set = frozenset(names)
+
+
+_snapshots: Dict[str, DirectorySnapshot] = {}
+_lock = threading.Lock()
+
+
+def _dir_mtime(directory: str) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def get_snapshot(directory: str) -> DirectorySnapshot:
+    """Return a cached snapshot of directory, re-listing it only if it changed"""
+    key = os.path.abspath(directory)
+    mtime = _dir_mtime(key)
+    with _lock:
+        snap = _snapshots.get(key)
+    if snap is not None and mtime is not None and snap.mtime_ns == mtime:
+        return snap
+
+    names: List[str] = []
+    files: List[str] = []
+    dirs: List[str] = []
+    with os.scandir(key) as it:
+        for entry in it:
+            names.append(entry.name)
+            try:
+                if entry.is_file():
+                    files.append(entry.name)
+                elif entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+            except OSError:
+                continue
+    snap = DirectorySnapshot(key, mtime or 0, names, files, dirs)
+    with _lock:
+        _snapshots[key] = snap
+    return snap
+
+
+def invalidate(directory: str) -> None:
+    """Drop the cached snapshot, e.g. after renaming files in it ourselves.
+
+    Filesystems with coarse mtime resolution may not register changes made
+    within the same tick, so writers should call this explicitly.
+    """
+    with _lock:
+        _snapshots.pop(os.path.abspath(directory), None)
@@ -0,0 +1,322 @@
+"""Disk-space preflight for encodes in VidoEdit.
+
+A batch that fills its output volume used to fail hours in, with a
+half-written file left behind. Every output now gets a predicted size
+before its job starts: the video bitrate follows from the frame size and
+rate, the encoder and its CRF (or the target bitrate), streams that are
+copied keep their size, and the ratio of actual to predicted sizes of
+earlier outputs with the same encoder, preset and resolution class corrects
+the model (~/.vidoedit/size_history.json).
+
+SpaceLedger reserves the predicted sizes against the free space of each
+target filesystem. The JobScheduler holds a job while running jobs still
+have to write more than is left for it, and refuses a job outright when
+it doesn't fit while no job is running or being published (those may
+still free space, e.g. by replacing their original).
+"""
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+from memory_admission import height_class, job_label
+from stream_policy import stream_bitrate
+
+HISTORY_FILE = Path.home() / ".vidoedit" / "size_history.json"
+
+# Video bits per pixel and frame at CRF 23 (x265; x264 needs more)
+BITS_PER_PIXEL = 0.06
+X264_FACTOR = 1.6
+# Hardware encoders spend more bits for the same quality
+HW_FACTOR = 1.5
+HW_ENCODERS = ("nvenc", "qsv", "amf", "vaapi", "videotoolbox")
+# The bitrate doubles every this many CRF steps down
+CRF_DOUBLING = 6
+# Headroom on a prediction corrected by measured outputs, and on the bare model
+HISTORY_MARGIN = 1.15
+MODEL_MARGIN = 1.3
+HISTORY_WEIGHT = 0.3
+# Leave this much of every target filesystem free
+FREE_RESERVE_MB = 1024
+
+OK, WAIT, REFUSE = "ok", "wait", "refuse"
+
+
+class Prediction(NamedTuple):
+    """Predicted size of one output; key, model_bytes and other_bytes feed the history"""
+    path: str
+    mb: int
+    key: Optional[str] = None
+    model_bytes: int = 0
+    other_bytes: int = 0
+
+
+def size_key(encoder: str, preset: str, crf, height: int, variant: str = "") -> str:
+    return f"{encoder}|{preset}|{crf}|{height_class(height or 1080)}|{variant}"
+
+
+def _duration(info) -> float:
+    try:
+        return float(info.get("format", {}).get("duration") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _video(info) -> dict:
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic"):
+            return stream
+    return {}
+
+
+def _fps(stream) -> float:
+    try:
+        num, den = (stream.get("avg_frame_rate") or "25/1").split("/")
+        return float(num) / float(den) if float(den) else 25.0
+    except (ValueError, ZeroDivisionError):
+        return 25.0
+
+
+def model_video_kbps(encoder: str, crf, width: int, height: int, fps: float) -> float:
+    """Predicted video bitrate of a CRF encode without any measured history"""
+    try:
+        crf = float(crf)
+    except (TypeError, ValueError):
+        crf = 23.0
+    bpp = BITS_PER_PIXEL * 2 ** ((23 - crf) / CRF_DOUBLING)
+    if any(hw in encoder for hw in HW_ENCODERS):
+        bpp *= HW_FACTOR
+    elif "264" in encoder:
+        bpp *= X264_FACTOR
+    return (width or 1920) * (height or 1080) * (fps or 25.0) * bpp / 1000
+
+
+def copied_bytes(info, first_audio_only: bool = False) -> int:
+    """Size of the audio and subtitle streams an encode copies unchanged"""
+    duration = _duration(info)
+    total = 0
+    for stream in info.get("streams", []):
+        kind = stream.get("codec_type")
+        if kind == "audio" or (kind == "subtitle" and not first_audio_only):
+            total += stream_bitrate(stream, duration) * duration / 8
+            if kind == "audio" and first_audio_only:
+                break
+    return int(total)
+
+
+def _arg(args, flag: str, default):
+    return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else default
+
+
+def predict(path: str, info, video_args: List[str], other_bytes: int = 0,
+            target_kbps: Optional[float] = None, variant: str = "", scale: float = 1.0) -> Prediction:
+    """Predicted size of an output encoded with video_args (-c:v/-preset/-crf) from info.
+
+    target_kbps replaces the CRF model for bitrate-targeted encodes; scale
+    covers outputs holding several renditions (ABR ladders).
+    """
+    duration = _duration(info)
+    stream = _video(info)
+    encoder = _arg(video_args, "-c:v", "libx265")
+    if target_kbps:
+        return Prediction(path, _mb(target_kbps * 1000 * duration / 8 * scale + other_bytes))
+    preset = _arg(video_args, "-preset", "medium")
+    crf = _arg(video_args, "-crf", 23)
+    kbps = model_video_kbps(encoder, crf, stream.get("width"), stream.get("height"), _fps(stream))
+    source_kbps = stream_bitrate(stream, duration) / 1000
+    if source_kbps:
+        # Re-encoding rarely comes out much larger than the source stream
+        kbps = min(kbps, source_kbps * 1.1)
+    model = int(kbps * 1000 * duration / 8 * scale)
+    key = size_key(encoder, preset, crf, stream.get("height"), variant)
+    factor = _history_get(key)
+    margin = HISTORY_MARGIN if factor else MODEL_MARGIN
+    return Prediction(path, _mb(model * (factor or 1.0) * margin + other_bytes), key, model, other_bytes)
+
+
+def _mb(size: float) -> int:
+    return int(size / (1024 * 1024)) + 1
+
+
+def _load_history() -> Dict[str, float]:
+    try:
+        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+_history_lock = threading.Lock()
+_history: Optional[Dict[str, float]] = None
+
+
+def _history_get(key: str) -> Optional[float]:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = _load_history()
+        return _history.get(key)
+
+
+def record(prediction: Prediction, written_path: Optional[str] = None) -> None:
+    """Blend the size of the finished output (written_path, default prediction.path) into the history"""
+    if not prediction.key or not prediction.model_bytes:
+        return
+    written = _written_bytes(written_path or prediction.path) - prediction.other_bytes
+    if written <= 0:
+        return
+    ratio = written / prediction.model_bytes
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = _load_history()
+        old = _history.get(prediction.key)
+        # Rising ratios count fully, falling ones slowly: running out of space is the costly side
+        if old is None or ratio > old:
+            _history[prediction.key] = round(ratio, 3)
+        else:
+            _history[prediction.key] = round(old + HISTORY_WEIGHT * (ratio - old), 3)
+        try:
+            HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = HISTORY_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_history, f, indent=2)
+            os.replace(tmp, HISTORY_FILE)
+        except Exception:
+            pass
+
+
+def _written_bytes(path: str) -> int:
+    """Bytes already at path; a folder (segmented outputs) counts with everything below it"""
+    try:
+        if os.path.isdir(path):
+            return sum(os.path.getsize(os.path.join(folder, name))
+                       for folder, _, names in os.walk(path) for name in names)
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _filesystem(path: str) -> Tuple[Optional[int], str]:
+    """(st_dev, an existing folder on it) for a path that may not exist yet"""
+    folder = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    while folder and not os.path.isdir(folder):
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            break
+        folder = parent
+    try:
+        return os.stat(folder).st_dev, folder
+    except OSError:
+        return None, folder
+
+
+def free_mb(folder: str) -> Optional[int]:
+    try:
+        return shutil.disk_usage(folder).free // (1024 * 1024) - FREE_RESERVE_MB
+    except OSError:
+        return None
+
+
+class SpaceLedger:
+    """Predicted output sizes of the running jobs, reserved against each target filesystem"""
+
+    def __init__(self, log: Optional[Callable[[str], None]] = None):
+        self.log = log
+        self._jobs: Dict[Hashable, List[Prediction]] = {}
+        self._deferred = set()
+        self._waiting = set()
+        self._lock = threading.Lock()
+
+    def _pending_mb(self, dev, cache: Dict) -> int:
+        """What the reserved outputs on dev still have to write"""
+        if "pending" not in cache:
+            totals: Dict[Optional[int], int] = {}
+            for predictions in self._jobs.values():
+                for p in predictions:
+                    fs = _filesystem(p.path)[0]
+                    totals[fs] = totals.get(fs, 0) + max(0, p.mb - _written_bytes(p.path) // (1024 * 1024))
+            cache["pending"] = totals
+        return cache["pending"].get(dev, 0)
+
+    def _shortage(self, outputs: List[Prediction], cache: Optional[Dict] = None) -> Tuple[str, str]:
+        """(verdict, detail) for a job writing outputs.
+
+        cache holds free and pending space between calls; pass the same dict
+        for every candidate of one scheduling pass, a new one for the next.
+        """
+        cache = {} if cache is None else cache
+        needs: Dict[Optional[int], List] = {}
+        for p in outputs:
+            dev, folder = _filesystem(p.path)
+            entry = needs.setdefault(dev, [folder, 0])
+            entry[1] += p.mb
+        verdict, detail = OK, ""
+        for dev, (folder, need) in needs.items():
+            if ("free", dev) not in cache:
+                cache[("free", dev)] = free_mb(folder)
+            free = cache[("free", dev)]
+            if dev is None or free is None:
+                continue
+            if need > free:
+                if not self._jobs:
+                    return REFUSE, f"needs {need} MB on {folder}, {max(free, 0)} MB free"
+                # Running jobs may still free space (replace mode drops the original on publish)
+                verdict = WAIT
+                detail = f"needs {need} MB on {folder}, {max(free, 0)} MB free until running jobs finish"
+                continue
+            pending = self._pending_mb(dev, cache)
+            if need > free - pending:
+                verdict = WAIT
+                detail = f"needs {need} MB on {folder}, {max(free, 0)} MB free, {pending} MB still to be written"
+        return verdict, detail
+
+    def check(self, outputs: List[Prediction], cache: Optional[Dict] = None) -> str:
+        """OK, WAIT (may fit once running jobs are done) or REFUSE (doesn't fit with nothing running)"""
+        with self._lock:
+            return self._shortage(outputs, cache)[0]
+
+    def waiting(self, job: Hashable, outputs: List[Prediction], cache: Optional[Dict] = None) -> None:
+        """Note (once) that job is held back for lack of space"""
+        with self._lock:
+            if job in self._waiting:
+                return
+            self._waiting.add(job)
+            _, detail = self._shortage(outputs, cache)
+        if self.log is not None and detail:
+            self.log(f"{job_label(job)} waits, {detail}")
+
+    def refused(self, job: Hashable, outputs: List[Prediction], cache: Optional[Dict] = None) -> None:
+        if self.log is not None:
+            with self._lock:
+                _, detail = self._shortage(outputs, cache)
+            self.log(f"{job_label(job)} skipped, {detail}")
+
+    def reserve(self, job: Hashable, outputs: List[Prediction]) -> None:
+        with self._lock:
+            self._jobs[job] = list(outputs)
+
+    def record(self, job: Hashable, written_paths: List[str]) -> None:
+        """Learn from job's finished outputs, written_paths in the order they were predicted"""
+        with self._lock:
+            predictions = list(self._jobs.get(job, ()))
+        for prediction, path in zip(predictions, written_paths):
+            record(prediction, path)
+
+    def defer(self, job: Hashable) -> None:
+        """Keep job's reservation through release() until release(job, deferred=True),
+        for outputs that are still being moved into place"""
+        with self._lock:
+            if job in self._jobs:
+                self._deferred.add(job)
+
+    def release(self, job: Hashable, deferred: bool = False) -> None:
+        with self._lock:
+            if job in self._deferred and not deferred:
+                return
+            self._deferred.discard(job)
+            self._jobs.pop(job, None)
+            self._waiting.discard(job)
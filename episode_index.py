@@ -0,0 +1,401 @@
+"""Persistent episode index for VidoEdit.
+
+Keeps parsed (season, episode, part, path, size, mtime) records per directory
+and parser, so Merge and Renamer don't re-list and re-parse a folder on every
+click. A directory is re-checked with a single stat; when it changed, only the
+names added or removed since the last look are parsed. With watchdog
+installed, file events apply changes as they happen; the directory is still
+diffed on the next lookup, since events of the same mtime tick may arrive
+late or coalesced. The records handed out are re-statted, so files rewritten
+in place are parsed again.
+
+Large folders are saved to ~/.vidoedit/episode_index/ and reused on the next
+start as long as the folder's mtime still matches.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from dir_snapshot import get_snapshot
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+ParseFunc = Callable[[str], Optional[Tuple[int, int, Optional[str]]]]
+
+INDEX_DIR = Path.home() / ".vidoedit" / "episode_index"
+# Smaller folders are re-parsed faster than their index file is read
+PERSIST_MIN_FILES = 2000
+MAX_INDEX_FILES = 64
+MAX_INDEXES = 8
+MAX_WATCHED_DIRS = 256
+
+
+class EpisodeRecord(NamedTuple):
+    season: int
+    episode: int
+    part: Optional[str]
+    name: str
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def _dir_mtime(directory: str) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _record_order(rec: EpisodeRecord):
+    return (rec.part or "", rec.name.lower())
+
+
+class _DirectoryIndex:
+    """Records of one directory for one parser"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.mtime_ns: Optional[int] = None
+        self.records: Dict[str, EpisodeRecord] = {}
+        self.unparsed: Set[str] = set()
+        self.by_id: Dict[Tuple[int, int], Dict[str, EpisodeRecord]] = {}
+        self.dirty = False
+        self._groups: Optional[List[Tuple[int, int, List[EpisodeRecord]]]] = None
+
+    def known(self) -> Set[str]:
+        return self.records.keys() | self.unparsed
+
+    def _insert(self, rec: EpisodeRecord) -> None:
+        self.records[rec.name] = rec
+        self.by_id.setdefault((rec.season, rec.episode), {})[rec.name] = rec
+        self._groups = None
+        self.dirty = True
+
+    def add(self, name: str, parse: ParseFunc) -> None:
+        res = parse(name)
+        if res is None:
+            self.unparsed.add(name)
+            self.dirty = True
+            return
+        path = self.directory + os.sep + name
+        try:
+            st = os.stat(path)
+        except OSError:
+            return  # gone again before we got to it
+        self._insert(EpisodeRecord(res[0], res[1], res[2], name, path, st.st_size, st.st_mtime_ns))
+
+    def remove(self, name: str) -> None:
+        if name in self.unparsed:
+            self.unparsed.discard(name)
+            self.dirty = True
+            return
+        rec = self.records.pop(name, None)
+        if rec is None:
+            return
+        bucket = self.by_id.get((rec.season, rec.episode))
+        if bucket is not None:
+            bucket.pop(name, None)
+            if not bucket:
+                del self.by_id[(rec.season, rec.episode)]
+        self._groups = None
+        self.dirty = True
+
+    def restat(self, records: List[EpisodeRecord], parse: ParseFunc) -> None:
+        """Re-read the records whose file changed size or mtime, drop the ones that are gone"""
+        for rec in records:
+            try:
+                st = os.stat(rec.path)
+            except FileNotFoundError:
+                self.remove(rec.name)
+                continue
+            except OSError:
+                continue
+            if st.st_size != rec.size or st.st_mtime_ns != rec.mtime_ns:
+                self.remove(rec.name)
+                self.add(rec.name, parse)
+
+    def groups(self) -> List[Tuple[int, int, List[EpisodeRecord]]]:
+        if self._groups is None:
+            self._groups = [(s, e, sorted(bucket.values(), key=_record_order))
+                            for (s, e), bucket in sorted(self.by_id.items())]
+        return self._groups
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forwards file events of one watched directory to its index"""
+
+    def __init__(self, index: "EpisodeIndex", directory: str):
+        super().__init__()
+        self.index = index
+        self.directory = directory
+
+    def _name_in_dir(self, path) -> Optional[str]:
+        path = os.fsdecode(path)
+        return os.path.basename(path) if os.path.dirname(os.path.abspath(path)) == self.directory else None
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.index._on_event(self.directory, added=self._name_in_dir(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            name = self._name_in_dir(event.src_path)
+            self.index._on_event(self.directory, removed=name, added=name)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.index._on_event(self.directory, removed=self._name_in_dir(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.index._on_event(self.directory,
+                                 removed=self._name_in_dir(event.src_path),
+                                 added=self._name_in_dir(event.dest_path))
+
+
+_observer = None
+_observer_lock = threading.Lock()
+
+
+def _get_observer():
+    global _observer
+    if Observer is None:
+        return None
+    with _observer_lock:
+        if _observer is None:
+            try:
+                _observer = Observer()
+                _observer.daemon = True
+                _observer.start()
+            except Exception:
+                _observer = None
+        return _observer
+
+
+class EpisodeIndex:
+    """Episode records for every directory looked up with one parser.
+
+    key must identify the parser (e.g. tab name plus regex), since it
+    names the persisted index files.
+    """
+
+    def __init__(self, key: str, parse: ParseFunc, index_dir: Optional[Path] = None):
+        self.key = key
+        self.parse = parse
+        self.index_dir = Path(index_dir) if index_dir else INDEX_DIR
+        self._dirs: Dict[str, _DirectoryIndex] = {}
+        self._watches: Dict[str, Tuple[object, _EventHandler]] = {}
+        self._saving: Set[str] = set()
+        self._lock = threading.RLock()
+
+    # -- lookups ---------------------------------------------------------
+
+    def records(self, directory: str) -> List[EpisodeRecord]:
+        """All parsed records of directory, in no particular order"""
+        with self._lock:
+            d = self._refresh(directory)
+            self._restat(d, list(d.records.values()))
+            return list(d.records.values())
+
+    def groups(self, directory: str) -> List[Tuple[int, int, List[EpisodeRecord]]]:
+        """[(season, episode, records sorted by part and name)] sorted by season and episode"""
+        with self._lock:
+            d = self._refresh(directory)
+            self._restat(d, list(d.records.values()))
+            return d.groups()
+
+    def lookup(self, directory: str, season: int, episode: int) -> List[EpisodeRecord]:
+        """Records of one episode, sorted by part and name"""
+        with self._lock:
+            d = self._refresh(directory)
+            self._restat(d, list(d.by_id.get((season, episode), {}).values()))
+            bucket = d.by_id.get((season, episode), {})
+            return sorted(bucket.values(), key=_record_order)
+
+    def invalidate(self, directory: str) -> None:
+        """Force a re-check of directory on the next lookup"""
+        with self._lock:
+            d = self._dirs.get(os.path.abspath(directory))
+            if d is not None:
+                d.mtime_ns = None
+
+    def close(self) -> None:
+        """Stop watching directories"""
+        with self._lock:
+            watches, self._watches = self._watches, {}
+        observer = _get_observer() if watches else None
+        for watch, handler in watches.values():
+            try:
+                observer.remove_handler_for_watch(handler, watch)
+            except Exception:
+                pass
+
+    # -- maintenance -----------------------------------------------------
+
+    def _refresh(self, directory: str) -> _DirectoryIndex:
+        key = os.path.abspath(directory)
+        d = self._dirs.get(key)
+        if d is None:
+            d = self._load(key) or _DirectoryIndex(key)
+            self._dirs[key] = d
+            self._watch(key)
+        mtime = _dir_mtime(key)
+        if mtime is not None and d.mtime_ns == mtime:
+            return d
+
+        snap = get_snapshot(key)
+        current = set(snap.files)
+        known = d.known()
+        for name in known - current:
+            d.remove(name)
+        for name in current - known:
+            d.add(name, self.parse)
+        d.mtime_ns = snap.mtime_ns
+        if d.dirty:
+            self._save(d)
+        return d
+
+    def _restat(self, d: _DirectoryIndex, records: List[EpisodeRecord]) -> None:
+        # Rewrites in place don't touch the directory's mtime, and without
+        # watchdog nothing else would notice them
+        d.restat(records, self.parse)
+        if d.dirty:
+            self._save(d)
+
+    def _on_event(self, directory: str, removed: Optional[str] = None, added: Optional[str] = None) -> None:
+        with self._lock:
+            d = self._dirs.get(directory)
+            if d is None or d.mtime_ns is None:
+                return  # not indexed yet or already due for a full re-check
+            if removed:
+                d.remove(removed)
+            if added and os.path.isfile(os.path.join(directory, added)):
+                d.remove(added)
+                d.add(added, self.parse)
+            # d.mtime_ns stays as it was: other changes of the same mtime tick
+            # may not have been reported yet, so the next lookup still diffs
+            # the listing against the records (names handled here drop out)
+
+    def _watch(self, directory: str) -> None:
+        if directory in self._watches or len(self._watches) >= MAX_WATCHED_DIRS:
+            return
+        observer = _get_observer()
+        if observer is None:
+            return
+        handler = _EventHandler(self, directory)
+        try:
+            watch = observer.schedule(handler, directory, recursive=False)
+        except Exception:
+            return  # e.g. inotify watch limit reached; mtime checks still apply
+        self._watches[directory] = (watch, handler)
+
+    # -- persistence -----------------------------------------------------
+
+    def _file_for(self, directory: str) -> Path:
+        digest = hashlib.sha1(f"{self.key}\0{directory}".encode("utf-8")).hexdigest()
+        return self.index_dir / f"{digest}.json"
+
+    def _load(self, directory: str) -> Optional[_DirectoryIndex]:
+        path = self._file_for(directory)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("key") != self.key or data.get("directory") != directory:
+            return None
+        d = _DirectoryIndex(directory)
+        try:
+            for name, season, episode, part, size, mtime_ns in data.get("records", []):
+                d._insert(EpisodeRecord(season, episode, part, name,
+                                        directory + os.sep + name, size, mtime_ns))
+            d.unparsed = set(data.get("unparsed", []))
+        except (TypeError, ValueError):
+            return None
+        d.mtime_ns = data.get("mtime_ns")
+        d.dirty = False
+        return d
+
+    def _save(self, d: _DirectoryIndex) -> None:
+        """Write the index of a large folder in the background"""
+        if len(d.records) + len(d.unparsed) < PERSIST_MIN_FILES:
+            d.dirty = False
+            return
+        if d.directory in self._saving:
+            return  # still dirty; the next refresh writes the newer state
+        d.dirty = False
+        self._saving.add(d.directory)
+        data = {
+            "key": self.key,
+            "directory": d.directory,
+            "mtime_ns": d.mtime_ns,
+            "records": [[r.name, r.season, r.episode, r.part, r.size, r.mtime_ns] for r in d.records.values()],
+            "unparsed": sorted(d.unparsed),
+        }
+        threading.Thread(target=self._write, args=(d.directory, data), daemon=True).start()
+
+    def _write(self, directory: str, data: Dict) -> None:
+        path = self._file_for(directory)
+        tmp = path.with_suffix(".tmp")
+        try:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            text = json.dumps(data, separators=(",", ":"))
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+            self._prune()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._saving.discard(directory)
+
+    def _prune(self) -> None:
+        """Keep only the MAX_INDEX_FILES most recently written index files"""
+        try:
+            files = sorted(self.index_dir.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        except OSError:
+            return
+        for path in files[MAX_INDEX_FILES:]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+_indexes: "OrderedDict[str, EpisodeIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_index(key: str, parse: ParseFunc) -> EpisodeIndex:
+    """Shared index for a parser; the least recently used ones are dropped"""
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+        index = _indexes[key] = EpisodeIndex(key, parse)
+        evicted = []
+        while len(_indexes) > MAX_INDEXES:
+            evicted.append(_indexes.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return index
+
+
+def invalidate(directory: str) -> None:
+    """Force every index to re-check directory, e.g. after renaming files in it ourselves"""
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        index.invalidate(directory)
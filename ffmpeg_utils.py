@@ -1,7 +1,11 @@
 """FFmpeg utilities for finding bundled executables"""
+import functools
+import json
 import os
+import subprocess
 import sys
 import platform
+import threading
 from pathlib import Path
 
 
@@ -37,3 +41,91 @@ def get_ffprobe_path():
     
     # Check if ffprobe is in PATH
     return "ffprobe"
+
+
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+
+def probe_media(path):
+    """Return ffprobe format/stream info for a file as a dict (empty dict on failure).
+
+    Results are cached per (path, size, mtime) so repeated lookups during a batch
+    don't spawn ffprobe again.
+    """
+    try:
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    except OSError:
+        return {}
+    with _probe_lock:
+        cached = _probe_cache.get(key)
+    if cached is not None:
+        return cached
+    try:
+        result = subprocess.run(
+            [
+                get_ffprobe_path(), "-v", "error",
+                "-show_format", "-show_streams",
+                "-of", "json",
+                path,
+            ],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return {}
+        info = json.loads(result.stdout or "{}")
+    except Exception:
+        return {}
+    with _probe_lock:
+        _probe_cache[key] = info
+    return info
+
+
+def get_video_stream(info):
+    """Return the first video stream from probe_media() output, or None"""
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic"):
+            return stream
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def get_ffmpeg_filters():
+    """Return the set of filter names compiled into the ffmpeg build"""
+    try:
+        out = subprocess.check_output(
+            [get_ffmpeg_path(), "-hide_banner", "-filters"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+    except Exception:
+        return frozenset()
+    names = set()
+    for line in out.splitlines():
+        parts = line.split()
+        # Filter lines look like " TSC zscale  V->V  Apply resizing..."
+        if len(parts) >= 3 and "->" in parts[2]:
+            names.add(parts[1])
+    return frozenset(names)
+
+
+@functools.lru_cache(maxsize=None)
+def detect_hevc_encoder():
+    """Return the best available HEVC encoder, preferring hardware encoders"""
+    try:
+        encoders = subprocess.check_output(
+            [get_ffmpeg_path(), "-encoders"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        if "hevc_nvenc" in encoders:
+            return "hevc_nvenc"
+        if "hevc_amf" in encoders:
+            return "hevc_amf"
+        if "hevc_qsv" in encoders:
+            return "hevc_qsv"
+    except Exception:
+        pass
+    return "libx265"
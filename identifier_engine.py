@@ -0,0 +1,214 @@
+"""Episode identifier detection for VidoEdit.
+
+A library of candidate filename patterns (SxxEyy with ranges and part
+suffixes, 1x02, air dates, "Episode 12", anime absolute numbering) is
+compiled into one alternation, so a single left-to-right scan per filename
+reports every candidate that matches. Where candidates overlap, the more
+specific one wins, so the digits of an air date don't also count as a bare
+episode number. detect() scores the candidates on a sample of a folder and
+picks the one that explains it best.
+
+All patterns use the same group names, so the tabs can parse any of them
+with parse_match():
+    season, episode, episode_end, part, part_num, year, month, day
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from dir_snapshot import get_snapshot
+
+SAMPLE_SIZE = 500
+# Below this many matching files a pattern doesn't describe the folder
+MIN_COVERAGE = 0.2
+
+
+class IdentifierPattern:
+    """A named candidate pattern; weight favours more specific patterns on ties"""
+
+    def __init__(self, name: str, regex: str, weight: float, sequential: bool = True):
+        self.name = name
+        self.regex = regex
+        self.weight = weight
+        self.sequential = sequential
+        self.compiled = re.compile(regex)
+
+    def parse(self, name: str) -> Optional[Tuple[int, int, Optional[str]]]:
+        m = self.compiled.search(name)
+        return parse_match(m) if m else None
+
+
+_PART = r"(?:(?P<part>[A-Za-z])(?![A-Za-z])|[ ._-]*(?i:part|pt|cd)[ ._-]?(?P<part_num>\d{1,2})(?!\d))?"
+
+CANDIDATES: List[IdentifierPattern] = [
+    IdentifierPattern(
+        "SxxEyy",
+        r"(?i:S(?P<season>\d{1,2})[ ._-]?E(?P<episode>\d{1,3})(?:[-_]?E(?P<episode_end>\d{1,3}))?)" + _PART,
+        1.0),
+    IdentifierPattern(
+        "1x02",
+        r"(?<![\dA-Za-z])(?P<season>\d{1,2})x(?P<episode>\d{2,3})(?:-(?:\d{1,2}x)?(?P<episode_end>\d{2,3}))?(?!\d)" + _PART,
+        0.9),
+    IdentifierPattern(
+        "Date",
+        r"(?<!\d)(?P<year>(?:19|20)\d{2})[-._ ](?P<month>0[1-9]|1[0-2])[-._ ](?P<day>[0-2]\d|3[01])(?!\d)",
+        0.9, sequential=False),
+    IdentifierPattern(
+        "Episode N",
+        r"(?i:\b(?:episode|episodio|folge|ep)[ ._-]?(?P<episode>\d{1,4}))(?!\d)" + _PART,
+        0.8),
+    IdentifierPattern(
+        "Absolute",
+        # "[Group] Show - 123 [1080p].mkv", "Show - 07v2.mkv"
+        r"(?:^|[ _.])-[ _.]?(?P<episode>\d{2,4})(?:v\d)?(?=[ _.\[(]|$)",
+        0.75),
+    IdentifierPattern(
+        "Bare number",
+        # Two digits that aren't part of a longer number (years, 1080p, x264)
+        r"(?<![\dA-Za-z])(?P<episode>\d{2})(?P<part>[A-Za-z])?(?![\dA-Za-z])",
+        0.4),
+]
+BY_NAME = {c.name: c for c in CANDIDATES}
+
+
+def _combined(candidates: Sequence[IdentifierPattern]) -> re.Pattern:
+    """Alternation of all candidates as groups c<i>, their groups renamed c<i>_<name>"""
+    parts = []
+    for i, cand in enumerate(candidates):
+        body = cand.regex.replace("(?P<", f"(?P<c{i}_")
+        parts.append(f"(?P<c{i}>{body})")
+    # Every candidate starts with one of these characters; the guard rejects
+    # all other positions with one class test instead of trying each alternative
+    return re.compile(r"(?=[\dSsEeFf _.\-])(?:" + "|".join(parts) + ")")
+
+
+COMBINED = _combined(CANDIDATES)
+# (candidate group, [(prefixed group, group)]) per candidate, to read a match without groupdict()
+_GROUPS = [(f"c{i}", [(f"c{i}_{g}", g) for g in cand.compiled.groupindex])
+           for i, cand in enumerate(CANDIDATES)]
+_HAS_DIGIT = re.compile(r"\d")
+
+
+def has_identifier_groups(pattern: re.Pattern) -> bool:
+    """Whether parse_match can read an identifier from pattern's groups"""
+    groups = set(pattern.groupindex)
+    return "episode" in groups or {"year", "month", "day"} <= groups
+
+
+def _parse_groups(g: Dict[str, Optional[str]]) -> Optional[Tuple[int, int, Optional[str]]]:
+    if g.get("year"):
+        # Daily shows: the year is the season, MMDD the episode
+        return int(g["year"]), int(g["month"]) * 100 + int(g["day"]), None
+    if not g.get("episode"):
+        return None
+    season = int(g["season"]) if g.get("season") else 1
+    part = g.get("part")
+    if part:
+        part = part.upper()
+    elif g.get("part_num"):
+        num = int(g["part_num"])
+        part = chr(ord("A") + num - 1) if 1 <= num <= 26 else None
+    return season, int(g["episode"]), part
+
+
+def parse_match(m: re.Match) -> Optional[Tuple[int, int, Optional[str]]]:
+    """(season, episode, part) from a match of any candidate or user pattern"""
+    return _parse_groups(m.groupdict())
+
+
+def match_all(name: str) -> Dict[str, Tuple[int, int, Optional[str]]]:
+    """{candidate name: (season, episode, part)} for every candidate matching name, in one pass"""
+    result: Dict[str, Tuple[int, int, Optional[str]]] = {}
+    for m in COMBINED.finditer(name):
+        idx = int(m.lastgroup[1:])
+        cand_name = CANDIDATES[idx].name
+        if cand_name in result:
+            continue  # like search(), the first match of a candidate counts
+        parsed = _parse_groups({g: m.group(key) for key, g in _GROUPS[idx][1]})
+        if parsed:
+            result[cand_name] = parsed
+    return result
+
+
+def _sample(names: Sequence[str], size: int) -> List[str]:
+    """Evenly spaced names that contain a digit"""
+    if len(names) > size:
+        step = len(names) / size
+        names = [names[int(i * step)] for i in range(size)]
+    return [n for n in names if _HAS_DIGIT.search(n)]
+
+
+def _sequential_ratio(ids: List[Tuple[int, int, Optional[str]]]) -> float:
+    """Share of consecutive distinct episodes (per season) that are at most 2 apart"""
+    by_season: Dict[int, set] = {}
+    for season, episode, _ in ids:
+        by_season.setdefault(season, set()).add(episode)
+    steps = close = 0
+    for episodes in by_season.values():
+        ordered = sorted(episodes)
+        for a, b in zip(ordered, ordered[1:]):
+            steps += 1
+            close += (b - a) <= 2
+    return close / steps if steps else 1.0
+
+
+class Detection:
+    """Result of detect(): the winning pattern and how well it fits the sample"""
+
+    def __init__(self, pattern: IdentifierPattern, score: float, coverage: float,
+                 scores: Dict[str, float]):
+        self.pattern = pattern
+        self.score = score
+        self.coverage = coverage
+        self.scores = scores
+
+
+def detect(names: Sequence[str], sample_size: int = SAMPLE_SIZE) -> Optional[Detection]:
+    """Score every candidate on a sample of names and return the best one.
+
+    Score = weight * coverage * uniqueness * (0.5 + 0.5 * sequential), where
+    uniqueness is distinct identifiers per match (a pattern hitting the same
+    number in every file, like a year, scores low) and sequential rewards
+    episode numbers without large gaps.
+    """
+    sample = _sample(names, sample_size)
+    if not sample:
+        return None
+    hits: Dict[str, List[Tuple[int, int, Optional[str]]]] = {c.name: [] for c in CANDIDATES}
+    for name in sample:
+        for cand_name, parsed in match_all(name).items():
+            hits[cand_name].append(parsed)
+
+    scores: Dict[str, float] = {}
+    best = None
+    for cand in CANDIDATES:
+        ids = hits[cand.name]
+        if not ids:
+            continue
+        coverage = len(ids) / len(sample)
+        uniqueness = len(set(ids)) / len(ids)
+        sequential = _sequential_ratio(ids) if cand.sequential else 1.0
+        score = cand.weight * coverage * uniqueness * (0.5 + 0.5 * sequential)
+        scores[cand.name] = score
+        if coverage >= MIN_COVERAGE and (best is None or score > best[0]):
+            best = (score, coverage, cand)
+    if best is None:
+        return None
+    return Detection(best[2], best[0], best[1], scores)
+
+
+def detect_directory(directory: str, sample_size: int = SAMPLE_SIZE) -> Optional[Detection]:
+    """detect() on the files of directory"""
+    return detect(get_snapshot(directory).files, sample_size)
+
+
+def parse_all(names: Sequence[str], pattern: IdentifierPattern) -> Dict[str, Tuple[int, int, Optional[str]]]:
+    """{name: (season, episode, part)} for every name the pattern matches"""
+    search = pattern.compiled.search
+    result = {}
+    for name in names:
+        m = search(name)
+        if m:
+            parsed = _parse_groups(m.groupdict())
+            if parsed:
+                result[name] = parsed
+    return result
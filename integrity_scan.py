@@ -0,0 +1,267 @@
+"""Quick damage scan of queued inputs before they are encoded, for VidoEdit.
+
+A damaged source used to fail (or stall) hours into its encode. scan()
+checks a file in seconds instead: the container must probe, and one
+demux-only pass copies every packet to a null muxer without decoding
+anything, which surfaces corrupt packets, broken timestamps and files that
+end before their index says. Optionally the keyframes of the video stream
+are decoded as well (-skip_frame nokey), still far cheaper than decoding
+every frame.
+
+scan_all() runs the queue in parallel, with at most as many scans per
+device as the JobScheduler would run jobs there. Files that are BROKEN are
+kept out of the batch (and optionally moved to a quarantine folder); the
+encodes of SUSPECT files start with the error-tolerant input flags that
+stall retries use. Verdicts are cached per (path, size, mtime) in
+~/.vidoedit/scan_cache.json.
+"""
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import device_io
+from ffmpeg_utils import get_ffmpeg_path, get_video_stream, probe_media
+
+CACHE_FILE = Path.home() / ".vidoedit" / "scan_cache.json"
+
+OK, SUSPECT, BROKEN = "ok", "suspect", "broken"
+
+# More damaged packets or keyframes than this and the file is judged broken
+CORRUPT_LIMIT = 5
+# A demux ending this share (and TRUNCATED_SECONDS) short of the duration means missing data
+TRUNCATED_SHARE = 0.97
+TRUNCATED_SECONDS = 2.0
+
+TIMESTAMP_PATTERN = re.compile(
+    r"non[- ]monoton|invalid dts|invalid pts|dts out of order|timestamp discontinuity|invalid timestamps", re.I)
+# What the demuxer reports for damaged packets (nothing is decoded in that pass)
+CORRUPT_PATTERN = re.compile(
+    r"corrupt|invalid data|read error|truncat|ebml|invalid nal|missing picture", re.I)
+# What the decoder reports for damaged keyframes
+DECODE_ERROR_PATTERN = re.compile(
+    r"corrupt|invalid data|concealing|error while decoding|decode_slice|missing reference"
+    r"|invalid nal|no frame|truncat", re.I)
+PROGRESS_PATTERN = re.compile(r"^out_time_us=(\d+)$")
+
+_cache_lock = threading.Lock()
+
+
+class ScanResult(NamedTuple):
+    path: str
+    verdict: str
+    problems: List[str]
+
+    def detail(self) -> str:
+        return ", ".join(self.problems)
+
+
+def _run(cmd: List[str], cancelled: Callable[[], bool]) -> Optional[tuple]:
+    """(exit code, stderr lines) of an ffmpeg pass; None when ffmpeg is missing or cancelled"""
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                text=True, errors="replace")
+    except FileNotFoundError:
+        return None
+    lines = []
+    for line in proc.stderr:
+        if cancelled():
+            proc.kill()
+            proc.wait()
+            return None
+        lines.append(line.strip())
+    proc.wait()
+    return proc.returncode, lines
+
+
+def _demux(input_file: str, duration: float, cancelled: Callable[[], bool]) -> Optional[tuple]:
+    """(verdict, problems) of a packet-copy pass over every stream"""
+    result = _run([
+        get_ffmpeg_path(), "-hide_banner", "-nostdin", "-v", "warning", "-progress", "pipe:2",
+        "-i", input_file, "-map", "0", "-c", "copy", "-f", "null", "-",
+    ], cancelled)
+    if result is None:
+        return None
+    code, lines = result
+    corrupt = timestamps = 0
+    end = 0.0
+    for line in lines:
+        m = PROGRESS_PATTERN.match(line)
+        if m:
+            end = max(end, int(m.group(1)) / 1e6)
+        elif TIMESTAMP_PATTERN.search(line):
+            timestamps += 1
+        elif CORRUPT_PATTERN.search(line):
+            corrupt += 1
+    verdict, problems = OK, []
+    if code != 0:
+        verdict = BROKEN
+        problems.append("demuxing failed")
+    if corrupt:
+        verdict = BROKEN if corrupt > CORRUPT_LIMIT else max(verdict, SUSPECT, key=_rank)
+        problems.append(f"{corrupt} damaged packet(s)")
+    if timestamps:
+        verdict = max(verdict, SUSPECT, key=_rank)
+        problems.append(f"{timestamps} timestamp error(s)")
+    if duration > 0 and end < duration * TRUNCATED_SHARE and duration - end > TRUNCATED_SECONDS:
+        verdict = BROKEN
+        problems.append(f"data ends at {int(end)} s of {int(duration)} s")
+    return verdict, problems
+
+
+def _keyframes(input_file: str, cancelled: Callable[[], bool]) -> Optional[tuple]:
+    """(verdict, problems) of decoding only the keyframes of the first video stream"""
+    result = _run([
+        get_ffmpeg_path(), "-hide_banner", "-nostdin", "-v", "error", "-skip_frame", "nokey",
+        "-i", input_file, "-map", "0:v:0", "-an", "-sn", "-dn", "-f", "null", "-",
+    ], cancelled)
+    if result is None:
+        return None
+    code, lines = result
+    # -v error also prints demuxer messages; only decoder errors mean a damaged keyframe
+    errors = len([line for line in lines if DECODE_ERROR_PATTERN.search(line)])
+    if code != 0:
+        return BROKEN, ["keyframe decoding failed"]
+    if errors:
+        return (BROKEN if errors > CORRUPT_LIMIT else SUSPECT), [f"{errors} damaged keyframe(s)"]
+    return OK, []
+
+
+def _rank(verdict: str) -> int:
+    return (OK, SUSPECT, BROKEN).index(verdict)
+
+
+def _cache_key(input_file: str) -> str:
+    st = os.stat(input_file)
+    return f"{os.path.abspath(input_file)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _load_cache() -> dict:
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _store_cache(entries: dict) -> None:
+    """Merge entries into the cache file"""
+    with _cache_lock:
+        try:
+            cache = _load_cache()
+            cache.update(entries)
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, CACHE_FILE)
+        except Exception:
+            pass
+
+
+def scan(input_file: str, keyframes: bool = False,
+         cancelled: Callable[[], bool] = lambda: False, cache: Optional[dict] = None) -> Optional[ScanResult]:
+    """Check input_file for damage; None when it couldn't be scanned (no ffmpeg, cancelled).
+
+    cache is the loaded verdict cache of a batch: the verdict is looked up
+    and added there, and the caller writes it; without it the cache file is
+    read and updated for this one file.
+    """
+    try:
+        key = _cache_key(input_file)
+    except OSError:
+        return ScanResult(input_file, BROKEN, ["file not readable"])
+    with _cache_lock:
+        cached = (_load_cache() if cache is None else cache).get(key)
+    if cached and (cached.get("keyframes") or not keyframes):
+        return ScanResult(input_file, cached.get("verdict", OK), list(cached.get("problems", [])))
+
+    info = probe_media(input_file)
+    if not info.get("streams"):
+        # An empty probe is also what a missing ffprobe gives; only judge what ffmpeg can't open
+        if _demux(input_file, 0.0, cancelled) is None:
+            return None
+        verdict, problems = BROKEN, ["container not readable"]
+    else:
+        try:
+            duration = float(info.get("format", {}).get("duration") or 0)
+        except (TypeError, ValueError):
+            duration = 0.0
+        passes = [_demux(input_file, duration, cancelled)]
+        if keyframes and get_video_stream(info):
+            passes.append(_keyframes(input_file, cancelled))
+        if any(p is None for p in passes):
+            return None
+        verdict = max((p[0] for p in passes), key=_rank)
+        problems = [problem for p in passes for problem in p[1]]
+        if duration <= 0:
+            verdict = max(verdict, SUSPECT, key=_rank)
+            problems.append("no duration in the index")
+    entry = {"verdict": verdict, "problems": problems, "keyframes": keyframes}
+    if cache is None:
+        _store_cache({key: entry})
+    else:
+        with _cache_lock:
+            cache[key] = entry
+    return ScanResult(input_file, verdict, problems)
+
+
+def scan_all(paths: List[str], keyframes: bool = False, max_device_jobs: Optional[int] = None,
+             on_result: Optional[Callable[[ScanResult], None]] = None,
+             cancelled: Callable[[], bool] = lambda: False) -> Dict[str, ScanResult]:
+    """Scan paths in parallel, at most DeviceLimiter's cap per device at a time.
+
+    on_result is called (from worker threads) as each verdict comes in;
+    files that couldn't be scanned are left out of the result.
+    """
+    if not paths:
+        return {}
+    limiter = device_io.DeviceLimiter(max_device_jobs)
+    table = device_io.mounts()
+    gates: Dict[Optional[int], Optional[threading.Semaphore]] = {}
+    gate_of = {}
+    for path in paths:
+        device = device_io.device_of(path, table)
+        dev = device.dev if device else None
+        if dev not in gates:
+            cap = limiter.cap(device) if device else None
+            gates[dev] = threading.Semaphore(cap) if cap else None
+        gate_of[path] = gates[dev]
+
+    # Read the verdict cache once and write it once, not per file
+    with _cache_lock:
+        cache = _load_cache()
+
+    def run(path):
+        with gate_of[path] or nullcontext():
+            result = None if cancelled() else scan(path, keyframes, cancelled, cache)
+        if result is not None and on_result is not None:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        results = list(pool.map(run, paths))
+    _store_cache(cache)
+    return {r.path: r for r in results if r is not None}
+
+
+def quarantine(path: str, folder: str) -> Optional[str]:
+    """Move a broken file into folder (name made unique); its new path, None on failure"""
+    try:
+        os.makedirs(folder, exist_ok=True)
+        stem, ext = os.path.splitext(os.path.basename(path))
+        target = os.path.join(folder, stem + ext)
+        n = 1
+        while os.path.exists(target):
+            target = os.path.join(folder, f"{stem} ({n}){ext}")
+            n += 1
+        return shutil.move(path, target)
+    except OSError:
+        return None
@@ -0,0 +1,347 @@
+"""Concurrent encode scheduling for VidoEdit.
+
+JobScheduler runs queued files on worker threads, at most as many at a
+time as its ConcurrencyController allows. The controller measures the
+combined frames per second of all running ffmpeg jobs and hill-climbs on
+it: it tries one job more (or less), keeps the change when throughput
+went up and reverts it otherwise. Memory pressure always sheds a job and
+a host whose load is already above its core count isn't probed upwards,
+so encodes that bring their own thread pools (x265, AV1) don't
+oversubscribe the machine. Every decision is reported with the numbers
+that led to it.
+"""
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+import disk_space
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Seconds of saturated running (all allowed jobs busy) per measurement
+WINDOW_SECONDS = 20.0
+# Throughput must improve by this share to keep an extra job
+MIN_GAIN = 0.05
+# Shed a job above this share of used memory
+MEMORY_HIGH = 90.0
+# Don't probe upwards while the 1-minute load per core is above this
+LOAD_HIGH = 1.5
+# Windows to hold a settled level after probes in both directions failed
+SETTLED_WINDOWS = 6
+AUTO_MAX_JOBS = 8
+
+
+def auto_max_jobs() -> int:
+    """Default upper bound: half the cores, since encoders run several threads per job"""
+    return max(1, min(AUTO_MAX_JOBS, (os.cpu_count() or 2) // 2))
+
+
+class Decision:
+    """One change of the allowed number of jobs and why it was made"""
+
+    def __init__(self, old: int, new: int, reason: str, fps: float):
+        self.time = time.time()
+        self.old = old
+        self.new = new
+        self.reason = reason
+        self.fps = fps
+
+    def __str__(self):
+        return f"{self.old} -> {self.new}: {self.reason}"
+
+
+class ConcurrencyController:
+    """Hill-climbs the number of concurrent jobs on total frames per second"""
+
+    def __init__(self, max_jobs: Optional[int] = None, min_jobs: int = 1,
+                 window: float = WINDOW_SECONDS, log: Optional[Callable[[Decision], None]] = None):
+        self.min_jobs = max(1, min_jobs)
+        self.max_jobs = max(self.min_jobs, max_jobs or auto_max_jobs())
+        self.target = self.min_jobs
+        self.window = window
+        self.log = log
+        self.decisions: List[Decision] = []
+        self._lock = threading.Lock()
+        self._job_frames: Dict[Hashable, int] = {}
+        self._frames = 0
+        self._window_start: Optional[float] = None
+        self._window_frames = 0
+        self._direction = 1
+        self._probe_from = None  # (target, fps) before the current probe
+        self._held = 0
+        self._failed_probes = 0
+        if psutil is not None:
+            psutil.cpu_percent(None)  # start the CPU measurement interval
+
+    # -- inputs ----------------------------------------------------------
+
+    def report(self, job: Hashable, frames: int) -> None:
+        """Cumulative frames encoded so far by one job"""
+        with self._lock:
+            delta = frames - self._job_frames.get(job, 0)
+            if delta > 0:
+                self._frames += delta
+                self._job_frames[job] = frames
+
+    def finished(self, job: Hashable) -> None:
+        with self._lock:
+            self._job_frames.pop(job, None)
+
+    def reset_window(self) -> None:
+        """Discard the current measurement, e.g. while jobs are paused"""
+        with self._lock:
+            self._window_start = None
+
+    # -- control loop ----------------------------------------------------
+
+    def tick(self, running: int, now: Optional[float] = None) -> int:
+        """Called about once a second with the number of running jobs; returns the target"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            mem = _memory_percent()
+            if (mem is not None and mem >= MEMORY_HIGH and self.target > self.min_jobs
+                    and running <= self.target):
+                # Don't wait for a full window, swapping costs more than any gain.
+                # One job at a time: the running ones finish before it takes effect
+                self._probe_from = None
+                self._held = 0
+                self._change(self.target - 1, f"memory {mem:.0f}% used", 0.0)
+                self._window_start = None
+                return self.target
+            if running != self.target:
+                # Queue draining or jobs finishing after a decrease: fps says nothing
+                self._window_start = None
+                return self.target
+            if self._window_start is None:
+                self._window_start = now
+                self._window_frames = self._frames
+                return self.target
+            elapsed = now - self._window_start
+            if elapsed < self.window:
+                return self.target
+            fps = (self._frames - self._window_frames) / elapsed
+            self._window_start = None
+            self._decide(fps, mem)
+            return self.target
+
+    def _decide(self, fps: float, mem: Optional[float]) -> None:
+        cpu = psutil.cpu_percent(None) if psutil is not None else None
+        load = _load_per_core()
+        stats = f"{fps:.1f} fps"
+        if cpu is not None:
+            stats += f", CPU {cpu:.0f}%"
+        if load is not None:
+            stats += f", load {load:.2f}/core"
+
+        if self._probe_from is not None:
+            base_target, base_fps = self._probe_from
+            self._probe_from = None
+            self._held = 0
+            if self.target > base_target:
+                better = fps > base_fps * (1 + MIN_GAIN)
+            else:
+                better = fps >= base_fps * (1 - MIN_GAIN)  # same throughput with fewer jobs
+            if better:
+                # Worked; keep climbing in the same direction
+                self._failed_probes = 0
+                self._record(self.target, f"kept, {base_fps:.1f} -> {stats}", fps)
+                return
+            self._direction = -self._direction
+            self._failed_probes += 1
+            self._change(base_target, f"reverted, {base_fps:.1f} -> {stats}", fps)
+            return
+
+        self._held += 1
+        # After probes in both directions failed, settle for a while
+        settled = self._failed_probes and self._failed_probes % 2 == 0
+        if self._held < (SETTLED_WINDOWS if settled else 1):
+            return
+        new = self.target + self._direction
+        if not self.min_jobs <= new <= self.max_jobs:
+            self._direction = -self._direction
+            new = self.target + self._direction
+            if not self.min_jobs <= new <= self.max_jobs:
+                return
+        if new > self.target and load is not None and load > LOAD_HIGH:
+            return  # host is busy with other work
+        if new > self.target and mem is not None and mem >= MEMORY_HIGH - 10:
+            return
+        self._probe_from = (self.target, fps)
+        self._change(new, f"probing from {stats}", fps)
+
+    def _change(self, new: int, reason: str, fps: float) -> None:
+        new = max(self.min_jobs, min(self.max_jobs, new))
+        if new == self.target:
+            return
+        self._record(new, reason, fps)
+
+    def _record(self, new: int, reason: str, fps: float) -> None:
+        decision = Decision(self.target, new, reason, fps)
+        self.target = new
+        self.decisions.append(decision)
+        if self.log is not None:
+            try:
+                self.log(decision)
+            except Exception:
+                pass
+
+
+def _memory_percent() -> Optional[float]:
+    if psutil is None:
+        return None
+    try:
+        return psutil.virtual_memory().percent
+    except Exception:
+        return None
+
+
+def _load_per_core() -> Optional[float]:
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None  # Windows
+
+
+class JobScheduler:
+    """Runs worker(item) for every item, as many at once as the controller allows.
+
+    Running jobs are never stopped when the target drops; the scheduler
+    just waits for them before starting the next item. With a memory ledger
+    an item also has to fit the RAM budget (footprint(item) predicts its
+    peak); when the next item doesn't, a later one that fits goes first.
+    With a device limiter (io_paths(item) gives the paths it reads and
+    writes) items on the least busy devices go first and an item waits
+    while one of its devices is at its cap. With a space ledger
+    (outputs(item) predicts its output sizes) an item waits until its
+    outputs fit the free space left by the running jobs, and is dropped
+    into `refused` when they can't fit at all.
+    Items must be hashable, they identify the job in the ledger.
+    """
+
+    def __init__(self, controller: ConcurrencyController, tick_seconds: float = 1.0,
+                 ledger=None, footprint: Optional[Callable] = None,
+                 devices=None, io_paths: Optional[Callable] = None,
+                 space=None, outputs: Optional[Callable] = None):
+        self.controller = controller
+        self.tick_seconds = tick_seconds
+        self.ledger = ledger
+        self.footprint = footprint
+        self.devices = devices if io_paths is not None else None
+        self.io_paths = io_paths
+        self.space = space if outputs is not None else None
+        self.outputs = outputs
+        self.refused: List = []
+        self._upcoming: List = []
+        self._footprints: Dict[Hashable, object] = {}
+        self._io: Dict[Hashable, tuple] = {}
+        self._outputs: Dict[Hashable, list] = {}
+        self._wake = threading.Event()
+
+    def _paths(self, item) -> tuple:
+        paths = self._io.get(item)
+        if paths is None:
+            paths = self._io[item] = self.io_paths(item)
+        return paths
+
+    def _ordered(self, pending: deque) -> List:
+        """Pending items in the order they are tried"""
+        candidates = list(enumerate(pending))
+        if self.devices is not None:
+            # Interleave across devices: the least busy first, queue order among equals
+            candidates.sort(key=lambda c: (self.devices.load(*self._paths(c[1])), c[0]))
+        return [item for _, item in candidates]
+
+    def peek(self, n: Optional[int] = None) -> List:
+        """The next n pending items (all by default), in the order they are likely to start.
+
+        Safe to call from other threads; updated once per tick.
+        """
+        upcoming = self._upcoming
+        return list(upcoming if n is None else upcoming[:n])
+
+    def _take(self, pending: deque):
+        """Next item to start, or None while nothing pending fits the memory budget, devices and disks"""
+        use_ledger = self.ledger is not None and self.footprint is not None
+        if not use_ledger and self.devices is None and self.space is None:
+            return pending.popleft()
+        # Free and pending space per filesystem, measured once for all candidates of this pass
+        space_cache: Dict = {}
+        for item in self._ordered(pending):
+            if self.devices is not None and not self.devices.fits(*self._paths(item)):
+                self.devices.waiting(item, *self._paths(item))
+                continue
+            if self.space is not None:
+                outputs = self._outputs.get(item)
+                if outputs is None:
+                    outputs = self._outputs[item] = self.outputs(item)
+                verdict = self.space.check(outputs, space_cache)
+                if verdict == disk_space.REFUSE:
+                    self.space.refused(item, outputs, space_cache)
+                    pending.remove(item)
+                    self.refused.append(item)
+                    continue
+                if verdict == disk_space.WAIT:
+                    self.space.waiting(item, outputs, space_cache)
+                    continue
+            if use_ledger:
+                fp = self._footprints.get(item)
+                if fp is None:
+                    fp = self._footprints[item] = self.footprint(item)
+                if not self.ledger.fits(fp):
+                    self.ledger.waiting(item, fp)
+                    continue
+                self.ledger.reserve(item, fp)
+            if self.devices is not None:
+                self.devices.acquire(item, *self._paths(item))
+            if self.space is not None:
+                self.space.reserve(item, self._outputs[item])
+            pending.remove(item)
+            return item
+        return None
+
+    def run(self, items: Iterable, worker: Callable, cancelled: Callable[[], bool] = lambda: False,
+            paused: Callable[[], bool] = lambda: False) -> None:
+        pending = deque(items)
+        running: Dict[threading.Thread, object] = {}
+        self._upcoming = self._ordered(pending)
+
+        def run_item(item):
+            try:
+                worker(item)
+            finally:
+                if self.ledger is not None:
+                    self.ledger.release(item)
+                if self.devices is not None:
+                    self.devices.release(item)
+                if self.space is not None:
+                    self.space.release(item)
+                self._wake.set()
+
+        while pending or running:
+            for thread in [t for t in running if not t.is_alive()]:
+                del running[thread]
+            if cancelled():
+                pending.clear()
+            if self.ledger is not None:
+                self.ledger.sample()
+            if self.devices is not None:
+                self.devices.sample()
+            if paused():
+                self.controller.reset_window()
+            else:
+                target = self.controller.tick(len(running))
+                while pending and len(running) < target:
+                    item = self._take(pending)
+                    if item is None:
+                        break
+                    thread = threading.Thread(target=run_item, args=(item,), daemon=True)
+                    running[thread] = item
+                    thread.start()
+            self._upcoming = self._ordered(pending)
+            self._wake.wait(self.tick_seconds)
+            self._wake.clear()
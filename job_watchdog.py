@@ -0,0 +1,98 @@
+"""Stall detection for running encodes in VidoEdit.
+
+An ffmpeg stuck on a broken stream stops making progress without exiting,
+and the worker reading its output waits forever. StallWatchdog follows the
+frame counts the workers report and kills the whole process group of a job
+whose count hasn't moved for `timeout` seconds. Its output pipe closes, the
+worker sees the job end and can run the file again; retries read the input
+with ffmpeg's error-tolerant flags, which gets past most damaged packets.
+Paused batches don't count as stalled.
+"""
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_RETRIES = 1
+# Input flags for retries: drop corrupt packets instead of stopping on them
+TOLERANT_INPUT_ARGS = ["-fflags", "+discardcorrupt", "-err_detect", "ignore_err"]
+
+
+def retry_input_args(attempt: int) -> List[str]:
+    """Input flags for the given attempt (0 = first run)"""
+    return list(TOLERANT_INPUT_ARGS) if attempt > 0 else []
+
+
+class _Watched:
+    def __init__(self, job, label: str, now: float):
+        self.job = job
+        self.label = label
+        self.value = None
+        self.since = now
+        self.stalled = False
+
+
+class StallWatchdog:
+    """Kills jobs whose reported progress stood still for timeout seconds"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, paused: Callable[[], bool] = lambda: False,
+                 log: Optional[Callable[[str], None]] = None, interval: float = 1.0):
+        self.timeout = timeout
+        self.paused = paused
+        self.log = log
+        self.interval = interval
+        self._jobs: Dict[Hashable, _Watched] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_settings(cls, get_setting: Callable, paused: Callable[[], bool] = lambda: False,
+                      log: Optional[Callable[[str], None]] = None) -> "StallWatchdog":
+        try:
+            timeout = int(get_setting("stall_timeout_s", 0) or 0)
+        except (TypeError, ValueError):
+            timeout = 0
+        return cls(timeout if timeout > 0 else DEFAULT_TIMEOUT, paused, log)
+
+    def watch(self, key: Hashable, job, label: str = "") -> None:
+        """Start watching job (a process_control.JobProcess) under key"""
+        with self._lock:
+            self._jobs[key] = _Watched(job, label or str(key), time.monotonic())
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def progress(self, key: Hashable, value) -> None:
+        """Latest progress value of key's job (frames); only changes count"""
+        with self._lock:
+            entry = self._jobs.get(key)
+            if entry is not None and value != entry.value:
+                entry.value = value
+                entry.since = time.monotonic()
+
+    def unwatch(self, key: Hashable) -> bool:
+        """Stop watching key; True when its job was killed for stalling"""
+        with self._lock:
+            entry = self._jobs.pop(key, None)
+        return entry is not None and entry.stalled
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                if self.paused():
+                    for entry in self._jobs.values():
+                        entry.since = now
+                    continue
+                stalled = [e for e in self._jobs.values()
+                           if not e.stalled and now - e.since >= self.timeout]
+                for entry in stalled:
+                    entry.stalled = True
+            for entry in stalled:
+                entry.job.kill()
+                if self.log is not None:
+                    self.log(f"{entry.label}: no progress for {int(self.timeout)} s, stopped")
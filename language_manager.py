@@ -95,6 +95,21 @@ class LanguageManager:
         except Exception:
             pass
     
+    def get_setting(self, key: str, default=None):
+        """Get a saved setting"""
+        return self._load_config().get(key, default)
+
+    def set_setting(self, key: str, value):
+        """Save a setting to config"""
+        try:
+            self.CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+            config = self._load_config()
+            config[key] = value
+            with open(self.CONFIG_FILE, 'w', encoding='utf-8') as f:
+                json.dump(config, f, indent=2)
+        except Exception:
+            pass
+
     def get_current_language(self) -> str:
         """Get current language code"""
         return self._current_language
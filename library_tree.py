@@ -0,0 +1,75 @@
+"""Recursive library scanning and per-directory job fan-out for VidoEdit"""
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, List, Optional
+
+from dir_snapshot import DirectorySnapshot, get_snapshot
+
+SCAN_WORKERS = 16
+
+
+def _list_subdirs(snap: DirectorySnapshot) -> List[str]:
+    # Snapshot dirs exclude symlinked folders, which could loop back into the library
+    return [os.path.join(snap.directory, name) for name in snap.dirs if not name.startswith(".")]
+
+
+def scan_tree(root: str, workers: int = SCAN_WORKERS) -> List[DirectorySnapshot]:
+    """Snapshot root and every folder below it, listing folders in parallel.
+
+    Directory listing is I/O bound (especially on network shares), so each
+    folder is listed on a thread pool as soon as its parent has been read.
+    Hidden folders are skipped. Result is sorted by path.
+    """
+    root = os.path.abspath(root)
+    snapshots: List[DirectorySnapshot] = []
+
+    def visit(path):
+        snap = get_snapshot(path)
+        return snap, _list_subdirs(snap)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(visit, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                try:
+                    snap, subdirs = fut.result()
+                except OSError:
+                    continue  # unreadable folder; skip it rather than fail the pass
+                snapshots.append(snap)
+                for sub in subdirs:
+                    pending.add(pool.submit(visit, sub))
+    snapshots.sort(key=lambda s: s.directory.lower())
+    return snapshots
+
+
+def run_per_directory(jobs: Dict[str, Callable[[], object]], workers: int,
+                      progress: Optional[Callable[[str, str, object], None]] = None) -> Dict[str, object]:
+    """Run one callable per directory concurrently.
+
+    progress(directory, state, detail) is called with state "started", "done"
+    (detail = return value) or "failed" (detail = exception).
+    Returns {directory: return value or exception}.
+    """
+    results: Dict[str, object] = {}
+    if not jobs:
+        return results
+
+    def run(directory, func):
+        if progress:
+            progress(directory, "started", None)
+        return func()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = {pool.submit(run, d, f): d for d, f in jobs.items()}
+        for fut in as_completed(futures):
+            directory = futures[fut]
+            try:
+                results[directory] = fut.result()
+                if progress:
+                    progress(directory, "done", results[directory])
+            except Exception as ex:
+                results[directory] = ex
+                if progress:
+                    progress(directory, "failed", ex)
+    return results
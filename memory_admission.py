@@ -0,0 +1,253 @@
+"""Memory-aware admission of concurrent encodes for VidoEdit.
+
+Every job gets a predicted peak footprint before it starts: measured peaks
+of earlier jobs with the same encoder, preset and resolution class when
+there are any, otherwise a model of x265/x264 memory use (lookahead and
+frame threads scale with the frame size and get deeper with slower
+presets). The JobScheduler only starts a job while the reservations of
+all running jobs plus the new one fit the RAM budget, so a batch of 4K
+veryslow encodes doesn't end with the OOM killer taking the whole batch.
+
+Running jobs are sampled once a second. A job that gets close to its
+reservation is re-estimated on the spot, and its measured peak is stored
+in ~/.vidoedit/memory_history.json for the next prediction.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Hashable, NamedTuple, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+HISTORY_FILE = Path.home() / ".vidoedit" / "memory_history.json"
+
+# Peak MB per megapixel of the encoded frame size by preset (x265; x264 uses less)
+MB_PER_MEGAPIXEL = {
+    "ultrafast": 60, "superfast": 70, "veryfast": 80, "faster": 90, "fast": 110,
+    "medium": 150, "slow": 250, "slower": 350, "veryslow": 450, "placebo": 500,
+}
+X264_FACTOR = 0.5
+# Hardware encoders keep frames on the device; the host holds little more than the decoder
+HW_ENCODERS = ("nvenc", "qsv", "amf", "vaapi", "videotoolbox")
+HW_MB_PER_MEGAPIXEL = 40
+# Process, decoder and audio/subtitle copying
+BASE_MB = 150
+# Headroom on top of a measured peak
+HISTORY_MARGIN = 1.15
+# A job above this share of its reservation is re-estimated ...
+REESTIMATE_AT = 0.9
+# ... to its current use times this
+REESTIMATE_MARGIN = 1.25
+# Default budget: this share of physical RAM
+DEFAULT_BUDGET_SHARE = 0.8
+HISTORY_WEIGHT = 0.3
+
+
+class Footprint(NamedTuple):
+    key: str
+    mb: int
+
+
+def height_class(height: int) -> int:
+    """The standard frame height a source falls into, for keying measurements"""
+    for limit in (480, 576, 720, 1080, 1440, 2160):
+        if height <= limit:
+            return limit
+    return 4320
+
+
+def footprint_key(encoder: str, preset: str, height: int, variant: str = "") -> str:
+    return f"{encoder}|{preset}|{height_class(height or 1080)}|{variant}"
+
+
+def model_mb(encoder: str, preset: str, width: int, height: int) -> int:
+    """Predicted peak MB of one output without any measured history"""
+    megapixels = max(width or 1920, 1) * max(height or 1080, 1) / 1_000_000
+    if any(hw in encoder for hw in HW_ENCODERS):
+        per_mp = HW_MB_PER_MEGAPIXEL
+    else:
+        per_mp = MB_PER_MEGAPIXEL.get(preset, MB_PER_MEGAPIXEL["medium"])
+        if "264" in encoder:
+            per_mp *= X264_FACTOR
+    return int(BASE_MB + per_mp * megapixels)
+
+
+def _load_history() -> Dict[str, float]:
+    try:
+        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+_history_lock = threading.Lock()
+_history: Optional[Dict[str, float]] = None
+
+
+def _history_get(key: str) -> Optional[float]:
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = _load_history()
+        return _history.get(key)
+
+
+def record_peak(key: str, peak_mb: float) -> None:
+    """Blend a measured peak into the history of its footprint key"""
+    global _history
+    with _history_lock:
+        if _history is None:
+            _history = _load_history()
+        old = _history.get(key)
+        # Rising peaks count fully, falling ones slowly: underestimating is the costly side
+        if old is None or peak_mb > old:
+            _history[key] = round(peak_mb, 1)
+        else:
+            _history[key] = round(old + HISTORY_WEIGHT * (peak_mb - old), 1)
+        try:
+            HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = HISTORY_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(_history, f, indent=2)
+            os.replace(tmp, HISTORY_FILE)
+        except Exception:
+            pass
+
+
+def estimate(key: str, model: int) -> Footprint:
+    """Prediction for key: measured history with headroom, else the model"""
+    measured = _history_get(key)
+    if measured:
+        return Footprint(key, int(measured * HISTORY_MARGIN))
+    return Footprint(key, int(model))
+
+
+def _arg(args, flag: str, default: str) -> str:
+    return args[args.index(flag) + 1] if flag in args and args.index(flag) + 1 < len(args) else default
+
+
+def outputs_footprint(outputs, width: int, height: int) -> Footprint:
+    """Footprint of one ffmpeg run that decodes once into several multi_output specs"""
+    encoders = [(_arg(o["video_args"], "-c:v", "libx265"), _arg(o["video_args"], "-preset", "medium"))
+                for o in outputs]
+    model = BASE_MB + sum(model_mb(enc, preset, width, height) - BASE_MB for enc, preset in encoders)
+    key = footprint_key("+".join(e for e, _ in encoders), "+".join(p for _, p in encoders), height)
+    return estimate(key, model)
+
+
+def total_ram_mb() -> Optional[int]:
+    if psutil is not None:
+        return psutil.virtual_memory().total // (1024 * 1024)
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget_mb() -> Optional[int]:
+    total = total_ram_mb()
+    return int(total * DEFAULT_BUDGET_SHARE) if total else None
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB, None when it can't be read"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def job_label(job: Hashable) -> str:
+    """File name for log lines; jobs are paths or tuples ending in one"""
+    name = job[-1] if isinstance(job, tuple) and job else job
+    return os.path.basename(name) if isinstance(name, str) else str(name)
+
+
+class _Reservation:
+    def __init__(self, footprint: Footprint):
+        self.footprint = footprint
+        self.mb = footprint.mb
+        self.pid: Optional[int] = None
+        self.peak = 0.0
+
+
+class MemoryLedger:
+    """Reservations of the running jobs against a RAM budget (None = unlimited)"""
+
+    def __init__(self, budget_mb: Optional[int], log: Optional[Callable[[str], None]] = None):
+        self.budget_mb = budget_mb
+        self.log = log
+        self._jobs: Dict[Hashable, _Reservation] = {}
+        self._waiting = set()
+        self._lock = threading.Lock()
+
+    @property
+    def reserved_mb(self) -> int:
+        with self._lock:
+            return sum(r.mb for r in self._jobs.values())
+
+    def fits(self, footprint: Footprint) -> bool:
+        """Whether a job fits next to the running ones; the first job always does"""
+        with self._lock:
+            if self.budget_mb is None or not self._jobs:
+                return True
+            return sum(r.mb for r in self._jobs.values()) + footprint.mb <= self.budget_mb
+
+    def waiting(self, job: Hashable, footprint: Footprint) -> None:
+        """Note (once) that job is held back by the budget"""
+        with self._lock:
+            if job in self._waiting:
+                return
+            self._waiting.add(job)
+            reserved = sum(r.mb for r in self._jobs.values())
+        if self.log is not None:
+            self.log(f"{job_label(job)} waits, needs {footprint.mb} MB "
+                     f"({reserved} of {self.budget_mb} MB reserved)")
+
+    def reserve(self, job: Hashable, footprint: Footprint) -> None:
+        with self._lock:
+            self._jobs[job] = _Reservation(footprint)
+
+    def attach(self, job: Hashable, pid: int) -> None:
+        """The process to measure for job (call again for each process a job runs)"""
+        with self._lock:
+            res = self._jobs.get(job)
+            if res is not None:
+                res.pid = pid
+
+    def sample(self) -> None:
+        """Measure the running jobs and re-estimate those close to their reservation"""
+        with self._lock:
+            jobs = [(job, res) for job, res in self._jobs.items() if res.pid is not None]
+        for job, res in jobs:
+            used = rss_mb(res.pid)
+            if used is None:
+                continue
+            with self._lock:
+                res.peak = max(res.peak, used)
+                if used > res.mb * REESTIMATE_AT:
+                    old, res.mb = res.mb, int(used * REESTIMATE_MARGIN)
+                    message = f"{job_label(job)} uses {used:.0f} MB, reservation {old} -> {res.mb} MB"
+                else:
+                    message = None
+            if message and self.log is not None:
+                self.log(message)
+
+    def release(self, job: Hashable) -> None:
+        """Forget job and store its measured peak for later predictions"""
+        with self._lock:
+            res = self._jobs.pop(job, None)
+        if res is not None and res.peak > 0:
+            record_peak(res.footprint.key, res.peak)
@@ -0,0 +1,96 @@
+"""Single-decode multi-output encoding for VidoEdit.
+
+The source is decoded once and fanned out through ``split`` to one encoder per
+output, all inside a single ffmpeg process. Output specs are plain dicts:
+
+    {"path": str, "label": str, "filters": [str], "video_args": [...],
+     "stream_args": [...], "color_args": [...]}
+"""
+import os
+
+from ffmpeg_utils import get_ffmpeg_path
+
+# Same settings ConvertTab uses for its single-output runs
+CONVERT_PROFILES = {
+    "h265": {"vcodec": "libx265", "preset": "medium", "crf": 23},
+    "h264": {"vcodec": "libx264", "preset": "medium", "crf": 23},
+}
+
+# CompressTab's CRF presets, by translation key; also the "compressed" extra output
+COMPRESS_PRESETS = {
+    "preset_film": {"crf": 23, "preset": "slow"},
+    "preset_anime": {"crf": 20, "preset": "veryslow"},
+    "preset_4k": {"crf": 22, "preset": "slow"},
+    "preset_plex": {"crf": 24, "preset": "medium"},
+}
+
+# HDR10 signalling CompressTab writes on its main10 output
+HDR10_COLOR_ARGS = [
+    "-color_primaries", "bt2020",
+    "-color_trc", "smpte2084",
+    "-colorspace", "bt2020nc",
+]
+
+
+def convert_output(input_file, codec, path=None):
+    """Output spec matching ConvertTab's settings for codec ("h265"/"h264")"""
+    profile = CONVERT_PROFILES[codec]
+    return {
+        "path": path or os.path.splitext(input_file)[0] + f"_{codec}.mkv",
+        "label": codec,
+        "filters": [],
+        "video_args": [
+            "-c:v", profile["vcodec"],
+            "-preset", profile["preset"],
+            "-crf", str(profile["crf"]),
+        ],
+        # ConvertTab keeps ffmpeg's default pick: one audio track, copied
+        "stream_args": ["-map", "0:a:0?", "-c:a", "copy"],
+        "color_args": [],
+    }
+
+
+def compress_output(input_file, encoder, preset, path=None):
+    """Output spec matching CompressTab's CRF settings; preset is a COMPRESS_PRESETS value"""
+    return {
+        "path": path or os.path.splitext(input_file)[0] + "_compressed.mkv",
+        "label": "compressed",
+        "filters": ["format=p010le"],
+        "video_args": [
+            "-c:v", encoder,
+            "-profile:v", "main10",
+            "-preset", preset["preset"],
+            "-crf", str(preset["crf"]),
+        ],
+        "stream_args": ["-map", "0:a?", "-map", "0:s?", "-c:a", "copy", "-c:s", "copy"],
+        "color_args": list(HDR10_COLOR_ARGS),
+    }
+
+
+def build_filter_graph(outputs, shared_filters=None):
+    """Return the -filter_complex expression: shared filters, split, per-output chains"""
+    n = len(outputs)
+    head = ",".join(list(shared_filters or []) + [f"split={n}"])
+    graph = [f"[0:v:0]{head}" + "".join(f"[s{i}]" for i in range(n))]
+    for i, out in enumerate(outputs):
+        chain = ",".join(out.get("filters") or []) or "null"
+        graph.append(f"[s{i}]{chain}[v{i}]")
+    return ";".join(graph)
+
+
+def build_command(input_file, outputs, shared_filters=None, extra_input_args=None):
+    """Return one ffmpeg command writing every output from a single decode"""
+    cmd = [get_ffmpeg_path(), "-y"]
+    cmd += list(extra_input_args or [])
+    cmd += ["-i", input_file]
+    cmd += ["-filter_complex", build_filter_graph(outputs, shared_filters)]
+    for i, out in enumerate(outputs):
+        cmd += ["-map", f"[v{i}]"]
+        cmd += out["stream_args"]
+        cmd += out["video_args"]
+        cmd += out.get("color_args") or []
+        if out["path"].endswith(".tmp"):
+            # Replace mode writes "<input>.tmp"; the muxer can't be guessed from that
+            cmd += ["-f", "matroska"]
+        cmd += [out["path"]]
+    return cmd
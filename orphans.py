@@ -0,0 +1,166 @@
+"""Cleanup of partial outputs left behind by interrupted sessions, for VidoEdit.
+
+Failed and cancelled encodes remove their partial output themselves, but a
+session that is killed or crashes can't. While an encode runs, the files it
+writes (outputs in progress, "<name>.tmp", ".part" copies of staged outputs)
+are listed in ~/.vidoedit/active_outputs/<pid>-<session>.json together
+with the pid and start time of the session's process. sweep() on the next
+start removes the listed files of every session whose process is gone (or
+whose pid now belongs to a process started later), then the folders that
+left empty in the scratch area.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+JOURNAL_DIR = Path.home() / ".vidoedit" / "active_outputs"
+# Folder name of a session's scratch area (scratch.ScratchArea)
+SCRATCH_AREA = re.compile(r"vidoedit-\d+")
+
+# Start times of one process may differ by rounding between reads
+START_TOLERANCE = 1.0
+
+_lock = threading.Lock()
+_active: Counter = Counter()
+
+
+def _started(pid: int) -> Optional[float]:
+    """Start time of process pid (epoch seconds), None when it can't be read"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).create_time()
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", "r") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+# A pid alone is reused (restarts in containers often get the same one)
+_SESSION = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_STARTED = _started(os.getpid()) or time.time()
+
+
+def _journal_path() -> Path:
+    return JOURNAL_DIR / f"{_SESSION}.json"
+
+
+def _write() -> None:
+    path = _journal_path()
+    try:
+        if not _active:
+            path.unlink()
+            return
+        JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"pid": os.getpid(), "started": _STARTED, "paths": sorted(_active)}, f, indent=2)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def track(paths: Iterable[str]) -> None:
+    """Note files an encode is about to write"""
+    with _lock:
+        _active.update(os.path.abspath(p) for p in paths)
+        _write()
+
+
+def untrack(paths: Iterable[str]) -> None:
+    """The files are complete, published or already removed"""
+    with _lock:
+        _active.subtract(os.path.abspath(p) for p in paths)
+        for path in [p for p, n in _active.items() if n <= 0]:
+            del _active[path]
+        _write()
+
+
+def _alive(pid: int) -> bool:
+    """Whether pid still runs; unknown counts as alive so nothing in use is removed"""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _owner_alive(pid: int, started: Optional[float]) -> bool:
+    """Whether the session that wrote a journal still runs"""
+    if not _alive(pid):
+        return False
+    now = _started(pid)
+    if started is None or now is None:
+        return True  # can't tell a reused pid apart; keep the files
+    return abs(now - started) <= START_TOLERANCE
+
+
+def sweep() -> List[str]:
+    """Remove the partial outputs of sessions that ended without cleaning up"""
+    removed = []
+    try:
+        journals = list(JOURNAL_DIR.glob("*.json"))
+    except OSError:
+        return removed
+    for journal in journals:
+        if journal == _journal_path():
+            continue
+        try:
+            with open(journal, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        if isinstance(data, dict):
+            pid, started, paths = data.get("pid"), data.get("started"), data.get("paths")
+        else:
+            # Journals of older versions: "<pid>.json" holding the list of paths
+            pid, started, paths = journal.stem.split("-")[0], None, data
+        try:
+            pid = int(pid)
+        except (TypeError, ValueError):
+            continue
+        # This session never writes the old format, so a bare own pid is a dead predecessor's
+        if (started is not None or pid != os.getpid()) and _owner_alive(pid, started):
+            continue
+        for path in paths if isinstance(paths, list) else []:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                continue
+            # Staged outputs sit in <scratch>/vidoedit-<pid>/<n>/; drop the emptied folders
+            job_folder = os.path.dirname(path)
+            area = os.path.dirname(job_folder)
+            if SCRATCH_AREA.fullmatch(os.path.basename(area)):
+                for folder in (job_folder, area):
+                    try:
+                        os.rmdir(folder)
+                    except OSError:
+                        break
+        try:
+            journal.unlink()
+        except OSError:
+            pass
+    return removed
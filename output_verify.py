@@ -0,0 +1,147 @@
+"""Verification of finished outputs before they replace their originals, for VidoEdit.
+
+ffmpeg exiting with 0 doesn't prove the output is whole: a full disk during
+the final header rewrite, a dropped NAS connection or a muxer bug can still
+leave a file that stops early or doesn't play. Before ConvertTab's replace
+mode overwrites a source, verify() checks the output:
+
+- its duration matches the source's and it has the expected streams (probe),
+- sampled segments spread over the file, plus its last seconds, decode
+  without errors (in parallel, each decode multithreaded),
+- when the output will be copied to another filesystem, a SHA-256 of it is
+  taken in the same pass, and the copy is read back and compared with it
+  before it takes the original's place. A rename needs no checksum, so the
+  usual case doesn't read the whole output once more.
+
+The check runs on the publisher thread, so the next encode is already
+running while the previous output is verified.
+"""
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from ffmpeg_utils import get_ffmpeg_path, probe_media
+from scratch import file_sha256
+from video_analysis import sample_timestamps
+
+SAMPLES = 4
+WINDOW = 3.0
+# Allowed difference between source and output duration
+DURATION_TOLERANCE = 1.0
+DURATION_SHARE = 0.005
+
+
+class VerificationError(Exception):
+    """An output failed verification; the original must be kept"""
+
+    def __init__(self, problems: List[str]):
+        super().__init__(", ".join(problems))
+        self.problems = problems
+
+
+class Verification(NamedTuple):
+    problems: List[str]
+    sha256: Optional[str]
+
+
+def _duration(info) -> float:
+    try:
+        return float(info.get("format", {}).get("duration") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _counts(info) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for stream in info.get("streams", []):
+        if stream.get("disposition", {}).get("attached_pic"):
+            continue
+        kind = stream.get("codec_type")
+        counts[kind] = counts.get(kind, 0) + 1
+    return counts
+
+
+def expected_streams(source_info, first_audio_only: bool = True) -> Dict[str, int]:
+    """Streams an output of source_info must have at least (one video, the kept audio)"""
+    counts = _counts(source_info)
+    expected = {"video": min(counts.get("video", 0), 1)}
+    if counts.get("audio"):
+        expected["audio"] = 1 if first_audio_only else counts["audio"]
+    return expected
+
+
+def decode_window(path: str, timestamp: float, window: float) -> Optional[str]:
+    """Decode one window of path's first video and audio stream; a problem, or None when clean"""
+    cmd = [
+        get_ffmpeg_path(), "-hide_banner", "-nostdin", "-v", "error",
+        "-threads", "0", "-ss", str(timestamp), "-t", str(window),
+        "-i", path, "-map", "0:v:0?", "-map", "0:a:0?", "-f", "null", "-",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, errors="replace")
+    except FileNotFoundError:
+        return "ffmpeg not found"
+    errors = [line for line in result.stderr.splitlines() if line.strip()]
+    if result.returncode != 0 or errors:
+        return f"decode errors at {int(timestamp)} s"
+    return None
+
+
+def sha256_of(path: str) -> Optional[str]:
+    try:
+        return file_sha256(path)
+    except OSError:
+        return None
+
+
+def verify(source: str, output: str, expected: Optional[Dict[str, int]] = None,
+           samples: int = SAMPLES, window: float = WINDOW, workers: Optional[int] = None,
+           checksum: bool = True) -> Verification:
+    """Check output against source; problems is empty when output may replace source.
+
+    sha256 is only taken with checksum (None otherwise).
+    """
+    source_info = probe_media(source)
+    info = probe_media(output)
+    if not info.get("streams"):
+        return Verification(["output not readable"], None)
+    problems = []
+
+    duration = _duration(info)
+    expected_duration = _duration(source_info)
+    if expected_duration and abs(duration - expected_duration) > max(DURATION_TOLERANCE,
+                                                                      expected_duration * DURATION_SHARE):
+        problems.append(f"duration {int(duration)} s instead of {int(expected_duration)} s")
+
+    counts = _counts(info)
+    expected = expected if expected is not None else expected_streams(source_info)
+    for kind, count in expected.items():
+        if counts.get(kind, 0) < count:
+            problems.append(f"{counts.get(kind, 0)} {kind} stream(s) instead of {count}")
+
+    stamps = sample_timestamps(duration, samples, window)
+    if duration > window:
+        stamps.append(round(duration - window, 2))  # the end is where truncation shows
+    workers = workers or min(len(stamps) + 1, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        hashing = pool.submit(sha256_of, output) if checksum else None
+        decoded = list(pool.map(lambda ts: decode_window(output, ts, window), sorted(set(stamps))))
+        sha = hashing.result() if hashing is not None else None
+    problems += [p for p in dict.fromkeys(decoded) if p]
+    if checksum and sha is None:
+        problems.append("output not readable")
+    return Verification(problems, sha)
+
+
+def check(source: str, output: str, expected: Optional[Dict[str, int]] = None,
+          checksum: bool = True) -> Dict[str, str]:
+    """Publisher check: raise VerificationError unless output passes.
+
+    Returns {output: sha256} for move_file to compare a copy against; pass
+    checksum=False when the output will be renamed into place ({} then).
+    """
+    result = verify(source, output, expected, checksum=checksum)
+    if result.problems:
+        raise VerificationError(result.problems)
+    return {output: result.sha256} if result.sha256 else {}
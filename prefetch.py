@@ -0,0 +1,252 @@
+"""Input prefetching for encodes of network-hosted files in VidoEdit.
+
+With the library on a NAS, ffmpeg reading straight from the share waits on
+network latency between every read. Prefetcher copies the next few queued
+inputs into the scratch area in the background, so the encode of one file
+reads a local copy while the next ones are already coming over the wire.
+
+Copies use copy_file_range or sendfile where the platform has them (the
+kernel moves the data without a round trip through Python) and fall back
+to plain reads and writes; an optional bandwidth cap keeps the copying from
+starving other users of the share. Files on the scratch filesystem itself
+or on a local disk are not copied.
+"""
+import errno
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import device_io
+from scratch import ScratchArea
+
+CHUNK = 8 * 1024 * 1024
+DEFAULT_DEPTH = 2
+# errno values meaning "this copy method doesn't work for these files"
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.EPERM,
+                getattr(errno, "ENOTSOCK", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EOPNOTSUPP)}
+
+# A copy this far along is waited for; a less advanced one is abandoned for the share
+WAIT_FOR_COPY_AT = 0.5
+
+# Per-file states
+_COPYING, _READY, _IN_USE, _SKIPPED, _DONE = "copying", "ready", "in_use", "skipped", "done"
+
+
+def is_network_path(path: str, mounts: Optional[List[tuple]] = None) -> bool:
+    """Whether reading path goes over the network (best guess off Linux)"""
+    if os.name == "nt":
+        return path.startswith("\\\\")
+    mounts = device_io.mounts() if mounts is None else mounts
+    if not mounts:
+        return path.startswith("/Volumes/")  # macOS mounts shares (and external disks) here
+    mount = device_io.mount_of(path, mounts)
+    return mount is not None and mount[1] in device_io.NETWORK_FS
+
+
+def copy_file(src: str, dst: str, rate_bytes: Optional[float] = None,
+              cancelled: Callable[[], bool] = lambda: False,
+              progress: Optional[Callable[[float], None]] = None) -> None:
+    """Copy src to dst at no more than rate_bytes per second; raises InterruptedError on cancel"""
+    infd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        outfd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            size = os.fstat(infd).st_size
+            method = "copy_file_range" if hasattr(os, "copy_file_range") else (
+                "sendfile" if hasattr(os, "sendfile") else "read")
+            copied = 0
+            start = time.monotonic()
+            while copied < size:
+                if cancelled():
+                    raise InterruptedError(src)
+                count = min(CHUNK, size - copied)
+                try:
+                    if method == "copy_file_range":
+                        done = os.copy_file_range(infd, outfd, count, copied, copied)
+                    elif method == "sendfile":
+                        done = os.sendfile(outfd, infd, copied, count)
+                    else:
+                        data = os.pread(infd, count, copied) if hasattr(os, "pread") else _read_at(infd, count, copied)
+                        done = _write_all(outfd, data, copied)
+                except OSError as e:
+                    if method != "read" and e.errno in _UNSUPPORTED and copied == 0:
+                        method = "sendfile" if method == "copy_file_range" and hasattr(os, "sendfile") else "read"
+                        continue
+                    raise
+                if done == 0:
+                    break  # file shrank while copying
+                copied += done
+                if progress is not None:
+                    progress(copied / size)
+                if rate_bytes:
+                    ahead = copied / rate_bytes - (time.monotonic() - start)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        finally:
+            os.close(outfd)
+    finally:
+        os.close(infd)
+    try:
+        st = os.stat(src)
+        os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except OSError:
+        pass
+
+
+def _read_at(fd: int, count: int, offset: int) -> bytes:
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, count)
+
+
+def _write_all(fd: int, data: bytes, offset: int) -> int:
+    os.lseek(fd, offset, os.SEEK_SET)
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    return len(data)
+
+
+class Prefetcher:
+    """Copies the next `depth` inputs of a batch into the scratch area.
+
+    upcoming() gives the pending inputs in the order the scheduler will start
+    them (JobScheduler.peek); without it, or before it has any, the batch's
+    own order is used.
+    """
+
+    def __init__(self, area: ScratchArea, paths: List[str], depth: int = DEFAULT_DEPTH,
+                 rate_mb_s: Optional[float] = None, log: Optional[Callable[[str], None]] = None,
+                 upcoming: Optional[Callable[[], List[str]]] = None):
+        self.area = area
+        self.depth = max(1, depth)
+        self.rate_bytes = rate_mb_s * 1024 * 1024 if rate_mb_s else None
+        self.log = log
+        self.upcoming = upcoming
+        mounts = device_io.mounts()
+        scratch_dev = _device(area.root)
+        self._order = [p for p in paths if _device(p) != scratch_dev and is_network_path(p, mounts)]
+        self._wanted = set(self._order)
+        self._state: Dict[str, str] = {}
+        self._local: Dict[str, str] = {}
+        self._progress: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if self._order:
+            self._thread.start()
+
+    @classmethod
+    def for_batch(cls, area: Optional[ScratchArea], paths: List[str], get_setting: Callable,
+                  log: Optional[Callable[[str], None]] = None,
+                  upcoming: Optional[Callable[[], List[str]]] = None) -> Optional["Prefetcher"]:
+        """Prefetcher configured from the settings, None when prefetching is off"""
+        if area is None:
+            return None
+        try:
+            depth = int(get_setting("prefetch_depth", DEFAULT_DEPTH))
+            rate = float(get_setting("prefetch_mb_s", 0) or 0)
+        except (TypeError, ValueError):
+            depth, rate = DEFAULT_DEPTH, 0
+        if depth <= 0:
+            return None
+        return cls(area, paths, depth, rate or None, log, upcoming)
+
+    def _ahead(self) -> int:
+        return sum(1 for s in self._state.values() if s in (_COPYING, _READY))
+
+    def _next(self) -> Optional[str]:
+        order = self._order
+        if self.upcoming is not None:
+            # Items start out of queue order (least busy disk first, whatever fits memory)
+            order = [p for p in self.upcoming() if p in self._wanted] or order
+        for path in order:
+            if path not in self._state:
+                return path
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (self._ahead() >= self.depth or self._next() is None):
+                    if self._next() is None:
+                        return
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path = self._next()
+                self._state[path] = _COPYING
+            folder = None
+            try:
+                size_mb = os.path.getsize(path) // (1024 * 1024) + 1
+                folder = self.area.reserve(("prefetch", path), size_mb)
+                if folder is None:
+                    raise OSError(errno.ENOSPC, "scratch quota")
+                local = os.path.join(folder, os.path.basename(path))
+                copy_file(path, local, self.rate_bytes,
+                          cancelled=lambda: self._closed or self._state.get(path) != _COPYING,
+                          progress=lambda done: self._progress.__setitem__(path, done))
+            except (OSError, InterruptedError) as e:
+                if folder is not None:
+                    self.area.release(("prefetch", path))
+                with self._cond:
+                    abandoned = self._state.get(path) == _SKIPPED
+                    self._state[path] = _SKIPPED
+                    self._cond.notify_all()
+                if self.log is not None and not self._closed and not abandoned:
+                    self.log(f"{os.path.basename(path)}: {e}")
+                continue
+            with self._cond:
+                self._local[path] = local
+                self._state[path] = _READY
+                self._cond.notify_all()
+
+    def acquire(self, path: str) -> str:
+        """The path ffmpeg should read: the local copy once it's there, else the original"""
+        with self._cond:
+            state = self._state.get(path)
+            if state is None:
+                # Not started yet; reading the share directly beats waiting for the queue
+                self._state[path] = _SKIPPED
+                self._cond.notify_all()
+                return path
+            if state == _COPYING and self._progress.get(path, 0.0) < WAIT_FOR_COPY_AT:
+                # Barely started (e.g. the first file of the batch): read the share directly
+                self._state[path] = _SKIPPED
+                self._cond.notify_all()
+                return path
+            while state == _COPYING:
+                self._cond.wait()
+                state = self._state.get(path)
+            if state != _READY:
+                return path
+            self._state[path] = _IN_USE
+            self._cond.notify_all()
+            return self._local[path]
+
+    def release(self, path: str) -> None:
+        """The job reading path is done; drop its local copy"""
+        with self._cond:
+            if self._state.get(path) != _IN_USE:
+                return
+            self._state[path] = _DONE
+            self._cond.notify_all()
+        self.area.release(("prefetch", path))
+
+    def close(self) -> None:
+        """Stop copying and drop every local copy"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+        for path, state in list(self._state.items()):
+            if state in (_READY, _IN_USE):
+                self.area.release(("prefetch", path))
+
+
+def _device(path: str) -> Optional[int]:
+    try:
+        return os.stat(path if os.path.exists(path) else os.path.dirname(path)).st_dev
+    except OSError:
+        return None
@@ -0,0 +1,259 @@
+"""Launching and controlling ffmpeg processes for VidoEdit.
+
+Every job runs in its own session/process group, so pause (SIGSTOP),
+resume (SIGCONT) and cancel reach ffmpeg and anything it spawns. On Linux
+jobs can run at a lower CPU priority (nice) and I/O class (ionice), pinned
+to a set of cores (taskset) and, where systemd manages a cgroup v2
+hierarchy, inside a scope with a CPU quota and memory limit.
+
+Priorities are applied by exec wrappers (nice/ionice/systemd-run exec the
+command in place), so they are set before ffmpeg starts its first thread
+and the pid stays ffmpeg's.
+"""
+import os
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, FrozenSet, List, Optional
+
+from cpu_affinity import format_cpulist, pin_process
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+IS_POSIX = os.name == "posix"
+IO_CLASSES = {"realtime": "1", "best-effort": "2", "idle": "3"}
+# "Low priority" in the settings
+LOW_PRIORITY_NICE = 10
+
+
+class ResourceLimits:
+    """Per-job priority and quota; the defaults change nothing"""
+
+    def __init__(self, nice: int = 0, io_class: Optional[str] = None, io_level: int = 4,
+                 cpu_percent: Optional[int] = None, memory_mb: Optional[int] = None,
+                 cpus: Optional[FrozenSet[int]] = None):
+        self.nice = nice
+        self.io_class = io_class
+        self.io_level = io_level
+        self.cpu_percent = cpu_percent  # 100 = one full core
+        self.memory_mb = memory_mb
+        self.cpus = cpus  # pin to these cores
+
+    @classmethod
+    def from_settings(cls, get_setting: Callable) -> "ResourceLimits":
+        """Build limits from the settings dialog values"""
+        low = bool(get_setting("low_priority", False))
+
+        def positive_int(key):
+            try:
+                value = int(get_setting(key, 0) or 0)
+            except (TypeError, ValueError):
+                return None
+            return value if value > 0 else None
+
+        return cls(
+            nice=LOW_PRIORITY_NICE if low else 0,
+            io_class="idle" if low else None,
+            cpu_percent=positive_int("cpu_limit_percent"),
+            memory_mb=positive_int("memory_limit_mb"),
+        )
+
+    def has_quota(self) -> bool:
+        return bool(self.cpu_percent or self.memory_mb)
+
+
+@lru_cache(maxsize=None)
+def cgroup_scopes_available() -> bool:
+    """Whether transient systemd scopes (cgroup v2) can be created for this user"""
+    if not IS_POSIX or not os.path.exists("/sys/fs/cgroup/cgroup.controllers"):
+        return False
+    if not shutil.which("systemd-run"):
+        return False
+    try:
+        result = subprocess.run(["systemd-run", "--user", "--scope", "--quiet", "true"],
+                                capture_output=True, timeout=10)
+        return result.returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+def wrap_command(cmd: List[str], limits: Optional[ResourceLimits]) -> List[str]:
+    """Prefix cmd with the wrappers that apply limits (POSIX only)"""
+    if limits is None or not IS_POSIX:
+        return list(cmd)
+    prefix: List[str] = []
+    if limits.has_quota() and cgroup_scopes_available():
+        prefix += ["systemd-run", "--user", "--scope", "--quiet", "--collect"]
+        if limits.cpu_percent:
+            prefix += ["-p", f"CPUQuota={limits.cpu_percent}%"]
+        if limits.memory_mb:
+            prefix += ["-p", f"MemoryMax={limits.memory_mb}M"]
+        prefix += ["--"]
+    if limits.nice and shutil.which("nice"):
+        prefix += ["nice", "-n", str(limits.nice)]
+    if limits.io_class in IO_CLASSES and shutil.which("ionice"):
+        prefix += ["ionice", "-c", IO_CLASSES[limits.io_class]]
+        if limits.io_class != "idle":
+            prefix += ["-n", str(limits.io_level)]
+    if limits.cpus and shutil.which("taskset"):
+        prefix += ["taskset", "-c", format_cpulist(limits.cpus)]
+    if prefix and shutil.which(cmd[0]) is None:
+        # The wrapper would start and exit 127; fail like a plain Popen instead
+        raise FileNotFoundError(cmd[0])
+    return prefix + list(cmd)
+
+
+class JobProcess:
+    """A launched job: a Popen plus process-group pause/resume/kill"""
+
+    def __init__(self, popen: subprocess.Popen, limits: Optional[ResourceLimits]):
+        self.popen = popen
+        self.limits = limits
+        self.started = time.time()
+        self.paused = False
+
+    @property
+    def pid(self) -> int:
+        return self.popen.pid
+
+    def poll(self):
+        return self.popen.poll()
+
+    def wait(self, timeout=None):
+        return self.popen.wait(timeout)
+
+    @property
+    def returncode(self):
+        return self.popen.returncode
+
+    def _signal_group(self, sig) -> None:
+        try:
+            os.killpg(self.popen.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _psutil_tree(self):
+        try:
+            proc = psutil.Process(self.popen.pid)
+            return [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return []
+
+    def pause(self) -> None:
+        if self.paused or self.popen.poll() is not None:
+            return
+        if IS_POSIX:
+            self._signal_group(signal.SIGSTOP)
+        elif psutil is not None:
+            for proc in self._psutil_tree():
+                try:
+                    proc.suspend()
+                except psutil.Error:
+                    pass
+        else:
+            return
+        self.paused = True
+
+    def resume(self) -> None:
+        if not self.paused:
+            return
+        if IS_POSIX:
+            self._signal_group(signal.SIGCONT)
+        elif psutil is not None:
+            for proc in self._psutil_tree():
+                try:
+                    proc.resume()
+                except psutil.Error:
+                    pass
+        self.paused = False
+
+    def kill(self) -> None:
+        """Kill the whole process group; works on paused jobs too"""
+        if self.popen.poll() is not None:
+            return
+        if IS_POSIX:
+            self._signal_group(signal.SIGKILL)
+        else:
+            if psutil is not None:
+                for proc in reversed(self._psutil_tree()):
+                    try:
+                        proc.kill()
+                    except psutil.Error:
+                        pass
+            try:
+                self.popen.kill()
+            except OSError:
+                pass
+        self.paused = False
+
+
+def launch(cmd: List[str], limits: Optional[ResourceLimits] = None, **popen_kwargs) -> JobProcess:
+    """Start cmd in a new process group with limits applied"""
+    if IS_POSIX:
+        popen_kwargs.setdefault("start_new_session", True)
+    else:
+        flags = popen_kwargs.get("creationflags", 0) | getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+        if limits is not None and limits.nice >= 15:
+            flags |= getattr(subprocess, "IDLE_PRIORITY_CLASS", 0)
+        elif limits is not None and limits.nice > 0:
+            flags |= getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0)
+        popen_kwargs["creationflags"] = flags
+    cmd = wrap_command(cmd, limits)
+    popen = subprocess.Popen(cmd, **popen_kwargs)
+    if limits is not None and limits.cpus and "taskset" not in cmd:
+        pin_process(popen.pid, limits.cpus)
+    return JobProcess(popen, limits)
+
+
+class JobSet:
+    """The running jobs of one tab, for cancel-all and pause/resume-all"""
+
+    def __init__(self):
+        self._jobs: List[JobProcess] = []
+        self._lock = threading.Lock()
+        self.paused = False
+
+    def launch(self, cmd: List[str], limits: Optional[ResourceLimits] = None, **popen_kwargs) -> JobProcess:
+        job = launch(cmd, limits, **popen_kwargs)
+        with self._lock:
+            self._jobs.append(job)
+            if self.paused:
+                job.pause()
+        return job
+
+    def discard(self, job: JobProcess) -> None:
+        with self._lock:
+            if job in self._jobs:
+                self._jobs.remove(job)
+
+    def running(self) -> List[JobProcess]:
+        with self._lock:
+            self._jobs = [j for j in self._jobs if j.poll() is None]
+            return list(self._jobs)
+
+    def pause_all(self) -> None:
+        with self._lock:
+            self.paused = True
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.pause()
+
+    def resume_all(self) -> None:
+        with self._lock:
+            self.paused = False
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.resume()
+
+    def kill_all(self) -> None:
+        with self._lock:
+            self.paused = False
+            jobs, self._jobs = list(self._jobs), []
+        for job in jobs:
+            job.kill()
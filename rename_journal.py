@@ -0,0 +1,315 @@
+"""Write-ahead rename journal for VidoEdit.
+
+Every rename batch is recorded before any file is touched: the ordered list of
+moves is written and fsynced, each move is marked (durably) as it completes,
+and the batch is closed when all moves are done. Only the move after the
+last mark can be in doubt after a crash, and that one is resolved against
+the filesystem. An interrupted batch can be rolled
+forward on the next start, and finished batches can be undone.
+
+Journal files live in ~/.vidoedit/rename_journal/ as JSON lines:
+    {"type": "batch", "id": ..., "seq": ..., "directory": ..., "ops": [[src, dst], ...], "group": ...}
+    {"type": "done", "n": <ops completed so far>}
+    {"type": "state", "state": "done" | "undone" | "failed"}
+"""
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+TEMP_SUFFIX = ".__renametemp__"
+KEEP_BATCHES = 50
+
+
+class JournalError(Exception):
+    """Raised when a batch can't be applied, recovered or undone safely"""
+
+
+def order_operations(plan: List[Tuple[str, str]], temp_tag: str) -> List[Tuple[str, str]]:
+    """Order the moves of a rename plan so no move overwrites a pending source.
+
+    A plan where every target is unique forms disjoint chains and cycles.
+    Chains are applied from their far end; only files on a cycle get a hop
+    through a temporary name. Runs in O(n).
+    """
+    mapping = {src: tgt for src, tgt in plan if src != tgt}
+    incoming = set(mapping.values())
+    ops: List[Tuple[str, str]] = []
+    visited = set()
+
+    # Chains start at a source nobody moves into
+    for start in mapping:
+        if start in incoming:
+            continue
+        chain = []
+        node = start
+        while node in mapping and node not in visited:
+            visited.add(node)
+            chain.append((node, mapping[node]))
+            node = mapping[node]
+        ops.extend(reversed(chain))
+
+    # Whatever is left lies on a cycle
+    for start in mapping:
+        if start in visited:
+            continue
+        cycle = []
+        node = start
+        while node not in visited:
+            visited.add(node)
+            cycle.append(node)
+            node = mapping[node]
+        tmp = f"{start}{TEMP_SUFFIX}{temp_tag}"
+        ops.append((start, tmp))
+        # Walk the cycle backwards: each file moves into the name just vacated
+        for node in reversed(cycle[1:]):
+            ops.append((node, mapping[node]))
+        ops.append((tmp, mapping[start]))
+    return ops
+
+
+def _fsync_dir(path: str) -> None:
+    # Directory fsync makes the rename itself durable; not available on Windows
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class RenameJournal:
+    """Applies rename plans through a crash-safe journal"""
+
+    JOURNAL_DIR = Path.home() / ".vidoedit" / "rename_journal"
+
+    def __init__(self, journal_dir: Optional[Path] = None):
+        self.journal_dir = Path(journal_dir) if journal_dir else self.JOURNAL_DIR
+
+    # -- journal files -------------------------------------------------
+
+    def _path(self, batch_id: str) -> Path:
+        return self.journal_dir / f"{batch_id}.jsonl"
+
+    def _read(self, path: Path) -> Optional[Dict]:
+        """Return {"id", "directory", "ops", "done", "state", ...} for a journal file"""
+        batch = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line torn by a crash; recovery appends after it
+                        continue
+                    if rec.get("type") == "batch":
+                        batch = dict(rec, done=0, state="pending")
+                    elif batch is None:
+                        continue
+                    elif rec.get("type") == "done":
+                        batch["done"] = max(batch["done"], int(rec.get("n", 0)))
+                    elif rec.get("type") == "state":
+                        batch["state"] = rec.get("state")
+        except OSError:
+            return None
+        return batch
+
+    def batches(self) -> List[Dict]:
+        """All journaled batches, oldest first"""
+        if not self.journal_dir.is_dir():
+            return []
+        result = []
+        for path in self.journal_dir.glob("*.jsonl"):
+            batch = self._read(path)
+            if batch:
+                result.append(batch)
+        # Journals from before batches carried a sequence number count as seq 0
+        result.sort(key=lambda b: (b.get("seq", 0), b.get("created", 0)))
+        return result
+
+    def _next_seq(self) -> int:
+        """Sequence number for a new batch, above every journaled one"""
+        seqs = [0]
+        for path in self.journal_dir.glob("*.jsonl"):
+            parts = path.stem.split("-")
+            if len(parts) == 4 and parts[2].isdigit():
+                seqs.append(int(parts[2]))
+        return max(seqs) + 1
+
+    @staticmethod
+    def _units(batches: List[Dict]) -> List[List[Dict]]:
+        """Bundle batches sharing a group (one library pass) into a single unit, keeping order"""
+        units: Dict[str, List[Dict]] = {}
+        for batch in batches:
+            units.setdefault(batch.get("group") or batch["id"], []).append(batch)
+        return list(units.values())
+
+    def _begin(self, directory: str, ops: List[Tuple[str, str]], undo_of: Optional[str] = None,
+               group: Optional[str] = None):
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        # Ids sort by sequence within a second: "<time>-<seq>-<random>"
+        seq = self._next_seq()
+        batch_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{seq:06d}-{uuid.uuid4().hex[:8]}"
+        header = {
+            "type": "batch",
+            "id": batch_id,
+            "seq": seq,
+            "directory": os.path.abspath(directory),
+            "created": time.time(),
+            "ops": [list(op) for op in ops],
+        }
+        if undo_of:
+            header["undo_of"] = undo_of
+        if group:
+            header["group"] = group
+        path = self._path(batch_id)
+        f = open(path, "w", encoding="utf-8")
+        f.write(json.dumps(header) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+        _fsync_dir(str(self.journal_dir))
+        return batch_id, f
+
+    @staticmethod
+    def _mark(f, record: Dict, durable: bool) -> None:
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        if durable:
+            os.fsync(f.fileno())
+
+    def _open_for_append(self, batch_id: str):
+        path = self._path(batch_id)
+        f = open(path, "a+", encoding="utf-8")
+        # Terminate a line torn by a crash so new records start cleanly
+        if f.tell() > 0:
+            f.seek(f.tell() - 1)
+            if f.read(1) != "\n":
+                f.write("\n")
+        return f
+
+    def _append_state(self, batch_id: str, state: str) -> None:
+        with self._open_for_append(batch_id) as f:
+            self._mark(f, {"type": "state", "state": state}, durable=True)
+
+    # -- execution -----------------------------------------------------
+
+    def _run(self, f, directory: str, ops: List[Tuple[str, str]], start: int = 0, progress=None,
+             resume: bool = False) -> None:
+        """Execute ops[start:], checking each one against the filesystem first.
+
+        Every move is made durable before its mark, so when resuming only
+        ops[start] may already have happened.
+        """
+        total = len(ops)
+        for i in range(start, total):
+            src, dst = ops[i]
+            src_path = os.path.join(directory, src)
+            dst_path = os.path.join(directory, dst)
+            src_exists = os.path.lexists(src_path)
+            dst_exists = os.path.lexists(dst_path)
+            if src_exists and not dst_exists:
+                os.rename(src_path, dst_path)
+            elif (src_exists and dst_exists and src != dst and src.casefold() == dst.casefold()
+                  and os.path.samefile(src_path, dst_path)):
+                os.rename(src_path, dst_path)  # case-only rename on a case-insensitive FS
+            elif dst_exists and not src_exists and resume and i == start:
+                pass  # moved right before the crash, its mark not written yet
+            else:
+                raise JournalError(f"Cannot move {src} -> {dst}: "
+                                   + ("target exists" if dst_exists else "source missing"))
+            _fsync_dir(directory)
+            self._mark(f, {"type": "done", "n": i + 1}, durable=True)
+            if progress:
+                progress(i + 1, total)
+
+    def apply(self, directory: str, plan: List[Tuple[str, str]], progress=None,
+              group: Optional[str] = None) -> Optional[str]:
+        """Journal and apply a rename plan; returns the batch id (None if nothing to do).
+
+        Batches applied with the same group are undone together. Grouped
+        batches skip pruning; call prune() once the whole group is applied.
+        """
+        ops = order_operations(plan, uuid.uuid4().hex[:8])
+        if not ops:
+            return None
+        batch_id, f = self._begin(directory, ops, group=group)
+        try:
+            try:
+                self._run(f, directory, ops, progress=progress)
+            except (OSError, JournalError):
+                self._mark(f, {"type": "state", "state": "failed"}, durable=True)
+                raise
+            self._mark(f, {"type": "state", "state": "done"}, durable=True)
+        finally:
+            f.close()
+        if not group:
+            self.prune()
+        return batch_id
+
+    def recover(self) -> List[Tuple[str, Optional[str]]]:
+        """Roll forward every unfinished batch; returns [(batch_id, error or None)]"""
+        results = []
+        for batch in self.batches():
+            if batch["state"] != "pending":
+                continue
+            ops = [tuple(op) for op in batch["ops"]]
+            try:
+                with self._open_for_append(batch["id"]) as f:
+                    self._run(f, batch["directory"], ops, start=batch["done"], resume=True)
+                    self._mark(f, {"type": "state", "state": "done"}, durable=True)
+                if batch.get("undo_of"):
+                    self._append_state(batch["undo_of"], "undone")
+                results.append((batch["id"], None))
+            except (OSError, JournalError) as ex:
+                self._append_state(batch["id"], "failed")
+                results.append((batch["id"], str(ex)))
+        return results
+
+    def undoable(self) -> List[Dict]:
+        """Batches that moved files and haven't been undone yet, newest first.
+
+        Failed batches are included so a half-applied rename can be reverted.
+        """
+        return [b for b in reversed(self.batches())
+                if not b.get("undo_of") and b["done"] > 0
+                and b["state"] in ("done", "failed")]
+
+    def undo(self, count: int = 1, progress=None) -> List[str]:
+        """Undo the last count batches or groups (newest first); returns undone ids"""
+        undone = []
+        for unit in self._units(self.undoable())[:max(count, 0)]:
+            for batch in unit:
+                self._undo_batch(batch, progress)
+            undone.append(unit[0].get("group") or unit[0]["id"])
+        return undone
+
+    def _undo_batch(self, batch: Dict, progress=None) -> None:
+        applied = batch["ops"][:batch["done"]]
+        ops = [(dst, src) for src, dst in reversed(applied)]
+        undo_id, f = self._begin(batch["directory"], ops, undo_of=batch["id"])
+        try:
+            try:
+                self._run(f, batch["directory"], ops, progress=progress)
+            except (OSError, JournalError):
+                self._mark(f, {"type": "state", "state": "failed"}, durable=True)
+                raise
+            self._mark(f, {"type": "state", "state": "done"}, durable=True)
+        finally:
+            f.close()
+        self._append_state(batch["id"], "undone")
+
+    def prune(self) -> None:
+        """Drop the oldest finished journals beyond KEEP_BATCHES batches or groups"""
+        finished = [b for b in self.batches() if b["state"] != "pending"]
+        for unit in self._units(finished)[:-KEEP_BATCHES]:
+            for batch in unit:
+                try:
+                    self._path(batch["id"]).unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,164 @@
+"""Sample-encode estimate of what compressing a file saves, for VidoEdit.
+
+A few short windows spread over the file are encoded with the chosen
+encoder settings and each is compared to the same window of the source
+video stream (its packets in that time range). The encodes are jobs like
+any other: started through process_control with the caller's limits and
+JobSet, so they are paused, cancelled and pinned with the batch. The mean
+size ratio over the windows projects the compressed video stream; the streams that are only copied
+keep their size. With the spread of the per-window ratios this gives the
+expected savings and a confidence interval, before hours go into the
+full encode. CompressTab skips files whose expected savings fall below
+the configured minimum.
+"""
+import math
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import process_control
+from ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path, get_video_stream, probe_media
+from stream_policy import stream_bitrate
+from video_analysis import sample_timestamps
+
+DEFAULT_MIN_SAVINGS = 15
+SAMPLES = 4
+WINDOW = 4.0
+# Two-sided 90% Student t values by degrees of freedom (samples - 1)
+T_90 = {1: 6.31, 2: 2.92, 3: 2.35, 4: 2.13, 5: 2.02, 6: 1.94, 7: 1.89}
+
+
+def source_window_bytes(input_file, timestamp, window, start=0.0):
+    """Size of the source video packets with timestamps inside [timestamp, timestamp + window).
+
+    Stream copy with -ss would start at the preceding keyframe, several
+    times the window with long GOPs; the packet sizes cover exactly the
+    range the encode below decodes. start is the file's start_time: packet
+    timestamps are absolute, -ss counts from the start of the file.
+    """
+    begin = start + timestamp
+    cmd = [
+        get_ffprobe_path(), "-v", "error", "-select_streams", "v:0",
+        "-read_intervals", f"{begin}%+{window}",
+        "-show_entries", "packet=pts_time,dts_time,size", "-of", "csv=p=0",
+        input_file,
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True).stdout
+    except FileNotFoundError:
+        return 0
+    total = 0
+    for line in out.splitlines():
+        fields = line.split(",")
+        if len(fields) < 3:
+            continue
+        try:
+            # pts can be N/A (raw elementary streams); dts is close enough then
+            ts = float(fields[0]) if fields[0] not in ("", "N/A") else float(fields[1])
+            size = int(fields[2])
+        except ValueError:
+            continue
+        if begin <= ts < begin + window:
+            total += size
+    return total
+
+
+def window_bytes(input_file, timestamp, window, video_args, jobs=None, limits=None,
+                 cancelled=lambda: False):
+    """Size of one window's video stream encoded with video_args (0 when it failed or was cancelled).
+
+    The encode runs with limits, registered in jobs (a process_control.JobSet) if given.
+    """
+    cmd = [
+        get_ffmpeg_path(), "-hide_banner", "-nostdin", "-v", "error",
+        "-ss", str(timestamp), "-t", str(window),
+        "-i", input_file,
+        "-map", "0:v:0", "-an", "-sn", "-dn",
+    ] + list(video_args) + ["-f", "matroska", "-"]
+    launch = jobs.launch if jobs is not None else process_control.launch
+    try:
+        job = launch(cmd, limits, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return 0
+    total = 0
+    try:
+        for chunk in iter(lambda: job.popen.stdout.read(1024 * 1024), b""):
+            if cancelled():
+                job.kill()
+                job.wait()
+                return 0
+            total += len(chunk)
+        job.wait()
+    finally:
+        if jobs is not None:
+            jobs.discard(job)
+    return total if job.returncode == 0 else 0
+
+
+def estimate(input_file, video_args, other_bytes=None, samples=SAMPLES, window=WINDOW, workers=None,
+             jobs=None, limits=None, cancelled=lambda: False):
+    """Expected savings of encoding input_file's video with video_args.
+
+    other_bytes is the size of everything else in the output (default: the
+    source's other streams, copied). Returns {"savings", "low", "high"} as
+    fractions of the input size (low/high: 90% interval), or None when no
+    window could be measured or cancelled() turned true.
+
+    workers windows are encoded at once (default: all of them); pass 1 when
+    other jobs share the machine. jobs and limits go to every window encode.
+    """
+    info = probe_media(input_file)
+    try:
+        duration = float(info.get("format", {}).get("duration") or 0)
+        input_bytes = os.path.getsize(input_file)
+    except (TypeError, ValueError, OSError):
+        return None
+    if duration <= 0 or input_bytes <= 0:
+        return None
+    try:
+        start = float(info.get("format", {}).get("start_time") or 0)
+    except (TypeError, ValueError):
+        start = 0.0
+    stamps = sample_timestamps(duration, samples, window)
+    workers = workers or min(len(stamps), os.cpu_count() or 1)
+
+    def ratio(ts):
+        if cancelled():
+            return None
+        source = source_window_bytes(input_file, ts, window, start)
+        encoded = window_bytes(input_file, ts, window, video_args, jobs, limits, cancelled) if source else 0
+        return encoded / source if source and encoded else None
+
+    if workers == 1:
+        ratios = [ratio(ts) for ts in stamps]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            ratios = list(pool.map(ratio, stamps))
+    ratios = [r for r in ratios if r is not None]
+    if not ratios or cancelled():
+        return None
+
+    video = get_video_stream(info) or {}
+    video_bytes = stream_bitrate(video, duration) * duration / 8
+    if other_bytes is None:
+        other_bytes = sum(stream_bitrate(s, duration) * duration / 8 for s in info.get("streams", [])
+                          if s.get("codec_type") in ("audio", "subtitle"))
+    if not video_bytes:
+        # No bitrate tags: the video is whatever the other streams don't account for
+        video_bytes = max(input_bytes - other_bytes, 0)
+
+    mean = sum(ratios) / len(ratios)
+    if len(ratios) > 1:
+        spread = math.sqrt(sum((r - mean) ** 2 for r in ratios) / (len(ratios) - 1))
+        margin = T_90.get(len(ratios) - 1, 1.65) * spread / math.sqrt(len(ratios))
+    else:
+        margin = mean  # one window says little: anything from nothing to twice the ratio
+
+    def savings(r):
+        return 1 - (max(r, 0) * video_bytes + other_bytes) / input_bytes
+
+    return {
+        "savings": savings(mean),
+        "low": savings(mean + margin),
+        "high": savings(mean - margin),
+    }
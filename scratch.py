@@ -0,0 +1,201 @@
+"""Local scratch space and background publishing of finished outputs for VidoEdit.
+
+When the sources live on a NAS, writing the output next to them sends every
+small encoder write over the network, competing with the reads of the
+running jobs. With a scratch directory configured (local NVMe, tmpfs),
+outputs are written there and moved to their destination once complete:
+a rename when scratch and destination share a filesystem, otherwise a
+streamed copy to "<name>.part" in the destination folder followed by a
+rename, so the destination never shows a half-written file. Publishing
+runs on its own thread while the next job is already encoding.
+
+Reservations are counted against a quota (and the free space of the
+scratch filesystem) until their files have been published; a job that
+doesn't fit writes straight to its destination as before.
+"""
+import hashlib
+import itertools
+import os
+import queue
+import shutil
+import threading
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+COPY_BUFFER = 8 * 1024 * 1024
+# Outputs are assumed to be at most this share of their source's size
+OUTPUT_SIZE_FACTOR = 1.1
+# Leave this much of the scratch filesystem free
+FREE_RESERVE_MB = 512
+
+
+class ScratchArea:
+    """Per-job folders below root, with reservations against a quota in MB (None = free space)"""
+
+    def __init__(self, root: str, quota_mb: Optional[int] = None):
+        self.root = os.path.join(os.path.abspath(root), f"vidoedit-{os.getpid()}")
+        self.quota_mb = quota_mb
+        self._reserved: Dict[Hashable, Tuple[str, int]] = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, get_setting: Callable) -> Optional["ScratchArea"]:
+        """The configured scratch area, None when none is set or the folder is missing"""
+        root = (get_setting("scratch_dir", "") or "").strip()
+        if not root or not os.path.isdir(root):
+            return None
+        try:
+            quota = int(get_setting("scratch_quota_mb", 0) or 0)
+        except (TypeError, ValueError):
+            quota = 0
+        return cls(root, quota if quota > 0 else None)
+
+    def _free_mb(self) -> int:
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            return shutil.disk_usage(self.root).free // (1024 * 1024) - FREE_RESERVE_MB
+        except OSError:
+            return 0
+
+    def reserve(self, job: Hashable, expected_mb: int) -> Optional[str]:
+        """A fresh folder for job's outputs, or None when they don't fit"""
+        with self._lock:
+            reserved = sum(mb for _, mb in self._reserved.values())
+            if self.quota_mb is not None and reserved + expected_mb > self.quota_mb:
+                return None
+            # Conservative: what running jobs already wrote counts twice
+            if reserved + expected_mb > self._free_mb():
+                return None
+            folder = os.path.join(self.root, str(next(self._counter)))
+            try:
+                os.makedirs(folder)
+            except OSError:
+                return None
+            self._reserved[job] = (folder, expected_mb)
+            return folder
+
+    def release(self, job: Hashable, keep_files: bool = False) -> None:
+        """Drop job's reservation and, unless keep_files, whatever is left in its folder"""
+        with self._lock:
+            entry = self._reserved.pop(job, None)
+        if entry is not None and not keep_files:
+            shutil.rmtree(entry[0], ignore_errors=True)
+
+    def close(self) -> None:
+        """Remove the scratch folder unless it still holds files kept after a failure"""
+        try:
+            for name in os.listdir(self.root):
+                try:
+                    os.rmdir(os.path.join(self.root, name))
+                except OSError:
+                    pass
+            os.rmdir(self.root)
+        except OSError:
+            pass
+
+
+def expected_output_mb(*sources: str) -> int:
+    """Conservative output size estimate for encodes of sources"""
+    total = 0
+    for path in sources:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return int(total * OUTPUT_SIZE_FACTOR / (1024 * 1024)) + 1
+
+
+def crosses_filesystem(src: str, dst: str) -> bool:
+    """Whether move_file(src, dst) has to copy instead of renaming"""
+    try:
+        return os.stat(src).st_dev != os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+    except OSError:
+        return True
+
+
+def move_file(src: str, dst: str, sha256: Optional[str] = None) -> None:
+    """Move src to dst; dst only ever appears complete.
+
+    With sha256, a copy to another filesystem is read back and must match
+    it before it replaces dst.
+    """
+    if not crosses_filesystem(src, dst):
+        os.replace(src, dst)
+        return
+    part = dst + ".part"
+    try:
+        with open(src, "rb") as fin, open(part, "wb") as fout:
+            shutil.copyfileobj(fin, fout, COPY_BUFFER)
+            fout.flush()
+            os.fsync(fout.fileno())
+        shutil.copystat(src, part)
+        if sha256 is not None and file_sha256(part) != sha256:
+            raise OSError(f"copy of {os.path.basename(src)} doesn't match its checksum")
+        os.replace(part, dst)
+    except BaseException:
+        try:
+            os.remove(part)
+        except OSError:
+            pass
+        raise
+    os.remove(src)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_BUFFER), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+PublishCallback = Callable[[List[str], Optional[Exception]], None]
+
+
+class Publisher:
+    """Moves finished outputs to their destinations on a background thread, in order"""
+
+    def __init__(self, log: Optional[Callable[[str], None]] = None):
+        self.log = log
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def publish(self, pairs: List[Tuple[str, str]], on_done: Optional[PublishCallback] = None,
+                check: Optional[Callable[[], Optional[Dict[str, str]]]] = None) -> None:
+        """Move every (written, final) pair; on_done(finals, error) when done or failed.
+
+        check() runs first, on the publisher thread: an exception cancels the
+        move and goes to on_done; it may return {written: sha256} for the
+        copies to be compared against.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._queue.put((pairs, on_done, check))
+
+    def join(self) -> None:
+        """Wait until everything handed to publish() has been moved"""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            pairs, on_done, check = self._queue.get()
+            error = None
+            try:
+                sums = (check() if check is not None else None) or {}
+                for src, dst in pairs:
+                    move_file(src, dst, sums.get(src))
+            except Exception as e:
+                error = e
+            try:
+                if on_done is not None:
+                    on_done([dst for _, dst in pairs], error)
+            except Exception as e:
+                # Keep the thread alive, but don't hide a reservation or orphan entry left behind
+                if self.log is not None:
+                    names = ", ".join(os.path.basename(dst) for _, dst in pairs)
+                    self.log(f"{names}: {type(e).__name__}: {e}")
+            finally:
+                self._queue.task_done()
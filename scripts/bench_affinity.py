@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Compare concurrent encodes with and without per-job CPU pinning.
+
+Usage: python scripts/bench_affinity.py [jobs] [--seconds N] [--size WxH]
+                                        [--preset P] [--encoder E] [--source FILE]
+    jobs       concurrent encodes (default: half the cores, at most 8)
+    --seconds  length of the generated test clip (default 10)
+    --size     size of the generated test clip (default 1920x1080)
+    --preset   encoder preset (default medium)
+    --encoder  libx265 or libx264 (default libx265)
+    --source   encode this file instead of a generated clip
+
+Each round starts the same number of encodes at once, first unpinned (every
+ffmpeg sizes its pools for the whole machine), then pinned to disjoint core
+sets with matching -threads/pools as the Convert and Compress tabs do. The
+total frames per second of each round are printed together with the NUMA
+layout that was used.
+"""
+from pathlib import Path
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import cpu_affinity  # noqa: E402
+import job_scheduler  # noqa: E402
+import process_control  # noqa: E402
+from ffmpeg_utils import get_ffmpeg_path  # noqa: E402
+
+
+def option(name, default):
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+option_values = {option(n, None) for n in ("--seconds", "--size", "--preset", "--encoder", "--source")}
+positional = [a for a in sys.argv[1:] if not a.startswith("--") and a not in option_values]
+jobs = int(positional[0]) if positional else max(2, job_scheduler.auto_max_jobs())
+seconds = float(option("--seconds", 10))
+size = option("--size", "1920x1080")
+preset = option("--preset", "medium")
+encoder = option("--encoder", "libx265")
+source = option("--source", None)
+
+allocator = cpu_affinity.CoreAllocator()
+if not allocator.cpus:
+    print("Error: CPU affinity is not supported on this platform", file=sys.stderr)
+    sys.exit(1)
+
+
+def make_clip(path):
+    """Lossless test clip, cheap to decode so the encoders dominate"""
+    cmd = [
+        get_ffmpeg_path(), "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=25",
+        "-t", str(seconds),
+        "-c:v", "libx264", "-qp", "0", "-preset", "ultrafast",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def encode_cmd(clip, cores):
+    cmd = [get_ffmpeg_path(), "-v", "error", "-stats", "-i", clip, "-an", "-c:v", encoder, "-preset", preset]
+    cmd += cpu_affinity.encoder_args(encoder, cores)
+    pools = cpu_affinity.x265_params(encoder, cores)
+    if pools:
+        cmd += ["-x265-params", pools]
+    return cmd + ["-f", "null", "-"]
+
+
+def run_round(clip, pinned):
+    """(total fps, wall seconds) of jobs concurrent encodes"""
+    running = []
+    start = time.perf_counter()
+    for i in range(jobs):
+        cores = allocator.allocate(i, jobs) if pinned else None
+        limits = process_control.ResourceLimits(cpus=cores.cpus if cores else None)
+        job = process_control.launch(encode_cmd(clip, cores), limits,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        running.append((i, job))
+    frames = 0
+    for i, job in running:
+        _, err = job.popen.communicate()
+        allocator.release(i)
+        if job.returncode != 0:
+            print(f"Error: encode failed:\n{err}", file=sys.stderr)
+            sys.exit(1)
+        counts = re.findall(r"frame=\s*(\d+)", err)
+        frames += int(counts[-1]) if counts else 0
+    wall = time.perf_counter() - start
+    return frames / wall, wall
+
+
+tmp_dir = tempfile.mkdtemp(prefix="vidoedit_affinity_")
+clip = source
+try:
+    if clip is None:
+        clip = os.path.join(tmp_dir, "clip.mkv")
+        print(f"Generating {seconds:g} s {size} test clip...")
+        make_clip(clip)
+
+    nodes = " ".join(cpu_affinity.format_cpulist(n) for n in allocator.nodes)
+    print(f"{len(allocator.cpus)} cores, NUMA nodes: {nodes}")
+    print(f"{jobs} concurrent {encoder} --preset {preset} encodes\n")
+
+    results = {}
+    for label, pinned in (("unpinned", False), ("pinned", True)):
+        fps, wall = run_round(clip, pinned)
+        results[label] = fps
+        print(f"  {label:<10} {fps:8.1f} fps total  ({wall:.1f} s)")
+
+    change = (results["pinned"] - results["unpinned"]) / results["unpinned"] * 100
+    print(f"\nPinned vs unpinned: {change:+.1f}% throughput")
+finally:
+    for name in os.listdir(tmp_dir):
+        os.remove(os.path.join(tmp_dir, name))
+    os.rmdir(tmp_dir)
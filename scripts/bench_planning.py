@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Benchmark the Merge/Renamer planning paths on synthetic libraries.
+
+Usage: python scripts/bench_planning.py [sizes ...] [--save] [--label NAME]
+    sizes   file counts to generate (default: 10000 100000; 1000000 works but
+            creating the files takes a minute)
+    --save  append results to benchmarks/planning_history.jsonl
+    --label tag stored with the results (default: git describe)
+
+Each size gets a temp folder of empty files named like a real season folder
+(SxxEyy, part suffixes, release junk). Every function is timed (best of a few
+runs) and its peak Python allocation is measured in a separate traced run.
+Saved runs are compared against the previous saved run of the same size.
+"""
+from pathlib import Path
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import dir_snapshot  # noqa: E402
+import episode_index  # noqa: E402
+from tabs import merge_tab, renamer_tab  # noqa: E402
+
+HISTORY_FILE = ROOT / "benchmarks" / "planning_history.jsonl"
+REPEATS = 3
+# Warm paths run on every live preview keystroke; flagged when slower than this
+INTERACTIVE_MS = 100
+
+args = sys.argv[1:]
+save = "--save" in args
+label = None
+if "--label" in args:
+    label = args[args.index("--label") + 1]
+sizes = [int(a) for a in args if a.isdigit() and a != label] or [10_000, 100_000]
+
+
+def git_label():
+    try:
+        out = subprocess.run(["git", "describe", "--tags", "--always", "--dirty"], cwd=ROOT,
+                             capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def make_library(directory, count, rng):
+    """Empty files named like episodes of several shows, about half of them parts"""
+    junk = ["1080p.WEB.x264", "720p.HDTV", "2160p.HDR.x265", "German.DL.1080p"]
+    for i in range(count):
+        show, rest = divmod(i, 99 * 99)
+        season, episode = divmod(rest, 99)
+        part = rng.choice(["", "", "A", "B"])
+        name = f"Show{show}.S{season + 1:02d}E{episode + 1:02d}{part}.{rng.choice(junk)}-GRP{i}.mkv"
+        os.close(os.open(os.path.join(directory, name), os.O_CREAT | os.O_WRONLY, 0o644))
+
+
+def reset_caches(directory, drop_persisted=True):
+    """Forget in-memory state like an app restart; optionally also the saved indexes"""
+    dir_snapshot.invalidate(directory)
+    renamer_tab._last_plan = None
+    with episode_index._indexes_lock:
+        for index in episode_index._indexes.values():
+            index.close()
+        episode_index._indexes.clear()
+    if drop_persisted:
+        shutil.rmtree(episode_index.INDEX_DIR, ignore_errors=True)
+
+
+def measure(func, setup=None, repeats=REPEATS):
+    """(best seconds, peak traced bytes) for func()"""
+    best = None
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def bench_size(count, tmp_root):
+    rng = random.Random(count)
+    directory = os.path.join(tmp_root, f"lib_{count}")
+    os.makedirs(directory)
+    start = time.perf_counter()
+    make_library(directory, count, rng)
+    print(f"\n{count} files (created in {time.perf_counter() - start:.1f} s)")
+
+    pattern = re.compile(renamer_tab.DEFAULT_REGEX)
+    merge_pattern = merge_tab.compile_id_regex(merge_tab.DEFAULT_ID_REGEX_TEXT)
+    template = "Episode {episode}{part} Staffel {season}"
+
+    def plan():
+        return renamer_tab.compute_plan(directory, pattern, template, True, 1, 1)
+
+    the_plan = plan()
+    parsed = sorted([(src, *renamer_tab.parse_identifier(src, pattern)) for src, _ in the_plan],
+                    key=renamer_tab.parsed_sort_key)
+    samples = [rng.choice(["S01E10", "S1E1", "S0110", "S01x10", "s001e0010", "S123", "bad"])
+               for _ in range(count)]
+
+    def template_change():
+        renamer_tab._last_plan = None
+
+    cases = [
+        ("compute_plan (cold)", plan, lambda: reset_caches(directory)),
+        ("compute_plan (restart)", plan, lambda: reset_caches(directory, drop_persisted=False)),
+        ("compute_plan (warm)", plan, template_change),
+        ("compute_plan (unchanged)", plan, None),
+        ("check_conflicts", lambda: renamer_tab.check_conflicts(directory, the_plan), None),
+        ("build_numbering", lambda: renamer_tab.build_numbering(parsed, False, 1, 1), None),
+        ("scan_all_groups (cold)", lambda: merge_tab.scan_all_groups(directory, merge_pattern),
+         lambda: reset_caches(directory)),
+        ("scan_all_groups (restart)", lambda: merge_tab.scan_all_groups(directory, merge_pattern),
+         lambda: reset_caches(directory, drop_persisted=False)),
+        ("scan_all_groups (warm)", lambda: merge_tab.scan_all_groups(directory, merge_pattern), None),
+        ("scan_matching_files (warm)", lambda: merge_tab.scan_matching_files(directory, merge_pattern, 1, 50),
+         None),
+        (f"parse_output_id_sample x{count}", lambda: [merge_tab.parse_output_id_sample(s) for s in samples],
+         None),
+    ]
+
+    results = {}
+    print(f"  {'function':<36} {'time':>10} {'peak mem':>10}")
+    for name, func, setup in cases:
+        seconds, peak = measure(func, setup)
+        results[name] = {"seconds": round(seconds, 6), "peak_kb": peak // 1024}
+        warn = "  (!)" if "(warm)" in name and seconds * 1000 > INTERACTIVE_MS else ""
+        print(f"  {name:<36} {seconds * 1000:8.1f} ms {peak / 1024 / 1024:7.1f} MB{warn}")
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def load_history():
+    if not HISTORY_FILE.is_file():
+        return []
+    entries = []
+    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def compare(history, count, results):
+    previous = [e for e in history if e.get("size") == count]
+    if not previous:
+        return
+    last = previous[-1]
+    print(f"  vs {last.get('label')} ({last.get('date')}):")
+    for name, res in results.items():
+        old = last.get("results", {}).get(name)
+        if not old or not old.get("seconds"):
+            continue
+        change = (res["seconds"] - old["seconds"]) / old["seconds"] * 100
+        print(f"    {name:<34} {change:+7.1f}% time")
+
+
+label = label or git_label()
+history = load_history()
+tmp_root = tempfile.mkdtemp(prefix="vidoedit_bench_")
+# Keep persisted indexes of the synthetic folders out of ~/.vidoedit
+episode_index.INDEX_DIR = Path(tmp_root) / "episode_index"
+try:
+    for count in sizes:
+        results = bench_size(count, tmp_root)
+        compare(history, count, results)
+        if save:
+            HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+            entry = {
+                "label": label,
+                "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "size": count,
+                "results": results,
+            }
+            with open(HISTORY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+    if save:
+        print(f"\nSaved to {HISTORY_FILE}")
+finally:
+    reset_caches(tmp_root)
+    shutil.rmtree(tmp_root, ignore_errors=True)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Compare HDR->SDR tone-mapping throughput of the available ffmpeg filter chains.
+
+Usage: python scripts/bench_tonemap.py <hdr_sample.mkv> [seconds]
+Results are stored in ~/.vidoedit/tonemap_bench.json and used by the Convert tab
+to pick the fastest chain.
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from ffmpeg_utils import probe_media  # noqa: E402
+import tonemap  # noqa: E402
+
+if len(sys.argv) < 2:
+    print(__doc__.strip(), file=sys.stderr)
+    sys.exit(1)
+
+sample = sys.argv[1]
+seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+if not Path(sample).is_file():
+    print(f"Error: sample not found: {sample}", file=sys.stderr)
+    sys.exit(1)
+
+fmt = tonemap.hdr_format(probe_media(sample))
+if not fmt:
+    print("Warning: sample is not PQ/HLG, numbers may not be representative", file=sys.stderr)
+
+methods = tonemap.available_methods()
+if not methods:
+    print("Error: ffmpeg has neither zscale+tonemap nor libplacebo", file=sys.stderr)
+    sys.exit(1)
+
+results = tonemap.benchmark_all(sample, seconds)
+
+print(f"{'method':<12} {'frames':>7} {'fps':>9} {'ms/frame':>9} {'tonemap ms':>11}")
+for name in ["decode"] + methods:
+    res = results.get(name)
+    if not res:
+        print(f"{name:<12} failed")
+        continue
+    extra = res.get("tonemap_ms_per_frame", "")
+    print(f"{name:<12} {res['frames']:>7} {res['fps']:>9} {res['ms_per_frame']:>9} {extra:>11}")
+
+print(f"✓ Selected: {tonemap.select_method(methods, results)}")
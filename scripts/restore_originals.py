@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""List or restore the originals the Convert tab backed up before replacing them.
+
+Usage: python scripts/restore_originals.py [--list] [FILE ...]
+    --list  show the recorded backups (of FILE, if given) and how they were made
+    FILE    put the latest backup of FILE back in its place
+
+Backups on the same filesystem as their original are restored with a rename,
+however large the file.
+"""
+from pathlib import Path
+import datetime
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import backups  # noqa: E402
+
+args = sys.argv[1:]
+if not args or args[0] in ("-h", "--help"):
+    print(__doc__)
+    sys.exit(0)
+
+if args[0] == "--list":
+    found = [b for path in args[1:] for b in backups.entries(path)] if args[1:] else backups.entries()
+    for b in found:
+        created = datetime.datetime.fromtimestamp(b.created).strftime("%Y-%m-%d %H:%M")
+        print(f"{created}  {b.size / 1024 ** 3:7.2f} GB  {b.method:<15}  {b.original}")
+    print(f"{len(found)} backup(s)")
+    sys.exit(0)
+
+failed = 0
+for path in args:
+    try:
+        restored = backups.restore(path)
+    except OSError as e:
+        print(f"{path}: {e}")
+        failed += 1
+        continue
+    if restored is None:
+        print(f"{path}: no backup")
+        failed += 1
+    else:
+        print(f"{path}: restored from {restored.path}")
+sys.exit(1 if failed else 0)
@@ -1,6 +1,9 @@
 """Settings Dialog for VidoEdit"""
 import flet as ft
 from language_manager import LanguageManager
+import backups
+import job_watchdog
+import prefetch
 
 try:
     from flet import icons
@@ -29,6 +32,136 @@ class SettingsDialog:
         new_language = self.language_dropdown_ref.current.value
         self.lang_manager.set_language(new_language)
     
+    def _on_low_priority_change(self, e):
+        self.lang_manager.set_setting("low_priority", bool(e.control.value))
+
+    def _on_limit_change(self, key):
+        def handler(e):
+            value = (e.control.value or "").strip()
+            self.lang_manager.set_setting(key, int(value) if value.isdigit() else 0)
+        return handler
+
+    def _performance_section(self):
+        """Priority and quota applied to every ffmpeg job started afterwards"""
+        def limit_field(key, label, default=0):
+            return ft.TextField(
+                label=self._get_text(label),
+                value=str(self.lang_manager.get_setting(key, default) or ""),
+                width=145,
+                keyboard_type=ft.KeyboardType.NUMBER,
+                border_color="#6366f1",
+                color=self._c("#1e1e2e", "#cdd6f4"),
+                on_change=self._on_limit_change(key),
+            )
+
+        return [
+            ft.Text(
+                self._get_text("performance"),
+                color=self._c("#1f2937", "#cdd6f4"),
+                weight=ft.FontWeight.BOLD,
+                size=16,
+            ),
+            ft.Checkbox(
+                label=self._get_text("low_priority"),
+                value=bool(self.lang_manager.get_setting("low_priority", False)),
+                on_change=self._on_low_priority_change,
+            ),
+            ft.Row([
+                limit_field("cpu_limit_percent", "cpu_limit_percent"),
+                limit_field("memory_limit_mb", "memory_limit_mb"),
+            ], spacing=10),
+            ft.Text(
+                self._get_text("limits_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Checkbox(
+                label=self._get_text("cpu_pinning"),
+                value=bool(self.lang_manager.get_setting("cpu_pinning", True)),
+                on_change=lambda e: self.lang_manager.set_setting("cpu_pinning", bool(e.control.value)),
+            ),
+            ft.Row([
+                limit_field("max_parallel_jobs", "max_parallel_jobs"),
+                limit_field("memory_budget_mb", "memory_budget_mb"),
+                limit_field("device_max_jobs", "device_max_jobs"),
+            ], spacing=10, wrap=True),
+            ft.Text(
+                " ".join(self._get_text(k) for k in ("parallel_hint", "memory_budget_hint", "device_hint")),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Row([
+                ft.TextField(
+                    label=self._get_text("scratch_dir"),
+                    value=self.lang_manager.get_setting("scratch_dir", "") or "",
+                    width=300,
+                    border_color="#6366f1",
+                    color=self._c("#1e1e2e", "#cdd6f4"),
+                    on_change=lambda e: self.lang_manager.set_setting("scratch_dir", (e.control.value or "").strip()),
+                ),
+                limit_field("scratch_quota_mb", "scratch_quota_mb"),
+            ], spacing=10, wrap=True),
+            ft.Text(
+                self._get_text("scratch_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Row([
+                limit_field("size_guard_percent", "size_guard_percent"),
+                limit_field("min_savings_percent", "min_savings_percent"),
+            ], spacing=10),
+            ft.Text(
+                self._get_text("size_guard_hint") + " " + self._get_text("min_savings_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Row([
+                limit_field("prefetch_depth", "prefetch_depth", prefetch.DEFAULT_DEPTH),
+                limit_field("prefetch_mb_s", "prefetch_mb_s"),
+            ], spacing=10),
+            ft.Text(
+                self._get_text("prefetch_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Row([
+                limit_field("stall_timeout_s", "stall_timeout_s"),
+                limit_field("stall_retries", "stall_retries", job_watchdog.DEFAULT_RETRIES),
+            ], spacing=10),
+            ft.Text(
+                self._get_text("stall_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Checkbox(
+                label=self._get_text("prescan_keyframes"),
+                value=bool(self.lang_manager.get_setting("prescan_keyframes", False)),
+                on_change=lambda e: self.lang_manager.set_setting("prescan_keyframes", bool(e.control.value)),
+            ),
+            ft.TextField(
+                label=self._get_text("quarantine_dir"),
+                value=self.lang_manager.get_setting("quarantine_dir", "") or "",
+                width=300,
+                border_color="#6366f1",
+                color=self._c("#1e1e2e", "#cdd6f4"),
+                on_change=lambda e: self.lang_manager.set_setting("quarantine_dir", (e.control.value or "").strip()),
+            ),
+            ft.Text(
+                self._get_text("prescan_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+            ft.Row([
+                limit_field("backup_keep_days", "backup_keep_days", backups.DEFAULT_KEEP_DAYS),
+                limit_field("backup_keep_gb", "backup_keep_gb"),
+            ], spacing=10),
+            ft.Text(
+                self._get_text("backup_hint"),
+                size=12,
+                color=self._c("#6b7280", "#a6adc8"),
+            ),
+        ]
+
     def _close_dialog(self, e):
         """Close the settings dialog"""
         if self.bottom_sheet:
@@ -85,6 +218,8 @@ class SettingsDialog:
                         ),
                         ft.Container(height=10),
                         language_dropdown,
+                        ft.Divider(color=self._c("#e5e7eb", "#313244"), height=20),
+                        *self._performance_section(),
                         ft.Container(height=20),
                     ],
                     spacing=10,
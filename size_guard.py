@@ -0,0 +1,119 @@
+"""Early abort of compressions that won't make the file smaller, for VidoEdit.
+
+Compressing a source that is already efficiently encoded can take hours
+and end with a bigger file. SizeGuard follows ffmpeg's progress output
+(total_size against out_time) and projects the final size linearly. Once
+at least MIN_PROGRESS of the file is encoded and every projection over the
+last CONFIRM_SPAN of progress exceeded the limit (a share of the input
+size), the encode is judged not worth finishing: CompressTab kills it,
+keeps the original and remembers the file in
+~/.vidoedit/not_worth_compressing.json so later batches skip it.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+SKIP_FILE = Path.home() / ".vidoedit" / "not_worth_compressing.json"
+
+DEFAULT_PERCENT = 95
+# Don't judge before this share of the file is encoded (intros, title cards)
+MIN_PROGRESS = 0.1
+# ... and only after the projection stayed above the limit over this much progress
+CONFIRM_SPAN = 0.05
+
+_skip_lock = threading.Lock()
+
+
+class SizeGuard:
+    """Projects the output size of one encode from its progress"""
+
+    def __init__(self, input_bytes: int, duration: float, percent: float = DEFAULT_PERCENT):
+        self.input_bytes = input_bytes
+        self.duration = duration
+        self.limit = input_bytes * percent / 100
+        self._size = 0
+        self._samples: List[Tuple[float, float]] = []  # (progress, projected bytes)
+
+    def total_size(self, size: int) -> None:
+        """Bytes written so far; ffmpeg reports it right before the matching out_time"""
+        self._size = size
+
+    def out_time(self, seconds: float) -> None:
+        if self.duration <= 0 or self._size <= 0:
+            return
+        progress = seconds / self.duration
+        if 0 < progress < 1:
+            self._samples.append((progress, self._size / progress))
+
+    def projected(self) -> Optional[float]:
+        """Latest projection of the final size in bytes"""
+        return self._samples[-1][1] if self._samples else None
+
+    def exceeded(self) -> bool:
+        """Whether the output will confidently end up above the limit"""
+        if not self._samples or self.input_bytes <= 0:
+            return False
+        progress = self._samples[-1][0]
+        if progress < MIN_PROGRESS:
+            return False
+        recent = [size for p, size in self._samples if p >= progress - CONFIRM_SPAN]
+        covered = progress - min(p for p, _ in self._samples if p >= progress - CONFIRM_SPAN)
+        if covered < CONFIRM_SPAN * 0.8:
+            return False  # too few samples over the span to tell a trend from a spike
+        return min(recent) > self.limit
+
+
+def _key(path: str) -> Optional[str]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _load() -> dict:
+    try:
+        with open(SKIP_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def mark_not_worth(path: str, encoder: str, crf, projected_bytes: float) -> None:
+    """Remember that compressing path (unchanged since) with these settings doesn't pay off"""
+    key = _key(path)
+    if key is None:
+        return
+    with _skip_lock:
+        entries = _load()
+        entries[key] = {
+            "encoder": encoder,
+            "crf": crf,
+            "ratio": round(projected_bytes / max(os.path.getsize(path), 1), 3),
+        }
+        try:
+            SKIP_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = SKIP_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=2)
+            os.replace(tmp, SKIP_FILE)
+        except Exception:
+            pass
+
+
+def not_worth(path: str, encoder: str, crf) -> bool:
+    """Whether path was judged not worth compressing at this CRF or a lower (larger) one"""
+    key = _key(path)
+    if key is None:
+        return False
+    with _skip_lock:
+        entry = _load().get(key)
+    if not entry or entry.get("encoder") != encoder:
+        return False
+    try:
+        return float(crf) <= float(entry.get("crf"))
+    except (TypeError, ValueError):
+        return False
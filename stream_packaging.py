@@ -0,0 +1,122 @@
+"""HLS/DASH segmented packaging with an ABR ladder for VidoEdit.
+
+One ffmpeg process decodes the source once, scales it to every rung of the
+ladder and writes fMP4 segments with both a DASH manifest (manifest.mpd) and
+HLS playlists (master.m3u8) that reference the same segments.
+"""
+import os
+
+from ffmpeg_utils import get_ffmpeg_path, get_video_stream
+
+# name: (width, height, maxrate kbit/s)
+LADDER_RUNGS = {
+    "2160p": (3840, 2160, 16000),
+    "1440p": (2560, 1440, 10000),
+    "1080p": (1920, 1080, 6000),
+    "720p": (1280, 720, 3000),
+    "480p": (854, 480, 1400),
+    "360p": (640, 360, 800),
+}
+
+DEFAULT_LADDER = "2160p,1080p,720p"
+SEGMENT_SECONDS = 6
+AUDIO_BITRATE = "160k"
+
+
+def parse_ladder(text):
+    """Parse "2160p, 1080p, 720p" into rung names, highest first"""
+    names = [p.strip().lower() for p in (text or DEFAULT_LADDER).split(",")]
+    names = [n for n in names if n in LADDER_RUNGS]
+    return sorted(set(names), key=lambda n: -LADDER_RUNGS[n][1])
+
+
+def fit_ladder(names, info):
+    """Drop rungs taller than the source; always keep at least the smallest one"""
+    stream = get_video_stream(info or {}) or {}
+    src_h = stream.get("height") or 0
+    if not src_h:
+        return names
+    fitting = [n for n in names if LADDER_RUNGS[n][1] <= src_h]
+    return fitting or names[-1:]
+
+
+def frame_rate(info):
+    stream = get_video_stream(info or {}) or {}
+    try:
+        num, den = (stream.get("avg_frame_rate") or "24/1").split("/")
+        fps = float(num) / float(den)
+        return fps if fps > 0 else 24.0
+    except (ValueError, ZeroDivisionError):
+        return 24.0
+
+
+def output_dir_for(input_file):
+    return os.path.splitext(input_file)[0] + "_stream"
+
+
+def build_command(input_file, out_dir, rungs, encoder, crf, preset, info=None,
+                  shared_filters=None, video_args=None, segment_seconds=SEGMENT_SECONDS,
+                  x265_params=None, extra_input_args=None):
+    """Return the ffmpeg command encoding every rung and writing DASH + HLS manifests.
+
+    Keyframes are forced on segment boundaries in every rendition so segments
+    line up across the ladder and players can switch at any boundary.
+    x265_params are further libx265 settings (e.g. thread pools) for every rung;
+    extra_input_args go before -i.
+    """
+    gop = max(int(round(frame_rate(info) * segment_seconds)), 1)
+    n = len(rungs)
+
+    head = ",".join(list(shared_filters or []) + [f"split={n}"])
+    graph = [f"[0:v:0]{head}" + "".join(f"[s{i}]" for i in range(n))]
+    for i, name in enumerate(rungs):
+        w, h, _ = LADDER_RUNGS[name]
+        graph.append(
+            f"[s{i}]scale=w={w}:h={h}:force_original_aspect_ratio=decrease:force_divisible_by=2[v{i}]"
+        )
+
+    cmd = [get_ffmpeg_path(), "-y"] + list(extra_input_args or []) + [
+        "-i", input_file,
+        "-filter_complex", ";".join(graph),
+    ]
+    for i in range(n):
+        cmd += ["-map", f"[v{i}]"]
+    cmd += ["-map", "0:a:0?"]
+
+    cmd += ["-c:v", encoder, "-preset", preset, "-tag:v", "hvc1"]
+    cmd += list(video_args or [])
+    for i, name in enumerate(rungs):
+        maxrate = LADDER_RUNGS[name][2]
+        # Capped CRF: preset quality, bounded per rung so the ladder stays a ladder
+        cmd += [
+            f"-crf:v:{i}", str(crf),
+            f"-maxrate:v:{i}", f"{maxrate}k",
+            f"-bufsize:v:{i}", f"{maxrate * 2}k",
+        ]
+    cmd += [
+        "-g", str(gop),
+        "-keyint_min", str(gop),
+        "-sc_threshold", "0",
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})",
+    ]
+    if encoder == "libx265":
+        params = [f"keyint={gop}", f"min-keyint={gop}", "scenecut=0", "open-gop=0"] + list(x265_params or [])
+        cmd += ["-x265-params", ":".join(params)]
+
+    cmd += ["-c:a", "aac", "-b:a", AUDIO_BITRATE, "-ac", "2"]
+
+    cmd += [
+        "-f", "dash",
+        "-seg_duration", str(segment_seconds),
+        "-use_template", "1",
+        "-use_timeline", "1",
+        "-adaptation_sets", "id=0,streams=v id=1,streams=a",
+        "-init_seg_name", "init-$RepresentationID$.m4s",
+        "-media_seg_name", "chunk-$RepresentationID$-$Number%05d$.m4s",
+        "-hls_playlist", "1",
+        "-hls_master_name", "master.m3u8",
+        "-progress", "pipe:1",
+        "-nostats",
+        os.path.join(out_dir, "manifest.mpd"),
+    ]
+    return cmd
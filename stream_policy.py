@@ -0,0 +1,196 @@
+"""Stream selection and audio re-encode policy for VidoEdit"""
+
+# Audio codecs that are lossless (or carry a lossless extension) and worth transcoding
+LOSSLESS_AUDIO = {"truehd", "mlp", "flac", "alac", "wavpack", "tta", "ape"}
+LOSSLESS_DTS_PROFILES = {"DTS-HD MA", "DTS-HD MA + DTS:X", "DTS-HD MA + DTS:X IMAX"}
+
+TEXT_SUBTITLES = {"subrip", "srt", "ass", "ssa", "mov_text", "webvtt", "text"}
+
+COMMENTARY_WORDS = ("commentary", "kommentar", "commentaire", "comentario")
+
+AUDIO_ENCODERS = {
+    "opus": "libopus",
+    "aac": "aac",
+    "eac3": "eac3",
+}
+
+# Most channels each encoder takes, and the layouts to downmix wider tracks to
+MAX_CHANNELS = {"opus": 8, "aac": 6, "eac3": 6}
+CHANNEL_LAYOUTS = {
+    "opus": "7.1|5.1|stereo|mono",
+    "aac": "5.1|stereo|mono",
+    "eac3": "5.1|stereo|mono",
+}
+
+# ISO 639-2 bibliographic codes mkvmerge writes, mapped to the terminology codes
+LANGUAGE_ALIASES = {
+    "ger": "deu", "fre": "fra", "dut": "nld", "chi": "zho", "cze": "ces",
+    "gre": "ell", "per": "fas", "rum": "ron", "slo": "slk", "ice": "isl",
+    "en": "eng", "de": "deu", "fr": "fra", "es": "spa", "it": "ita", "ja": "jpn",
+}
+
+UNDEFINED_LANGUAGES = {"", "und", "unk", "mis", "zxx"}
+
+
+def normalize_language(code):
+    code = (code or "").strip().lower()
+    return LANGUAGE_ALIASES.get(code, code)
+
+
+def parse_languages(text):
+    """Parse a comma/space separated language list ("eng, ger") into a set"""
+    return {normalize_language(p) for p in text.replace(",", " ").split() if p.strip()}
+
+
+def stream_bitrate(stream, duration=None):
+    """Best-effort bitrate in bits/s: ffprobe bit_rate, mkv BPS tags, or size/duration"""
+    tags = stream.get("tags", {}) or {}
+    for value in (stream.get("bit_rate"), tags.get("BPS"), tags.get("BPS-eng")):
+        try:
+            if value:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    for key in ("NUMBER_OF_BYTES", "NUMBER_OF_BYTES-eng"):
+        try:
+            if tags.get(key) and duration:
+                return int(int(tags[key]) * 8 / duration)
+        except (TypeError, ValueError):
+            continue
+    return 0
+
+
+def is_lossless_audio(stream):
+    if stream.get("codec_name") in LOSSLESS_AUDIO:
+        return True
+    if (stream.get("codec_name") or "").startswith("pcm_"):
+        return True
+    return stream.get("codec_name") == "dts" and stream.get("profile") in LOSSLESS_DTS_PROFILES
+
+
+def is_commentary(stream):
+    if (stream.get("disposition") or {}).get("comment"):
+        return True
+    title = ((stream.get("tags") or {}).get("title") or "").lower()
+    return any(word in title for word in COMMENTARY_WORDS)
+
+
+class StreamPolicy:
+    """Decides per stream whether to copy, transcode or drop it.
+
+    keep_languages: set of ISO 639-2 codes to keep (empty keeps all); untagged
+        streams are always kept.
+    audio_codec/audio_bitrate_kbps: target for lossless audio tracks.
+    subtitles: "all", "text" (drop bitmap subtitles) or "none".
+    """
+
+    def __init__(self, keep_languages=None, drop_commentary=True, transcode_lossless=True,
+                 audio_codec="opus", audio_bitrate_kbps=256, subtitles="text"):
+        self.keep_languages = {normalize_language(l) for l in (keep_languages or ())}
+        self.drop_commentary = drop_commentary
+        self.transcode_lossless = transcode_lossless
+        self.audio_codec = audio_codec if audio_codec in AUDIO_ENCODERS else "opus"
+        self.audio_bitrate_kbps = int(audio_bitrate_kbps)
+        self.subtitles = subtitles
+
+    def _language_ok(self, stream):
+        if not self.keep_languages:
+            return True
+        lang = normalize_language((stream.get("tags") or {}).get("language"))
+        return lang in UNDEFINED_LANGUAGES or lang in self.keep_languages
+
+    def plan(self, info):
+        """Return one decision dict per stream for probe_media() output.
+
+        Each decision has index, codec_type, action ("copy"/"transcode"/"drop"),
+        reason, bytes_before and bytes_after (estimated).
+        """
+        try:
+            duration = float(info.get("format", {}).get("duration") or 0)
+        except (TypeError, ValueError):
+            duration = 0
+        decisions = []
+        for stream in info.get("streams", []):
+            ctype = stream.get("codec_type")
+            size = stream_bitrate(stream, duration) * duration / 8
+            d = {
+                "index": stream.get("index"),
+                "codec_type": ctype,
+                "codec_name": stream.get("codec_name"),
+                "channels": stream.get("channels"),
+                "language": (stream.get("tags") or {}).get("language", "und"),
+                "action": "copy",
+                "reason": "",
+                "bytes_before": size,
+                "bytes_after": size,
+            }
+            if ctype == "audio":
+                if self.drop_commentary and is_commentary(stream):
+                    d.update(action="drop", reason="commentary")
+                elif not self._language_ok(stream):
+                    d.update(action="drop", reason="language")
+                elif self.transcode_lossless and is_lossless_audio(stream):
+                    d.update(action="transcode", reason="lossless",
+                             bytes_after=self.audio_bitrate_kbps * 1000 * duration / 8)
+            elif ctype == "subtitle":
+                if self.subtitles == "none":
+                    d.update(action="drop", reason="subtitles disabled")
+                elif self.subtitles == "text" and stream.get("codec_name") not in TEXT_SUBTITLES:
+                    d.update(action="drop", reason="bitmap subtitle")
+                elif not self._language_ok(stream):
+                    d.update(action="drop", reason="language")
+            elif ctype == "data":
+                d.update(action="drop", reason="data stream")
+            if d["action"] == "drop":
+                d["bytes_after"] = 0
+            decisions.append(d)
+
+        # Never produce a silent file: keep the first audio track if the filters removed all
+        audio = [d for d in decisions if d["codec_type"] == "audio"]
+        if audio and all(d["action"] == "drop" for d in audio):
+            first = audio[0]
+            first.update(action="copy", reason="only audio kept", bytes_after=first["bytes_before"])
+        return decisions
+
+    def build_args(self, decisions):
+        """Return ffmpeg -map/-c args for the non-video streams of a plan.
+
+        Video is mapped separately by the caller; output stream specifiers here
+        count only the streams that survive.
+        """
+        args = []
+        out_audio = 0
+        for d in decisions:
+            if d["action"] == "drop" or d["codec_type"] not in ("audio", "subtitle", "attachment"):
+                continue
+            args += ["-map", f"0:{d['index']}"]
+            if d["codec_type"] == "audio":
+                if d["action"] == "transcode":
+                    args += [
+                        f"-c:a:{out_audio}", AUDIO_ENCODERS[self.audio_codec],
+                        f"-b:a:{out_audio}", f"{self.audio_bitrate_kbps}k",
+                    ]
+                    # libopus rejects some surround layouts like 5.1(side); eac3 and aac stop at 5.1,
+                    # so 7.1 TrueHD/DTS-HD tracks are downmixed instead of failing the file
+                    too_wide = (d.get("channels") or 0) > MAX_CHANNELS[self.audio_codec]
+                    if self.audio_codec == "opus" or too_wide:
+                        layouts = CHANNEL_LAYOUTS[self.audio_codec]
+                        args += [f"-filter:a:{out_audio}", f"aformat=channel_layouts={layouts}"]
+                else:
+                    args += [f"-c:a:{out_audio}", "copy"]
+                out_audio += 1
+        args += ["-c:s", "copy", "-c:t", "copy"]
+        return args
+
+
+def projected_savings(decisions):
+    """Return estimated bytes saved by a plan"""
+    return sum(d["bytes_before"] - d["bytes_after"] for d in decisions)
+
+
+def format_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
@@ -1,4 +1,5 @@
 """Compress Tab - GPU-accelerated video compression"""
+import os
 import subprocess
 import platform
 import threading
@@ -7,7 +8,24 @@ import queue
 from pathlib import Path
 
 import flet as ft
-from ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path
+from ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path, probe_media, detect_hevc_encoder, get_video_stream
+import stream_packaging
+import multi_output
+import process_control
+import job_scheduler
+import memory_admission
+import cpu_affinity
+import scratch
+import prefetch
+import device_io
+import disk_space
+import size_guard
+import savings_estimate
+import integrity_scan
+import job_watchdog
+import orphans
+import stream_policy
+import video_analysis
 
 try:
     from flet import icons
@@ -20,12 +38,7 @@ class CompressTab:
     
     VIDEO_EXTENSIONS = (".mkv", ".mp4", ".avi", ".mov", ".wmv")
     
-    PRESETS = {
-        "Film - Balances encoding quality with file size, suited for most films.": {"crf": 23, "preset": "slow"},
-        "Anime - Optimized for animation, preserving fine lines and details at a higher quality.": {"crf": 20, "preset": "veryslow"},
-        "4K - Tailored for 4K videos, allows for a slight reduction in quality to reduce file size.": {"crf": 22, "preset": "slow"},
-        "Plex - Designed for streaming platforms like Plex, balancing quality with a faster encoding speed.": {"crf": 24, "preset": "medium"},
-    }
+    PRESETS = multi_output.COMPRESS_PRESETS
     
     def __init__(self, page: ft.Page, language_manager):
         self.page = page
@@ -36,17 +49,44 @@ class CompressTab:
         self.mode_radio = ft.Ref[ft.RadioGroup]()
         self.preset_dropdown = ft.Ref[ft.Dropdown]()
         self.target_size = ft.Ref[ft.TextField]()
+        self.analyze_checkbox = ft.Ref[ft.Checkbox]()
+        self.size_guard_checkbox = ft.Ref[ft.Checkbox]()
+        self.estimate_checkbox = ft.Ref[ft.Checkbox]()
+        self.prescan_checkbox = ft.Ref[ft.Checkbox]()
+        self.policy_checkbox = ft.Ref[ft.Checkbox]()
+        self.languages_field = ft.Ref[ft.TextField]()
+        self.audio_codec_dropdown = ft.Ref[ft.Dropdown]()
+        self.audio_bitrate_field = ft.Ref[ft.TextField]()
+        self.drop_commentary_checkbox = ft.Ref[ft.Checkbox]()
+        self.subtitles_dropdown = ft.Ref[ft.Dropdown]()
+        self.output_mode_dropdown = ft.Ref[ft.Dropdown]()
+        self.ladder_field = ft.Ref[ft.TextField]()
+        self.stream_note = ft.Ref[ft.Text]()
+        self.policy_section = ft.Ref[ft.Column]()
         self.progress_bar = ft.Ref[ft.ProgressBar]()
         self.progress_text = ft.Ref[ft.Text]()
         self.status_text = ft.Ref[ft.Text]()
         self.start_button_ref = ft.Ref[ft.ElevatedButton]()
+        self.pause_button_ref = ft.Ref[ft.ElevatedButton]()
         self.cancel_button_ref = ft.Ref[ft.ElevatedButton]()
         
         # State
         self._task_queue: "queue.Queue[str]" = queue.Queue()
         self._ui_queue: "queue.Queue[tuple]" = queue.Queue()
         self._cancel_requested = False
-        self._current_process = None
+        self._jobs = process_control.JobSet()
+        self._controller = None
+        self._ledger = None
+        self._devices = None
+        self._space = None
+        self._watchdog = None
+        self._cores = cpu_affinity.CoreAllocator()
+        self._scratch = None
+        self._publisher = scratch.Publisher(log=lambda detail: self._ui_queue.put(
+            ("status", self.lang_manager.get_text("publish_note", detail=detail))))
+        self._prefetcher = None
+        self._progress_lock = threading.Lock()
+        self._file_progress = {}
         self._encoder = self._detect_gpu_encoder()
         
         # File pickers (Windows/Linux)
@@ -62,18 +102,8 @@ class CompressTab:
         """Build and return the tab content"""
         self._start_ui_poller()
         
-        preset_options = [
-            self.lang_manager.get_text("preset_film"),
-            self.lang_manager.get_text("preset_anime"),
-            self.lang_manager.get_text("preset_4k"),
-            self.lang_manager.get_text("preset_plex"),
-        ]
-        preset_mapping = {
-            self.lang_manager.get_text("preset_film"): {"crf": 23, "preset": "slow"},
-            self.lang_manager.get_text("preset_anime"): {"crf": 20, "preset": "veryslow"},
-            self.lang_manager.get_text("preset_4k"): {"crf": 22, "preset": "slow"},
-            self.lang_manager.get_text("preset_plex"): {"crf": 24, "preset": "medium"},
-        }
+        preset_options = [self.lang_manager.get_text(key) for key in self.PRESETS]
+        preset_mapping = {self.lang_manager.get_text(key): preset for key, preset in self.PRESETS.items()}
         self._preset_mapping = preset_mapping
         
         encoder_row = ft.Row([
@@ -160,6 +190,159 @@ class CompressTab:
             )
         ], wrap=True)
 
+        analyze_row = ft.Row([
+            ft.Checkbox(
+                ref=self.analyze_checkbox,
+                label=self.lang_manager.get_text("auto_crop_deinterlace"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+            ),
+            ft.Checkbox(
+                ref=self.size_guard_checkbox,
+                label=self.lang_manager.get_text("size_guard", percent=self._size_guard_percent()),
+                value=True,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+            ),
+            ft.Checkbox(
+                ref=self.estimate_checkbox,
+                label=self.lang_manager.get_text("estimate_savings", percent=self._min_savings_percent()),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+            ),
+            ft.Checkbox(
+                ref=self.prescan_checkbox,
+                label=self.lang_manager.get_text("prescan_inputs"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+            ),
+        ], wrap=True)
+
+        output_row = ft.Row(
+            [
+                ft.Text(self.lang_manager.get_text("output"), width=120, color=self._c("#1e1e2e", "#cdd6f4")),
+                ft.Dropdown(
+                    ref=self.output_mode_dropdown,
+                    width=220,
+                    value="FILE",
+                    on_change=self._on_output_mode_change,
+                    options=[
+                        ft.dropdown.Option("FILE", self.lang_manager.get_text("output_file")),
+                        ft.dropdown.Option("STREAM", self.lang_manager.get_text("output_stream")),
+                    ],
+                    border_color="#6366f1",
+                    focused_border_color="#818cf8",
+                    color=self._c("#1e1e2e", "#cdd6f4"),
+                    bgcolor=self._c("#ffffff", "#1e1e2e"),
+                ),
+                ft.TextField(
+                    ref=self.ladder_field,
+                    value=stream_packaging.DEFAULT_LADDER,
+                    label=self.lang_manager.get_text("abr_ladder"),
+                    width=220,
+                    border_color="#6366f1",
+                    focused_border_color="#818cf8",
+                    color=self._c("#1e1e2e", "#cdd6f4"),
+                    bgcolor=self._c("#ffffff", "#1e1e2e"),
+                ),
+                ft.Text(
+                    ref=self.stream_note,
+                    value=self.lang_manager.get_text("stream_mode_note"),
+                    visible=False,
+                    size=12,
+                    color=self._c("#6b7280", "#a6adc8"),
+                ),
+            ],
+            wrap=True,
+            spacing=10,
+        )
+
+        policy_section = ft.Column(
+            ref=self.policy_section,
+            controls=[
+                ft.Checkbox(
+                    ref=self.policy_checkbox,
+                    label=self.lang_manager.get_text("stream_policy"),
+                    value=False,
+                    check_color="#ffffff",
+                    active_color="#6366f1",
+                    label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+                ),
+                ft.Row(
+                    [
+                        ft.TextField(
+                            ref=self.languages_field,
+                            value="eng, ger",
+                            label=self.lang_manager.get_text("keep_languages"),
+                            width=200,
+                            border_color="#6366f1",
+                            focused_border_color="#818cf8",
+                            color=self._c("#1e1e2e", "#cdd6f4"),
+                            bgcolor=self._c("#ffffff", "#1e1e2e"),
+                        ),
+                        ft.Dropdown(
+                            ref=self.audio_codec_dropdown,
+                            label=self.lang_manager.get_text("lossless_audio_to"),
+                            width=180,
+                            value="opus",
+                            options=[
+                                ft.dropdown.Option("opus", "Opus"),
+                                ft.dropdown.Option("aac", "AAC"),
+                                ft.dropdown.Option("eac3", "E-AC-3"),
+                            ],
+                            border_color="#6366f1",
+                            focused_border_color="#818cf8",
+                            color=self._c("#1e1e2e", "#cdd6f4"),
+                            bgcolor=self._c("#ffffff", "#1e1e2e"),
+                        ),
+                        ft.TextField(
+                            ref=self.audio_bitrate_field,
+                            value="256",
+                            label=self.lang_manager.get_text("audio_bitrate"),
+                            width=140,
+                            border_color="#6366f1",
+                            focused_border_color="#818cf8",
+                            color=self._c("#1e1e2e", "#cdd6f4"),
+                            bgcolor=self._c("#ffffff", "#1e1e2e"),
+                        ),
+                        ft.Dropdown(
+                            ref=self.subtitles_dropdown,
+                            label=self.lang_manager.get_text("subtitles"),
+                            width=180,
+                            value="text",
+                            options=[
+                                ft.dropdown.Option("all", self.lang_manager.get_text("subtitles_all")),
+                                ft.dropdown.Option("text", self.lang_manager.get_text("subtitles_text")),
+                                ft.dropdown.Option("none", self.lang_manager.get_text("subtitles_none")),
+                            ],
+                            border_color="#6366f1",
+                            focused_border_color="#818cf8",
+                            color=self._c("#1e1e2e", "#cdd6f4"),
+                            bgcolor=self._c("#ffffff", "#1e1e2e"),
+                        ),
+                    ],
+                    wrap=True,
+                    spacing=10,
+                ),
+                ft.Checkbox(
+                    ref=self.drop_commentary_checkbox,
+                    label=self.lang_manager.get_text("drop_commentary"),
+                    value=True,
+                    check_color="#ffffff",
+                    active_color="#6366f1",
+                    label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4")),
+                ),
+            ],
+            spacing=6,
+        )
+
         progress_section = ft.Column(
             [
                 ft.Text(
@@ -192,6 +375,14 @@ class CompressTab:
                     style=ft.ButtonStyle(color="#ffffff", bgcolor="#22c55e"),
                     visible=True,
                 ),
+                ft.ElevatedButton(
+                    ref=self.pause_button_ref,
+                    text=self.lang_manager.get_text("pause"),
+                    icon=icons.PAUSE if icons else "pause",
+                    on_click=self._toggle_pause,
+                    style=ft.ButtonStyle(color="#ffffff", bgcolor="#6366f1"),
+                    visible=False,
+                ),
                 ft.ElevatedButton(
                     ref=self.cancel_button_ref,
                     text=self.lang_manager.get_text("cancel"),
@@ -216,6 +407,11 @@ class CompressTab:
                 mode_section,
                 ft.Container(height=10),
                 preset_row,
+                analyze_row,
+                ft.Container(height=10),
+                policy_section,
+                ft.Container(height=10),
+                output_row,
                 ft.Container(height=10),
                 progress_section,
                 ft.Container(height=10),
@@ -226,21 +422,7 @@ class CompressTab:
         )
     
     def _detect_gpu_encoder(self):
-        try:
-            encoders = subprocess.check_output(
-                [get_ffmpeg_path(), "-encoders"],
-                stderr=subprocess.DEVNULL,
-                text=True,
-            )
-            if "hevc_nvenc" in encoders:
-                return "hevc_nvenc"
-            if "hevc_amf" in encoders:
-                return "hevc_amf"
-            if "hevc_qsv" in encoders:
-                return "hevc_qsv"
-        except Exception:
-            pass
-        return "libx265"
+        return detect_hevc_encoder()
     
     def _browse_files(self, e):
         if platform.system() == "Darwin":
@@ -347,13 +529,25 @@ class CompressTab:
     def _cancel_compress(self, e):
         self._cancel_requested = True
         self.status_text.current.value = "Cancelling..."
-        try:
-            if self._current_process is not None:
-                self._current_process.kill()
-        except Exception:
-            pass
+        self._jobs.kill_all()
         self.page.update()
 
+    def _toggle_pause(self, e):
+        """Stop or continue the running ffmpeg jobs without losing their progress"""
+        if self._jobs.paused:
+            self._jobs.resume_all()
+            self.pause_button_ref.current.text = self.lang_manager.get_text("pause")
+            self.pause_button_ref.current.icon = icons.PAUSE if icons else "pause"
+        else:
+            self._jobs.pause_all()
+            self.pause_button_ref.current.text = self.lang_manager.get_text("resume")
+            self.pause_button_ref.current.icon = icons.PLAY_ARROW if icons else "play_arrow"
+            self.status_text.current.value = self.lang_manager.get_text("paused")
+        self.page.update()
+
+    def _resource_limits(self):
+        return process_control.ResourceLimits.from_settings(self.lang_manager.get_setting)
+
     def _get_duration_seconds(self, path):
         out = subprocess.check_output(
             [
@@ -366,6 +560,104 @@ class CompressTab:
         )
         return float(out.strip())
 
+    def _size_guard_active(self):
+        """Only CRF encodes to a single file are judged; a target size is the user's call"""
+        return (self.size_guard_checkbox.current.value and self.mode_radio.current.value == "CRF"
+                and self.output_mode_dropdown.current.value != "STREAM")
+
+    def _estimate_active(self):
+        """Sample encodes only predict CRF encodes to a single file"""
+        return (self.estimate_checkbox.current.value and self.mode_radio.current.value == "CRF"
+                and self.output_mode_dropdown.current.value != "STREAM")
+
+    def _min_savings_percent(self):
+        return self.lang_manager.get_setting("min_savings_percent", 0) or savings_estimate.DEFAULT_MIN_SAVINGS
+
+    def _estimate_worth(self, input_file, position, preset):
+        """Sample-encode input_file, tag it in the queue; False when it saves too little"""
+        name = Path(input_file).name
+        self._ui_queue.put(("status", self.lang_manager.get_text("estimating_savings", name=name)))
+        plan = self._stream_plans.get(input_file)
+        other = int(sum(d["bytes_after"] for d in plan if d["codec_type"] != "video")) if plan else None
+        video_args = [
+            "-c:v", self._encoder,
+            "-profile:v", "main10",
+            "-pix_fmt", "p010le",
+            "-preset", preset["preset"],
+            "-crf", str(preset["crf"]),
+        ]
+        # The sample encodes run in this job's slot: its limits, its cores, one window at a time
+        limits = self._resource_limits()
+        cores = None
+        if self.lang_manager.get_setting("cpu_pinning", True):
+            cores = self._cores.allocate(input_file, self._controller.target)
+        if cores is not None:
+            limits.cpus = cores.cpus
+        video_args += cpu_affinity.encoder_args(self._encoder, cores)
+        pools = cpu_affinity.x265_params(self._encoder, cores)
+        if pools:
+            video_args += ["-x265-params", pools]
+        try:
+            result = savings_estimate.estimate(
+                input_file, video_args, other,
+                workers=1 if self._controller.target > 1 else None,
+                jobs=self._jobs, limits=limits, cancelled=lambda: self._cancel_requested,
+            )
+        finally:
+            self._cores.release(input_file)
+        if result is None:
+            # Couldn't measure; let the full encode (and its size guard) decide, unless cancelled
+            return not self._cancel_requested
+        low, mid, high = (int(round(result[k] * 100)) for k in ("low", "savings", "high"))
+        self._ui_queue.put(("queue_note", position, self.lang_manager.get_text(
+            "estimated_savings", name=name, percent=mid, low=low, high=high)))
+        if mid >= self._min_savings_percent():
+            return True
+        size_guard.mark_not_worth(input_file, self._encoder, preset["crf"],
+                                  os.path.getsize(input_file) * (1 - result["savings"]))
+        self._ui_queue.put(("status", self.lang_manager.get_text(
+            "estimate_skipped", name=name, percent=mid, minimum=self._min_savings_percent())))
+        return False
+
+    def _prescan(self, files, positions):
+        """Scan the batch for damage, tag findings in the queue; returns the files to encode"""
+        get_setting = self.lang_manager.get_setting
+        folder = get_setting("quarantine_dir", "") or ""
+        scanned = []
+        self._ui_queue.put(("status", self.lang_manager.get_text("prescan_started", done=0, count=len(files))))
+
+        def progress(result):
+            scanned.append(result.path)
+            self._ui_queue.put(("status", self.lang_manager.get_text(
+                "prescan_started", done=len(scanned), count=len(files))))
+
+        results = integrity_scan.scan_all(
+            files, keyframes=bool(get_setting("prescan_keyframes", False)),
+            max_device_jobs=get_setting("device_max_jobs", 0) or None,
+            on_result=progress, cancelled=lambda: self._cancel_requested,
+        )
+        keep = []
+        for file_path in files:
+            result = results.get(file_path)
+            if result is None or result.verdict == integrity_scan.OK:
+                keep.append(file_path)
+                continue
+            name = Path(file_path).name
+            if result.verdict == integrity_scan.SUSPECT:
+                self._tolerant.add(file_path)
+                keep.append(file_path)
+                note = self.lang_manager.get_text("prescan_suspect", name=name, detail=result.detail())
+            elif folder and integrity_scan.quarantine(file_path, folder):
+                note = self.lang_manager.get_text("prescan_quarantined", name=name, detail=result.detail(),
+                                                  folder=folder)
+            else:
+                note = self.lang_manager.get_text("prescan_broken", name=name, detail=result.detail())
+            self._ui_queue.put(("queue_note", positions[file_path], note))
+        return keep
+
+    def _size_guard_percent(self):
+        return self.lang_manager.get_setting("size_guard_percent", 0) or size_guard.DEFAULT_PERCENT
+
     def _calculate_bitrate_kbps(self, duration, target_gb):
         target_bits = target_gb * 1024**3 * 8
         total_kbps = target_bits / duration / 1000
@@ -380,43 +672,191 @@ class CompressTab:
         self._cancel_requested = False
         self.start_button_ref.current.visible = False
         self.cancel_button_ref.current.visible = True
+        self.pause_button_ref.current.visible = True
         self.progress_text.current.value = "Starting..."
         self.status_text.current.value = "Starting..."
         self.page.update()
 
         threading.Thread(target=self._compress_worker, daemon=True).start()
 
+    def _on_output_mode_change(self, e=None):
+        # The ladder has its own per-rung caps and a single AAC stereo track,
+        # so target size and the stream policy don't apply to it
+        stream = self.output_mode_dropdown.current.value == "STREAM"
+        self.mode_radio.current.disabled = stream
+        self.target_size.current.disabled = stream
+        self.policy_section.current.disabled = stream
+        self.stream_note.current.visible = stream
+        self.page.update()
+
+    def _build_stream_policy(self):
+        """Return a StreamPolicy from the UI, or None when the policy is disabled"""
+        if not self.policy_checkbox.current.value or self.output_mode_dropdown.current.value == "STREAM":
+            return None
+        try:
+            bitrate = int(self.audio_bitrate_field.current.value)
+        except Exception:
+            bitrate = 256
+        return stream_policy.StreamPolicy(
+            keep_languages=stream_policy.parse_languages(self.languages_field.current.value or ""),
+            drop_commentary=bool(self.drop_commentary_checkbox.current.value),
+            audio_codec=self.audio_codec_dropdown.current.value,
+            audio_bitrate_kbps=bitrate,
+            subtitles=self.subtitles_dropdown.current.value,
+        )
+
+    def _project_policy_savings(self, policy):
+        """Plan every queued file up front and report the projected savings"""
+        self._stream_plans = {}
+        total = 0
+        for idx, file_path in enumerate(list(self._task_queue.queue)):
+            decisions = policy.plan(probe_media(file_path))
+            self._stream_plans[file_path] = decisions
+            saved = stream_policy.projected_savings(decisions)
+            total += saved
+            self._ui_queue.put(("queue_note", idx, f"{Path(file_path).name}  (-{stream_policy.format_bytes(saved)})"))
+        self._ui_queue.put(("status", self.lang_manager.get_text(
+            "projected_savings", size=stream_policy.format_bytes(total), count=len(self._stream_plans))))
+
     def _compress_worker(self):
+        self._stream_policy = self._build_stream_policy()
+        self._stream_plans = {}
+        if self._stream_policy is not None:
+            self._project_policy_savings(self._stream_policy)
+
+        files = []
         while not self._task_queue.empty():
-            if self._cancel_requested:
-                break
-            file_path = self._task_queue.get()
-            self._ui_queue.put(("status", f"Encoding: {Path(file_path).name}"))
-            try:
-                self._encode_file(file_path)
-            finally:
-                self._task_queue.task_done()
+            files.append(self._task_queue.get())
+            self._task_queue.task_done()
+
+        positions = {f: i for i, f in enumerate(files)}
+        preset = self._preset_mapping.get(self.preset_dropdown.current.value, {"crf": 23, "preset": "slow"})
+        if self._size_guard_active() or self._estimate_active():
+            # Files an earlier run gave up on with these settings
+            skipped = [f for f in files if size_guard.not_worth(f, self._encoder, preset["crf"])]
+            for file_path in skipped:
+                self._ui_queue.put(("queue_note", positions[file_path], self.lang_manager.get_text(
+                    "not_worth_skipped", name=Path(file_path).name)))
+            files = [f for f in files if f not in skipped]
+
+        self._tolerant = set()
+        if self.prescan_checkbox.current.value:
+            files = self._prescan(files, positions)
+
+        retries = self.lang_manager.get_setting("stall_retries", job_watchdog.DEFAULT_RETRIES)
+
+        def encode(file_path):
+            if self._estimate_active() and not self._estimate_worth(file_path, positions[file_path], preset):
+                return
+            status = f"Encoding: {Path(file_path).name}"
+            if file_path in self._stream_plans:
+                saved = stream_policy.projected_savings(self._stream_plans[file_path])
+                status += f" (-{stream_policy.format_bytes(saved)})"
+            self._ui_queue.put(("status", status))
+            # Files the pre-scan found damaged read error-tolerantly from the start
+            first = 1 if file_path in self._tolerant else 0
+            for attempt in range(retries + 1):
+                if not self._encode_file(file_path, first + attempt) or self._cancel_requested:
+                    break
+                if attempt < retries:
+                    self._ui_queue.put(("status", self.lang_manager.get_text(
+                        "stall_retry", name=Path(file_path).name, attempt=attempt + 1, retries=retries)))
+
+        self._file_progress = {}
+        self._scratch = scratch.ScratchArea.from_settings(self.lang_manager.get_setting)
+        self._controller = job_scheduler.ConcurrencyController(
+            max_jobs=self.lang_manager.get_setting("max_parallel_jobs", 0) or None,
+            log=self._log_concurrency,
+        )
+        budget = self.lang_manager.get_setting("memory_budget_mb", 0) or memory_admission.default_budget_mb()
+        self._ledger = memory_admission.MemoryLedger(budget, log=lambda detail: self._ui_queue.put(
+            ("status", self.lang_manager.get_text("memory_note", detail=detail))))
+        self._devices = device_io.DeviceLimiter(
+            max_jobs=self.lang_manager.get_setting("device_max_jobs", 0) or None,
+            log=lambda detail: self._ui_queue.put(
+                ("status", self.lang_manager.get_text("device_note", detail=detail))),
+        )
+        self._watchdog = job_watchdog.StallWatchdog.from_settings(
+            self.lang_manager.get_setting, paused=lambda: self._jobs.paused,
+            log=lambda detail: self._ui_queue.put(
+                ("status", self.lang_manager.get_text("stall_note", detail=detail))),
+        )
+        self._space = disk_space.SpaceLedger(log=lambda detail: self._ui_queue.put(
+            ("status", self.lang_manager.get_text("space_note", detail=detail))))
+        scheduler = job_scheduler.JobScheduler(self._controller, ledger=self._ledger, footprint=self._footprint,
+                                               devices=self._devices, io_paths=self._io_paths,
+                                               space=self._space, outputs=self._predicted_outputs)
+        # Copy ahead what the scheduler starts next, not what comes next in the list
+        self._prefetcher = prefetch.Prefetcher.for_batch(
+            self._scratch, files, self.lang_manager.get_setting,
+            log=lambda detail: self._ui_queue.put(
+                ("status", self.lang_manager.get_text("prefetch_note", detail=detail))),
+            upcoming=scheduler.peek,
+        )
+        scheduler.run(
+            files,
+            encode,
+            cancelled=lambda: self._cancel_requested,
+            paused=lambda: self._jobs.paused,
+        )
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        self._publisher.join()
+        if self._scratch is not None:
+            self._scratch.close()
+            self._scratch = None
 
-        self._ui_queue.put(("idle",))
+        # Files the disk couldn't take stay listed with a note after the batch
+        refused = [positions[f] for f in scheduler.refused]
+        for file_path in scheduler.refused:
+            self._ui_queue.put(("queue_note", positions[file_path], self.lang_manager.get_text(
+                "space_refused_note", name=Path(file_path).name)))
+        self._ui_queue.put(("done",))
+        self._ui_queue.put(("idle", refused))
+        if refused:
+            self._ui_queue.put(("status", self.lang_manager.get_text("space_refused", count=len(refused))))
         self._cancel_requested = False
 
-    def _encode_file(self, input_file):
-        duration = self._get_duration_seconds(input_file)
-        output_file = str(Path(input_file).with_name(Path(input_file).stem + "_compressed.mkv"))
+    def _build_stream_command(self, input_file, preset, vfilters, cores=None, source=None, input_args=None):
+        """ABR ladder from one decode, written as fMP4 segments with DASH + HLS manifests"""
+        info = probe_media(input_file)
+        out_dir = stream_packaging.output_dir_for(input_file)
+        os.makedirs(out_dir, exist_ok=True)
+        rungs = stream_packaging.fit_ladder(stream_packaging.parse_ladder(self.ladder_field.current.value), info)
+        return stream_packaging.build_command(
+            source or input_file, out_dir, rungs,
+            encoder=self._encoder,
+            crf=preset["crf"],
+            preset=preset["preset"],
+            info=info,
+            shared_filters=vfilters,
+            extra_input_args=input_args,
+            video_args=["-profile:v", "main10", "-pix_fmt", "p010le"]
+            + cpu_affinity.encoder_args(self._encoder, cores),
+            x265_params=[p for p in [cpu_affinity.x265_params(self._encoder, cores)] if p],
+        )
 
-        mode = self.mode_radio.current.value
-        preset_key = self.preset_dropdown.current.value
-        preset = self._preset_mapping.get(preset_key, {"crf": 23, "preset": "slow"})
+    def _build_file_command(self, input_file, output_file, duration, mode, preset, vfilters, cores=None,
+                            source=None, input_args=None):
+        policy = getattr(self, "_stream_policy", None)
+        decisions = None
+        if policy is not None:
+            decisions = self._stream_plans.get(input_file) or policy.plan(probe_media(input_file))
 
-        cmd = [
-            get_ffmpeg_path(), "-y",
-            "-i", input_file,
-            "-map", "0",
+        cmd = [get_ffmpeg_path(), "-y"] + list(input_args or []) + ["-i", source or input_file]
+        # Without a policy every stream is mapped and copied as before
+        cmd += ["-map", "0:v"] if decisions else ["-map", "0"]
+        cmd += [
             "-c:v", self._encoder,
             "-profile:v", "main10",
             "-pix_fmt", "p010le",
             "-preset", preset["preset"],
         ]
+        cmd += cpu_affinity.encoder_args(self._encoder, cores)
+        pools = cpu_affinity.x265_params(self._encoder, cores)
+        if pools:
+            cmd += ["-x265-params", pools]
 
         if mode == "CRF":
             cmd += ["-crf", str(preset["crf"])]
@@ -432,9 +872,16 @@ class CompressTab:
                 "-bufsize", f"{bitrate * 2}k",
             ]
 
+        if vfilters:
+            # Only the main video stream; -map 0 may also carry cover art
+            cmd += ["-filter:v:0", ",".join(vfilters)]
+
+        if decisions:
+            cmd += policy.build_args(decisions)
+        else:
+            cmd += ["-c:a", "copy", "-c:s", "copy"]
+
         cmd += [
-            "-c:a", "copy",
-            "-c:s", "copy",
             "-color_primaries", "bt2020",
             "-color_trc", "smpte2084",
             "-colorspace", "bt2020nc",
@@ -442,37 +889,220 @@ class CompressTab:
             "-nostats",
             output_file,
         ]
+        return cmd
 
-        self._current_process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-        )
+    def _encode_file(self, input_file, attempt=0):
+        """Compress one file; True when the watchdog stopped it for stalling"""
+        duration = self._get_duration_seconds(input_file)
+        output_file = str(Path(input_file).with_name(Path(input_file).stem + "_compressed.mkv"))
+
+        mode = self.mode_radio.current.value
+        preset_key = self.preset_dropdown.current.value
+        preset = self._preset_mapping.get(preset_key, {"crf": 23, "preset": "slow"})
+
+        vfilters = []
+        if self.analyze_checkbox.current.value:
+            self._ui_queue.put(("status", self.lang_manager.get_text("analyzing", name=Path(input_file).name)))
+            vfilters = video_analysis.build_filters(video_analysis.analyze(input_file))
+            self._ui_queue.put(("status", f"Encoding: {Path(input_file).name}"))
+
+        limits = self._resource_limits()
+        cores = None
+        if self.lang_manager.get_setting("cpu_pinning", True):
+            cores = self._cores.allocate(input_file, self._controller.target)
+        if cores is not None:
+            limits.cpus = cores.cpus
+
+        # Stage single-file outputs in the scratch folder and move them into place when complete
+        staged = None
+        to_publish = []
+        if self.output_mode_dropdown.current.value != "STREAM" and self._scratch is not None:
+            staged = self._scratch.reserve(input_file, scratch.expected_output_mb(input_file))
+        if staged:
+            final_output = output_file
+            output_file = os.path.join(staged, os.path.basename(final_output))
+            to_publish = [(output_file, final_output)]
+
+        # A local copy of a NAS-hosted input, if the prefetcher got it here in time
+        source = self._prefetcher.acquire(input_file) if self._prefetcher is not None else input_file
+
+        input_args = job_watchdog.retry_input_args(attempt)
+        if self.output_mode_dropdown.current.value == "STREAM":
+            cmd = self._build_stream_command(input_file, preset, vfilters, cores, source, input_args)
+            tracked = []  # segment folders are left to the user
+        else:
+            cmd = self._build_file_command(input_file, output_file, duration, mode, preset, vfilters, cores,
+                                           source, input_args)
+            tracked = [output_file] + [final + ".part" for _, final in to_publish]
+
+        try:
+            orphans.track(tracked)
+            job = self._jobs.launch(
+                cmd,
+                limits,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+            )
+        except Exception:
+            self._cores.release(input_file)
+            if self._prefetcher is not None:
+                self._prefetcher.release(input_file)
+            if to_publish:
+                self._scratch.release(input_file)
+            orphans.untrack(tracked)
+            raise
+
+        self._ledger.attach(input_file, job.pid)
+        self._devices.attach(input_file, job.pid)
+        self._cores.attach(input_file, job.pid)
+        self._watchdog.watch(input_file, job, Path(input_file).name)
 
         start = time.time()
-        if self._current_process.stdout is None:
-            return
+        succeeded = False
+        guard = None
+        if self._size_guard_active():
+            guard = size_guard.SizeGuard(os.path.getsize(input_file), duration, self._size_guard_percent())
+        try:
+            if job.popen.stdout is None:
+                return
+            for line in job.popen.stdout:
+                if self._cancel_requested:
+                    job.kill()
+                    job.wait()
+                    return
+
+                if line.startswith("frame="):
+                    value = line.split("=", 1)[1].strip()
+                    if value.isdigit():
+                        self._controller.report(input_file, int(value))
+                        self._watchdog.progress(input_file, int(value))
+                elif line.startswith("total_size=") and guard is not None:
+                    value = line.split("=", 1)[1].strip()
+                    if value.isdigit():
+                        guard.total_size(int(value))
+                elif line.startswith("out_time_ms="):
+                    value = line.split("=", 1)[1].strip()
+                    if not value.isdigit():
+                        continue
+                    current_sec = int(value) / 1_000_000
+                    if guard is not None:
+                        guard.out_time(current_sec)
+                        if guard.exceeded():
+                            # Keep the original; later runs skip it at these settings
+                            job.kill()
+                            job.wait()  # the partial output can only be removed once ffmpeg let go of it
+                            size_guard.mark_not_worth(input_file, self._encoder, preset["crf"], guard.projected())
+                            self._ui_queue.put(("status", self.lang_manager.get_text(
+                                "not_worth_aborted", name=Path(input_file).name,
+                                percent=int(guard.projected() * 100 / guard.input_bytes))))
+                            return
+                    progress = min((current_sec / duration) * 100.0, 100.0) if duration > 0 else 0
+
+                    elapsed = time.time() - start
+                    self._report_progress(input_file, progress)
 
-        for line in self._current_process.stdout:
-            if self._cancel_requested:
+            job.wait()
+            succeeded = job.returncode == 0
+            if succeeded:
+                stream = self.output_mode_dropdown.current.value == "STREAM"
+                self._space.record(input_file, [stream_packaging.output_dir_for(input_file) if stream else output_file])
+            if succeeded and to_publish:
+                self._space.defer(input_file)  # the destination still has to take the file
+                self._publisher.publish(
+                    to_publish, lambda finals, error: self._on_published(input_file, error, tracked))
+                to_publish = []
+        finally:
+            stalled = self._watchdog.unwatch(input_file)
+            if not succeeded and not staged and self.output_mode_dropdown.current.value != "STREAM":
+                # Don't leave a partial output behind (full disk, cancelled)
                 try:
-                    self._current_process.kill()
-                except Exception:
+                    os.remove(output_file)
+                except OSError:
                     pass
-                return
+            if self._prefetcher is not None:
+                self._prefetcher.release(input_file)
+            if to_publish:
+                self._scratch.release(input_file)  # failed or cancelled: drop the partial output
+            if not staged or to_publish:
+                orphans.untrack(tracked)  # otherwise once published
+            self._jobs.discard(job)
+            self._cores.release(input_file)
+            self._controller.finished(input_file)
+            with self._progress_lock:
+                self._file_progress.pop(input_file, None)
+                running = list(self._file_progress.values())
+        # Other files may still be encoding: show their progress, not an idle bar
+        self._ui_queue.put(("progress", sum(running) / len(running) if running else 100.0))
+        return stalled
 
-            if line.startswith("out_time_ms="):
-                value = line.split("=", 1)[1].strip()
-                if not value.isdigit():
-                    continue
-                current_sec = int(value) / 1_000_000
-                progress = min((current_sec / duration) * 100.0, 100.0) if duration > 0 else 0
+    def _on_published(self, input_file, error, tracked=()):
+        """Publisher callback for the staged output of one file"""
+        orphans.untrack(tracked)
+        self._space.release(input_file, deferred=True)
+        self._scratch.release(input_file, keep_files=error is not None)
+        if error is not None:
+            self._ui_queue.put(("status", self.lang_manager.get_text(
+                "publish_failed", name=Path(input_file).name, error=error, folder=self._scratch.root)))
 
-                elapsed = time.time() - start
-                self._ui_queue.put(("progress", progress))
+    def _report_progress(self, input_file, progress):
+        """Progress of the running files; their mean when several run at once"""
+        with self._progress_lock:
+            self._file_progress[input_file] = progress
+            mean = sum(self._file_progress.values()) / len(self._file_progress)
+        self._ui_queue.put(("progress", mean))
 
-        self._ui_queue.put(("done",))
+    def _footprint(self, input_file):
+        """Predicted peak memory of compressing one queued file"""
+        preset = self._preset_mapping.get(self.preset_dropdown.current.value, {"crf": 23, "preset": "slow"})
+        stream = get_video_stream(probe_media(input_file)) or {}
+        width, height = stream.get("width"), stream.get("height")
+        model = memory_admission.model_mb(self._encoder, preset["preset"], width, height)
+        variant = ""
+        if self.output_mode_dropdown.current.value == "STREAM":
+            # The ladder's smaller rungs together cost about half of the top one again
+            model, variant = int(model * 1.5), "ladder"
+        key = memory_admission.footprint_key(self._encoder, preset["preset"], height, variant)
+        return memory_admission.estimate(key, model)
+
+    def _predicted_outputs(self, input_file):
+        """Predicted size of what compressing one queued file writes"""
+        info = probe_media(input_file)
+        preset = self._preset_mapping.get(self.preset_dropdown.current.value, {"crf": 23, "preset": "slow"})
+        video_args = ["-c:v", self._encoder, "-preset", preset["preset"], "-crf", str(preset["crf"])]
+        if self.output_mode_dropdown.current.value == "STREAM":
+            # The ladder's smaller rungs together take about half of the top one again
+            return [disk_space.predict(stream_packaging.output_dir_for(input_file), info, video_args,
+                                       disk_space.copied_bytes(info, first_audio_only=True),
+                                       variant="ladder", scale=1.5)]
+        output_file = str(Path(input_file).with_name(Path(input_file).stem + "_compressed.mkv"))
+        plan = self._stream_plans.get(input_file)
+        if plan:
+            copied = int(sum(d["bytes_after"] for d in plan if d["codec_type"] != "video"))
+        else:
+            copied = disk_space.copied_bytes(info)
+        target_kbps = None
+        try:
+            duration = float(info.get("format", {}).get("duration") or 0)
+        except (TypeError, ValueError):
+            duration = 0
+        if self.mode_radio.current.value != "CRF" and duration > 0:
+            try:
+                target_gb = float(self.target_size.current.value)
+            except Exception:
+                target_gb = 5.0
+            target_kbps = self._calculate_bitrate_kbps(duration, target_gb)
+        return [disk_space.predict(output_file, info, video_args, copied, target_kbps=target_kbps)]
+
+    def _io_paths(self, input_file):
+        """Files a queued encode reads and the folder its output is written to"""
+        staged = self._scratch is not None and self.output_mode_dropdown.current.value != "STREAM"
+        return [input_file], [self._scratch.root if staged else os.path.dirname(input_file)]
+
+    def _log_concurrency(self, decision):
+        self._cores.rebalance(decision.new)
+        self._ui_queue.put(("status", self.lang_manager.get_text(
+            "concurrency_decision", old=decision.old, new=decision.new, reason=decision.reason)))
 
     def _start_ui_poller(self):
         def poll_loop():
@@ -489,6 +1119,12 @@ class CompressTab:
                         elif msg[0] == "status":
                             self.status_text.current.value = msg[1]
                             updated = True
+                        elif msg[0] == "queue_note":
+                            _, idx, text = msg
+                            controls = self.queue_list.current.controls
+                            if idx < len(controls):
+                                controls[idx].value = text
+                                updated = True
                         elif msg[0] == "done":
                             self.progress_bar.current.value = 0
                             self.progress_text.current.value = self.lang_manager.get_text("idle")
@@ -498,7 +1134,13 @@ class CompressTab:
                             self.progress_text.current.value = self.lang_manager.get_text("idle")
                             self.start_button_ref.current.visible = True
                             self.cancel_button_ref.current.visible = False
-                            self.queue_list.current.controls.clear()
+                            self.pause_button_ref.current.visible = False
+                            self.pause_button_ref.current.text = self.lang_manager.get_text("pause")
+                            self.pause_button_ref.current.icon = icons.PAUSE if icons else "pause"
+                            # ("idle", positions) keeps those entries, e.g. files that were skipped
+                            controls = self.queue_list.current.controls
+                            keep = msg[1] if len(msg) > 1 else ()
+                            controls[:] = [controls[i] for i in keep if i < len(controls)]
                             updated = True
                 except queue.Empty:
                     pass
@@ -1,4 +1,5 @@
 """Convert Tab - H.266/VVC to H.265/H.264 conversion"""
+import functools
 import os
 import subprocess
 import platform
@@ -8,7 +9,23 @@ import queue
 from pathlib import Path
 
 import flet as ft
-from ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path
+from ffmpeg_utils import get_ffmpeg_path, get_ffprobe_path, probe_media, detect_hevc_encoder, get_video_stream
+import multi_output
+import tonemap
+import video_analysis
+import integrity_scan
+import process_control
+import job_scheduler
+import memory_admission
+import cpu_affinity
+import scratch
+import prefetch
+import device_io
+import disk_space
+import job_watchdog
+import orphans
+import output_verify
+import backups
 
 try:
     from flet import icons
@@ -29,24 +46,52 @@ class ConvertTab:
         self.queue_list = ft.Ref[ft.ListView]()
         self.codec_dropdown = ft.Ref[ft.Dropdown]()
         self.replace_checkbox = ft.Ref[ft.Checkbox]()
+        self.verify_checkbox = ft.Ref[ft.Checkbox]()
+        self.backup_checkbox = ft.Ref[ft.Checkbox]()
+        self.tonemap_checkbox = ft.Ref[ft.Checkbox]()
+        self.analyze_checkbox = ft.Ref[ft.Checkbox]()
+        self.prescan_checkbox = ft.Ref[ft.Checkbox]()
+        self.extra_h265_checkbox = ft.Ref[ft.Checkbox]()
+        self.extra_h264_checkbox = ft.Ref[ft.Checkbox]()
+        self.extra_compressed_checkbox = ft.Ref[ft.Checkbox]()
+        self.compress_preset_dropdown = ft.Ref[ft.Dropdown]()
         self.log_column = ft.Ref[ft.Column]()
         self.progress_bar = ft.Ref[ft.ProgressBar]()
         self.progress_text = ft.Ref[ft.Text]()
         self.start_button_ref = ft.Ref[ft.ElevatedButton]()
+        self.pause_button_ref = ft.Ref[ft.ElevatedButton]()
         self.cancel_button_ref = ft.Ref[ft.ElevatedButton]()
         
         # State
         self._task_queue: "queue.Queue[str]" = queue.Queue()
         self._ui_queue: "queue.Queue[tuple]" = queue.Queue()
         self._cancel_requested = False
-        self._current_process = None
+        self._jobs = process_control.JobSet()
+        self._controller = None
+        self._ledger = None
+        self._devices = None
+        self._space = None
+        self._watchdog = None
+        self._cores = cpu_affinity.CoreAllocator()
+        self._scratch = None
+        self._publisher = scratch.Publisher(
+            log=lambda detail: self._log(self.lang_manager.get_text("publish_note", detail=detail), "#ef4444"))
+        self._prefetcher = None
+        self._progress_lock = threading.Lock()
+        self._file_progress = {}
         self._ui_poller_started = False
+        self._tonemap_method = None
         
         # File pickers (Windows/Linux)
         self.files_picker = ft.FilePicker(on_result=self._on_files_picked)
         self.folder_picker = ft.FilePicker(on_result=self._on_folder_picked)
         page.overlay.append(self.files_picker)
         page.overlay.append(self.folder_picker)
+
+        # Remove partial outputs a crashed or killed session left behind
+        threading.Thread(target=self._sweep_orphans, daemon=True).start()
+        # ... and backups of replaced originals past their retention
+        threading.Thread(target=self._prune_backups, daemon=True).start()
     
     def _c(self, light, dark):
         return dark if self.page.theme_mode == ft.ThemeMode.DARK else light
@@ -118,9 +163,98 @@ class ConvertTab:
                 check_color="#ffffff",
                 active_color="#6366f1",
                 label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Checkbox(
+                ref=self.verify_checkbox,
+                label=self.lang_manager.get_text("verify_before_replace"),
+                value=True,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Checkbox(
+                ref=self.backup_checkbox,
+                label=self.lang_manager.get_text("backup_originals"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            )
+        ], wrap=True)
+
+        tonemap_row = ft.Row([
+            ft.Checkbox(
+                ref=self.tonemap_checkbox,
+                label=self.lang_manager.get_text("tonemap_hdr"),
+                value=True,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
             )
         ])
 
+        analyze_row = ft.Row([
+            ft.Checkbox(
+                ref=self.analyze_checkbox,
+                label=self.lang_manager.get_text("auto_crop_deinterlace"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Checkbox(
+                ref=self.prescan_checkbox,
+                label=self.lang_manager.get_text("prescan_inputs"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            )
+        ], wrap=True)
+
+        # Extra renditions produced from the same decode as the main output
+        self._compress_presets = multi_output.COMPRESS_PRESETS
+        extra_outputs_row = ft.Row([
+            ft.Text(self.lang_manager.get_text("extra_outputs"), width=120, color=self._c("#1e1e2e", "#cdd6f4")),
+            ft.Checkbox(
+                ref=self.extra_h265_checkbox,
+                label="H.265",
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Checkbox(
+                ref=self.extra_h264_checkbox,
+                label="H.264",
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Checkbox(
+                ref=self.extra_compressed_checkbox,
+                label=self.lang_manager.get_text("compressed_copy"),
+                value=False,
+                check_color="#ffffff",
+                active_color="#6366f1",
+                label_style=ft.TextStyle(color=self._c("#1f2937", "#cdd6f4"))
+            ),
+            ft.Dropdown(
+                ref=self.compress_preset_dropdown,
+                width=200,
+                value="preset_film",
+                options=[
+                    ft.dropdown.Option(key, self.lang_manager.get_text(key).split(" - ")[0])
+                    for key in self._compress_presets
+                ],
+                border_color="#6366f1",
+                focused_border_color="#818cf8",
+                color=self._c("#1e1e2e", "#cdd6f4"),
+                bgcolor=self._c("#ffffff", "#1e1e2e")
+            ),
+        ], wrap=True)
+
         start_cancel_row = ft.Row(
             [
                 ft.ElevatedButton(
@@ -131,6 +265,14 @@ class ConvertTab:
                     style=ft.ButtonStyle(color="#ffffff", bgcolor="#22c55e"),
                     visible=True,
                 ),
+                ft.ElevatedButton(
+                    ref=self.pause_button_ref,
+                    text=self.lang_manager.get_text("pause"),
+                    icon=icons.PAUSE if icons else "pause",
+                    on_click=self._toggle_pause,
+                    style=ft.ButtonStyle(color="#ffffff", bgcolor="#6366f1"),
+                    visible=False,
+                ),
                 ft.ElevatedButton(
                     ref=self.cancel_button_ref,
                     text=self.lang_manager.get_text("cancel"),
@@ -185,6 +327,10 @@ class ConvertTab:
                 codec_row,
                 ft.Container(height=10),
                 replace_row,
+                tonemap_row,
+                analyze_row,
+                ft.Container(height=10),
+                extra_outputs_row,
                 ft.Container(height=10),
                 start_cancel_row,
                 ft.Container(height=10),
@@ -299,12 +445,24 @@ class ConvertTab:
     def _cancel_conversion(self, e):
         self._cancel_requested = True
         self.progress_text.current.value = "Cancelling..."
-        try:
-            if self._current_process is not None:
-                self._current_process.kill()
-        except Exception:
-            pass
+        self._jobs.kill_all()
+        self.page.update()
+
+    def _toggle_pause(self, e):
+        """Stop or continue the running ffmpeg jobs without losing their progress"""
+        if self._jobs.paused:
+            self._jobs.resume_all()
+            self.pause_button_ref.current.text = self.lang_manager.get_text("pause")
+            self.pause_button_ref.current.icon = icons.PAUSE if icons else "pause"
+        else:
+            self._jobs.pause_all()
+            self.pause_button_ref.current.text = self.lang_manager.get_text("resume")
+            self.pause_button_ref.current.icon = icons.PLAY_ARROW if icons else "play_arrow"
+            self.progress_text.current.value = self.lang_manager.get_text("paused")
         self.page.update()
+
+    def _resource_limits(self):
+        return process_control.ResourceLimits.from_settings(self.lang_manager.get_setting)
     
     def _log(self, message, color=None):
         if threading.current_thread() is not threading.main_thread():
@@ -345,6 +503,9 @@ class ConvertTab:
                         elif msg[0] == "idle":
                             self.start_button_ref.current.visible = True
                             self.cancel_button_ref.current.visible = False
+                            self.pause_button_ref.current.visible = False
+                            self.pause_button_ref.current.text = self.lang_manager.get_text("pause")
+                            self.pause_button_ref.current.icon = icons.PAUSE if icons else "pause"
                             self.queue_list.current.controls.clear()
                             updated = True
                         elif msg[0] == "clear_log":
@@ -386,8 +547,11 @@ class ConvertTab:
         except Exception:
             return 0
 
-    def _convert_file(self, input_file, file_index, total_files):
+    def _convert_file(self, input_file, file_index, total_files, attempt=0):
+        """Convert one file; True when the watchdog stopped it for stalling"""
         replace = self.replace_checkbox.current.value
+        verify = replace and self.verify_checkbox.current.value
+        keep_backup = replace and self.backup_checkbox.current.value
         codec = self.codec_dropdown.current.value
 
         tmp_file = input_file + ".tmp" if replace else os.path.splitext(input_file)[0] + f"_{codec}.mkv"
@@ -395,60 +559,351 @@ class ConvertTab:
 
         duration = self._get_video_duration(input_file)
 
-        cmd = [
-            get_ffmpeg_path(), "-i", input_file,
+        # A local copy of a NAS-hosted input, if the prefetcher got it here in time
+        source = self._prefetcher.acquire(input_file) if self._prefetcher is not None else input_file
+
+        cmd = [get_ffmpeg_path()] + job_watchdog.retry_input_args(attempt) + [
+            "-i", source,
             "-c:v", vcodec,
             "-preset", "medium",
             "-crf", "23",
-            "-c:a", "copy",
-            "-y", tmp_file,
         ]
 
         self._log(f"Konvertiere: {os.path.basename(input_file)}", "#6366f1")
+
+        vfilters = []
+        if self.analyze_checkbox.current.value:
+            verdict = video_analysis.analyze(input_file)
+            vfilters += video_analysis.build_filters(verdict)
+            if vfilters:
+                self._log(self.lang_manager.get_text("analysis_filters", filters=", ".join(vfilters)))
+
+        extras = self._extra_outputs(input_file, codec)
+
+        # H.264 output is 8-bit SDR; tone-map only when the source is actually HDR
+        tonemap_filter = None
+        wants_h264 = codec == "h264" or any(out["label"] == "h264" for out in extras)
+        if wants_h264 and self.tonemap_checkbox.current.value:
+            hdr = tonemap.hdr_format(probe_media(input_file))
+            if hdr and self._tonemap_method:
+                tonemap_filter = tonemap.build_tonemap_filter(self._tonemap_method)
+                self._log(self.lang_manager.get_text("tonemap_applied", hdr=hdr, method=self._tonemap_method))
+            elif hdr:
+                self._log(self.lang_manager.get_text("tonemap_unavailable", hdr=hdr), "#f97316")
+
+        # With several jobs running, each gets its own cores and sizes its threads to them
+        cores = None
+        if self._controller is not None and self.lang_manager.get_setting("cpu_pinning", True):
+            cores = self._cores.allocate((file_index, input_file), self._controller.target)
+        limits = self._resource_limits()
+        if cores is not None:
+            limits.cpus = cores.cpus
+
+        # Stage the outputs in the scratch folder; they are moved into place once complete
+        job_key = (file_index, input_file)
+        staged = None
+        to_publish = []
+        if self._scratch is not None:
+            staged = self._scratch.reserve(job_key, scratch.expected_output_mb(input_file) * (1 + len(extras)))
+        if staged:
+            final_main = input_file if replace else tmp_file
+            tmp_file = os.path.join(staged, os.path.basename(final_main))
+            to_publish.append((tmp_file, final_main))
+            for out in extras:
+                staged_path = os.path.join(staged, os.path.basename(out["path"]))
+                to_publish.append((staged_path, out["path"]))
+                out["path"] = staged_path
+
+        if extras:
+            # Decode once, split into the main output plus every extra rendition
+            outputs = [multi_output.convert_output(input_file, codec, path=tmp_file)] + extras
+            for out in outputs:
+                if out["label"] == "h264" and tonemap_filter:
+                    out["filters"].append(tonemap_filter)
+                    out["color_args"] = list(tonemap.SDR_COLOR_ARGS)
+                encoder = out["video_args"][out["video_args"].index("-c:v") + 1]
+                out["video_args"] += cpu_affinity.encoder_args(encoder, cores)
+                pools = cpu_affinity.x265_params(encoder, cores)
+                if pools:
+                    out["video_args"] += ["-x265-params", pools]
+            cmd = multi_output.build_command(source, outputs, shared_filters=vfilters,
+                                             extra_input_args=job_watchdog.retry_input_args(attempt))
+            self._log(self.lang_manager.get_text("single_decode_outputs", count=len(outputs)))
+        else:
+            cmd += cpu_affinity.encoder_args(vcodec, cores)
+            pools = cpu_affinity.x265_params(vcodec, cores)
+            if pools:
+                cmd += ["-x265-params", pools]
+            if codec == "h264" and tonemap_filter:
+                vfilters.append(tonemap_filter)
+            if vfilters:
+                cmd += ["-vf", ",".join(vfilters)]
+            if codec == "h264" and tonemap_filter:
+                cmd += tonemap.SDR_COLOR_ARGS
+            cmd += [
+                "-c:a", "copy",
+                "-y", tmp_file,
+            ]
+        # Everything this run writes, for the sweeper should the session die mid-encode
+        tracked = [tmp_file] + [out["path"] for out in extras] + [final + ".part" for _, final in to_publish]
+        stalled = False
+        published = False
         try:
-            self._current_process = subprocess.Popen(
+            orphans.track(tracked)
+            job = self._jobs.launch(
                 cmd,
+                limits,
                 stderr=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 universal_newlines=True,
             )
+            process = job.popen
+            self._watchdog.watch(job_key, job, os.path.basename(input_file))
+            if self._ledger is not None:
+                self._ledger.attach((file_index, input_file), job.pid)
+            if self._devices is not None:
+                self._devices.attach((file_index, input_file), job.pid)
+            self._cores.attach((file_index, input_file), job.pid)
 
             time_pattern = re.compile(r"time=(\d+:\d+:\d+\.\d+)")
+            frame_pattern = re.compile(r"frame=\s*(\d+)")
 
             while True:
-                if self._current_process.stderr is None:
+                if process.stderr is None:
                     break
 
-                line = self._current_process.stderr.readline()
-                if not line and self._current_process.poll() is not None:
+                line = process.stderr.readline()
+                if not line and process.poll() is not None:
                     break
 
+                frame_match = frame_pattern.search(line)
+                if frame_match:
+                    self._watchdog.progress(job_key, int(frame_match.group(1)))
+                if frame_match and self._controller is not None:
+                    self._controller.report(file_index, int(frame_match.group(1)))
+
                 match = time_pattern.search(line)
                 if match and duration:
                     current_time = self._parse_ffmpeg_time(match.group(1))
-                    file_progress = min(current_time / duration, 1.0)
-                    overall_progress = ((file_index - 1) + file_progress) / total_files
-
-                    percent = int(file_progress * 100)
-                    self._ui_queue.put((
-                        "progress",
-                        overall_progress,
-                        f"Datei {file_index}/{total_files}: {os.path.basename(input_file)} ({percent}%)",
-                    ))
-
-            if self._current_process.returncode == 0:
+                    self._report_progress(file_index, total_files, input_file,
+                                          min(current_time / duration, 1.0))
+
+            if process.returncode == 0 and self._space is not None:
+                self._space.record(job_key, [tmp_file] + [out["path"] for out in extras])
+            check = None
+            if process.returncode == 0 and (verify or keep_backup):
+                # The original is only replaced once the output checks out and a backup
+                # exists; this runs on the publisher thread while the next job encodes
+                check = functools.partial(self._before_replace, input_file, tmp_file, verify, keep_backup)
+                if not staged:
+                    for out in extras:
+                        self._log(f"✓ Gespeichert als: {os.path.basename(out['path'])}", "#22c55e")
+                    to_publish = [(tmp_file, input_file)]
+            if process.returncode == 0 and to_publish:
+                if self._space is not None:
+                    self._space.defer(job_key)  # the destination still has to take the files
+                self._publisher.publish(
+                    to_publish,
+                    functools.partial(self._on_published, job_key, replace=replace, tracked=tracked,
+                                      written=[src for src, _ in to_publish], staged=bool(staged)),
+                    check=check,
+                )
+                published = True
+            elif process.returncode == 0:
                 if replace:
                     os.replace(tmp_file, input_file)
                     self._log(f"✓ Original ersetzt: {os.path.basename(input_file)}", "#22c55e")
                 else:
                     self._log(f"✓ Gespeichert als: {os.path.basename(tmp_file)}", "#22c55e")
+                for out in extras:
+                    self._log(f"✓ Gespeichert als: {os.path.basename(out['path'])}", "#22c55e")
             else:
                 self._log(f"✗ Fehler bei: {os.path.basename(input_file)}", "#ef4444")
-                if replace and os.path.exists(tmp_file):
-                    os.remove(tmp_file)
+                if not staged:
+                    # Don't leave partial outputs behind (full disk, cancelled)
+                    for path in [tmp_file] + [out["path"] for out in extras]:
+                        if os.path.exists(path):
+                            os.remove(path)
+            self._jobs.discard(job)
 
         except FileNotFoundError:
             self._log("✗ FFmpeg nicht gefunden! Bitte installiere FFmpeg.", "#ef4444")
+        finally:
+            stalled = self._watchdog.unwatch(job_key)
+            if self._prefetcher is not None:
+                self._prefetcher.release(input_file)
+            if staged and not published:
+                self._scratch.release(job_key)  # failed or cancelled: drop the partial outputs
+            if not published:
+                orphans.untrack(tracked)  # otherwise once published
+            self._cores.release((file_index, input_file))
+            if self._controller is not None:
+                self._controller.finished(file_index)
+            with self._progress_lock:
+                self._file_progress[file_index] = 1.0
+        return stalled
+
+    def _before_replace(self, input_file, output, verify, keep_backup):
+        """Publisher check for an output about to replace input_file"""
+        sums = None
+        if verify:
+            sums = output_verify.check(input_file, output, output_verify.expected_streams(probe_media(input_file)),
+                                       checksum=scratch.crosses_filesystem(output, input_file))
+        if keep_backup:
+            backups.backup(input_file)
+        return sums
+
+    def _prune_backups(self):
+        get_setting = self.lang_manager.get_setting
+        keep_gb = get_setting("backup_keep_gb", 0)
+        removed = backups.prune(get_setting("backup_keep_days", 0) or backups.DEFAULT_KEEP_DAYS,
+                                keep_gb * 1024 if keep_gb else None)
+        if removed:
+            self._log(self.lang_manager.get_text("backups_pruned", count=len(removed)), "#6366f1")
+
+    def _on_published(self, job_key, finals, error, replace, tracked=(), written=(), staged=True):
+        """Publisher callback for the staged (or verified) outputs of one file"""
+        _, input_file = job_key
+        orphans.untrack(tracked)
+        if self._space is not None:
+            self._space.release(job_key, deferred=True)
+        if isinstance(error, output_verify.VerificationError):
+            # The original stays; the output that failed is of no use
+            if staged:
+                self._scratch.release(job_key)
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._log(self.lang_manager.get_text("verify_failed", name=os.path.basename(input_file),
+                                                 detail=str(error)), "#ef4444")
+            return
+        if isinstance(error, backups.BackupError):
+            # Verified but not backed up: keep both, the output where it was written
+            if staged:
+                self._scratch.release(job_key, keep_files=True)
+            self._log(self.lang_manager.get_text("backup_failed", name=os.path.basename(input_file),
+                                                 error=error, path=written[0]), "#ef4444")
+            return
+        if error is not None and not staged:
+            self._log(f"✗ Fehler bei: {os.path.basename(input_file)} ({error})", "#ef4444")
+            return
+        if error is not None:
+            self._scratch.release(job_key, keep_files=True)
+            self._log(self.lang_manager.get_text("publish_failed", name=os.path.basename(input_file),
+                                                 error=error, folder=self._scratch.root), "#ef4444")
+            return
+        if staged:
+            self._scratch.release(job_key)
+        for path in finals:
+            if replace and path == input_file:
+                self._log(f"✓ Original ersetzt: {os.path.basename(path)}", "#22c55e")
+            else:
+                self._log(f"✓ Gespeichert als: {os.path.basename(path)}", "#22c55e")
+
+    def _report_progress(self, file_index, total_files, input_file, file_progress):
+        """Overall progress over all files; with several jobs running, a summary line"""
+        with self._progress_lock:
+            self._file_progress[file_index] = file_progress
+            overall_progress = sum(self._file_progress.values()) / total_files
+            running = sum(1 for p in self._file_progress.values() if p < 1.0)
+            finished = len(self._file_progress) - running
+        if running > 1:
+            text = self.lang_manager.get_text("parallel_progress", running=running,
+                                              done=finished, total=total_files)
+        else:
+            percent = int(file_progress * 100)
+            text = f"Datei {file_index}/{total_files}: {os.path.basename(input_file)} ({percent}%)"
+        self._ui_queue.put(("progress", overall_progress, text))
+
+    def _footprint(self, item):
+        """Predicted peak memory of converting one queued file"""
+        _, input_file = item
+        codec = self.codec_dropdown.current.value
+        stream = get_video_stream(probe_media(input_file)) or {}
+        outputs = [multi_output.convert_output(input_file, codec)] + self._extra_outputs(input_file, codec)
+        return memory_admission.outputs_footprint(outputs, stream.get("width"), stream.get("height"))
+
+    def _predicted_outputs(self, item):
+        """Predicted sizes of the files converting one queued file writes, main output first"""
+        _, input_file = item
+        codec = self.codec_dropdown.current.value
+        path = input_file + ".tmp" if self.replace_checkbox.current.value else None
+        info = probe_media(input_file)
+        predictions = []
+        for out in [multi_output.convert_output(input_file, codec, path=path)] + self._extra_outputs(input_file, codec):
+            # The convert outputs keep the first audio track, the compressed one every audio and subtitle track
+            copied = disk_space.copied_bytes(info, first_audio_only=out["label"] != "compressed")
+            predictions.append(disk_space.predict(out["path"], info, out["video_args"], copied))
+        return predictions
+
+    def _prescan(self, video_files):
+        """Scan the batch for damage and log the findings; returns the files to convert"""
+        get_setting = self.lang_manager.get_setting
+        folder = get_setting("quarantine_dir", "") or ""
+        scanned = []
+        self._log(self.lang_manager.get_text("prescan_started", done=0, count=len(video_files)), "#6366f1")
+
+        def progress(result):
+            scanned.append(result.path)
+            self._ui_queue.put(("progress", len(scanned) / len(video_files), self.lang_manager.get_text(
+                "prescan_started", done=len(scanned), count=len(video_files))))
+
+        results = integrity_scan.scan_all(
+            video_files, keyframes=bool(get_setting("prescan_keyframes", False)),
+            max_device_jobs=get_setting("device_max_jobs", 0) or None,
+            on_result=progress, cancelled=lambda: self._cancel_requested,
+        )
+        keep = []
+        for file_path in video_files:
+            result = results.get(file_path)
+            if result is None or result.verdict == integrity_scan.OK:
+                keep.append(file_path)
+                continue
+            name = os.path.basename(file_path)
+            if result.verdict == integrity_scan.SUSPECT:
+                self._tolerant.add(file_path)
+                keep.append(file_path)
+                self._log(self.lang_manager.get_text("prescan_suspect", name=name, detail=result.detail()),
+                          "#f97316")
+            elif folder and integrity_scan.quarantine(file_path, folder):
+                self._log(self.lang_manager.get_text("prescan_quarantined", name=name, detail=result.detail(),
+                                                     folder=folder), "#ef4444")
+            else:
+                self._log(self.lang_manager.get_text("prescan_broken", name=name, detail=result.detail()),
+                          "#ef4444")
+        return keep
+
+    def _sweep_orphans(self):
+        removed = orphans.sweep()
+        if removed:
+            self._log(self.lang_manager.get_text("orphans_removed", count=len(removed)), "#f97316")
+
+    def _io_paths(self, item):
+        """Files a queued conversion reads and the folder its outputs are written to"""
+        _, input_file = item
+        target = self._scratch.root if self._scratch is not None else os.path.dirname(input_file)
+        return [input_file], [target]
+
+    def _log_memory(self, detail):
+        self._log(self.lang_manager.get_text("memory_note", detail=detail), "#f97316")
+
+    def _log_concurrency(self, decision):
+        self._cores.rebalance(decision.new)
+        self._log(self.lang_manager.get_text("concurrency_decision", old=decision.old,
+                                             new=decision.new, reason=decision.reason), "#6366f1")
+
+    def _extra_outputs(self, input_file, codec):
+        """Output specs for the extra renditions ticked in the UI (main codec excluded)"""
+        extras = []
+        if self.extra_h265_checkbox.current.value and codec != "h265":
+            extras.append(multi_output.convert_output(input_file, "h265"))
+        if self.extra_h264_checkbox.current.value and codec != "h264":
+            extras.append(multi_output.convert_output(input_file, "h264"))
+        if self.extra_compressed_checkbox.current.value:
+            preset = self._compress_presets.get(self.compress_preset_dropdown.current.value,
+                                                self._compress_presets["preset_film"])
+            extras.append(multi_output.compress_output(input_file, detect_hevc_encoder(), preset))
+        return extras
 
     def _start_conversion(self, e):
         if self._task_queue.empty():
@@ -458,6 +913,7 @@ class ConvertTab:
         self._cancel_requested = False
         self.start_button_ref.current.visible = False
         self.cancel_button_ref.current.visible = True
+        self.pause_button_ref.current.visible = True
         self._ui_queue.put(("clear_log",))
         self._ui_queue.put(("log", self.lang_manager.get_text("conversion_started"), "#6366f1"))
         self._ui_queue.put(("progress", 0, self.lang_manager.get_text("starting")))
@@ -470,23 +926,91 @@ class ConvertTab:
         while not self._task_queue.empty():
             video_files.append(self._task_queue.get())
 
+        self._tolerant = set()
+        if video_files and self.prescan_checkbox.current.value:
+            video_files = self._prescan(video_files)
+
         total_files = len(video_files)
 
+        if self.tonemap_checkbox.current.value:
+            self._tonemap_method = tonemap.select_method()
+
         if total_files == 0:
             self._ui_queue.put(("log", self.lang_manager.get_text("no_video_files"), "#f97316"))
             self._ui_queue.put(("done", 0, self.lang_manager.get_text("no_files_found"), "#f97316"))
             self._ui_queue.put(("idle",))
             return
 
-        converted = 0
-        for index, file_path in enumerate(video_files, 1):
-            if self._cancel_requested:
-                self._ui_queue.put(("log", self.lang_manager.get_text("conversion_cancelled"), "#f97316"))
-                break
-            self._convert_file(file_path, index, total_files)
-            converted += 1
-
-        if not self._cancel_requested:
+        self._file_progress = {}
+        self._controller = job_scheduler.ConcurrencyController(
+            max_jobs=self.lang_manager.get_setting("max_parallel_jobs", 0) or None,
+            log=self._log_concurrency,
+        )
+        started = []
+        self._scratch = scratch.ScratchArea.from_settings(self.lang_manager.get_setting)
+
+        retries = self.lang_manager.get_setting("stall_retries", job_watchdog.DEFAULT_RETRIES)
+
+        def convert(item):
+            index, file_path = item
+            started.append(index)
+            # Files the pre-scan found damaged read error-tolerantly from the start
+            first = 1 if file_path in self._tolerant else 0
+            for attempt in range(retries + 1):
+                if not self._convert_file(file_path, index, total_files, first + attempt) or self._cancel_requested:
+                    break
+                if attempt < retries:
+                    self._log(self.lang_manager.get_text("stall_retry", name=os.path.basename(file_path),
+                                                         attempt=attempt + 1, retries=retries), "#f97316")
+
+        budget = self.lang_manager.get_setting("memory_budget_mb", 0) or memory_admission.default_budget_mb()
+        self._ledger = memory_admission.MemoryLedger(budget, log=self._log_memory)
+        self._devices = device_io.DeviceLimiter(
+            max_jobs=self.lang_manager.get_setting("device_max_jobs", 0) or None,
+            log=lambda detail: self._log(self.lang_manager.get_text("device_note", detail=detail), "#6366f1"),
+        )
+        self._watchdog = job_watchdog.StallWatchdog.from_settings(
+            self.lang_manager.get_setting, paused=lambda: self._jobs.paused,
+            log=lambda detail: self._log(self.lang_manager.get_text("stall_note", detail=detail), "#ef4444"),
+        )
+        self._space = disk_space.SpaceLedger(
+            log=lambda detail: self._log(self.lang_manager.get_text("space_note", detail=detail), "#f97316"))
+        scheduler = job_scheduler.JobScheduler(self._controller, ledger=self._ledger, footprint=self._footprint,
+                                               devices=self._devices, io_paths=self._io_paths,
+                                               space=self._space, outputs=self._predicted_outputs)
+        # Copy ahead what the scheduler starts next, not what comes next in the list
+        self._prefetcher = prefetch.Prefetcher.for_batch(
+            self._scratch, video_files, self.lang_manager.get_setting,
+            log=lambda detail: self._log(self.lang_manager.get_text("prefetch_note", detail=detail), "#f97316"),
+            upcoming=lambda: [path for _, path in scheduler.peek()],
+        )
+        scheduler.run(
+            enumerate(video_files, 1),
+            convert,
+            cancelled=lambda: self._cancel_requested,
+            paused=lambda: self._jobs.paused,
+        )
+        converted = len(started)
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        self._publisher.join()
+        if self._scratch is not None:
+            self._scratch.close()
+            self._scratch = None
+        if self.backup_checkbox.current.value:
+            self._prune_backups()
+
+        for _, file_path in scheduler.refused:
+            self._ui_queue.put(("log", self.lang_manager.get_text(
+                "space_refused_note", name=os.path.basename(file_path)), "#ef4444"))
+        if scheduler.refused:
+            self._ui_queue.put(("log", self.lang_manager.get_text(
+                "space_refused", count=len(scheduler.refused)), "#ef4444"))
+
+        if self._cancel_requested:
+            self._ui_queue.put(("log", self.lang_manager.get_text("conversion_cancelled"), "#f97316"))
+        else:
             self._ui_queue.put((
                 "done",
                 1.0,
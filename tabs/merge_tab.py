@@ -6,7 +6,10 @@ import flet as ft
 import re
 import shlex
 import shutil
+from episode_index import EpisodeIndex, get_index
+from identifier_engine import BY_NAME as IDENTIFIER_PATTERNS, detect_directory, has_identifier_groups, parse_match
 from ffmpeg_utils import get_ffmpeg_path
+from library_tree import run_per_directory, scan_tree
 
 try:
     from flet import icons
@@ -21,6 +24,7 @@ class MergeTab:
         
         # Refs
         self.dir_field = ft.Ref[ft.TextField]()
+        self.tree_checkbox = ft.Ref[ft.Checkbox]()
         self.regex_field = ft.Ref[ft.TextField]()
         self.pattern_select = ft.Ref[ft.Dropdown]()
         self.sample_field = ft.Ref[ft.TextField]()
@@ -51,7 +55,8 @@ class MergeTab:
             ft.IconButton(icon=icons.FOLDER_OPEN if icons else "folder_open",
                           icon_color="#6366f1",
                           tooltip=self.lang_manager.get_text("choose_folder"),
-                          on_click=self._open_dir_dialog)
+                          on_click=self._open_dir_dialog),
+            ft.Checkbox(ref=self.tree_checkbox, label=self.lang_manager.get_text("include_subfolders"), value=False),
         ], wrap=True, spacing=10)
 
         # Simple pattern choices
@@ -59,6 +64,7 @@ class MergeTab:
             ft.dropdown.Option("SxxEyy"),
             ft.dropdown.Option("Sxx-Eyy"),
             ft.dropdown.Option("1x02"),
+            ft.dropdown.Option(key="Auto", text=self.lang_manager.get_text("auto_detect")),
         ]
 
         def on_pattern_change(e):
@@ -68,6 +74,9 @@ class MergeTab:
                 "1x02": r"(?P<season>\d{1,2})x(?P<episode>\d{2})(?P<part>[A-Za-z])?",
             }
             choice = self.pattern_select.current.value
+            if choice == "Auto":
+                self._auto_detect()
+                return
             self.regex_field.current.value = mapping.get(choice, DEFAULT_ID_REGEX_TEXT)
             self.page.update()
 
@@ -157,6 +166,23 @@ class MergeTab:
         if e.path:
             self.dir_field.current.value = e.path
             self.page.update()
+            if self.pattern_select.current.value == "Auto":
+                self._auto_detect()
+
+    def _auto_detect(self):
+        """Fill the identifier regex with the pattern that best fits the chosen folder"""
+        directory = (self.dir_field.current.value or os.getcwd()).strip()
+        try:
+            detection = detect_directory(directory)
+        except OSError:
+            detection = None
+        if detection is None:
+            self.status_text.current.value = self.lang_manager.get_text("no_pattern_detected")
+        else:
+            self.regex_field.current.value = detection.pattern.regex
+            self.status_text.current.value = self.lang_manager.get_text(
+                "pattern_detected", name=detection.pattern.name, coverage=round(detection.coverage * 100))
+        self.page.update()
 
     def _open_dir_dialog(self, e):
         # Try macOS AppleScript first for reliability, then fall back to Flet picker
@@ -169,6 +195,8 @@ class MergeTab:
                 if result.returncode == 0 and result.stdout.strip():
                     self.dir_field.current.value = result.stdout.strip().rstrip('/')
                     self.page.update()
+                    if self.pattern_select.current.value == "Auto":
+                        self._auto_detect()
                     return
             except Exception:
                 pass
@@ -194,7 +222,20 @@ class MergeTab:
             self.page.update()
             return
 
-        if mode == "BATCH":
+        if mode == "BATCH" and self.tree_checkbox.current.value:
+            tree = scan_tree_groups(directory, patt)
+            if not tree:
+                self._append_preview(self.lang_manager.get_text("no_episode_parts"))
+            else:
+                episodes = parts = 0
+                for folder, groups in tree:
+                    episodes += len(groups)
+                    parts += sum(len(lst) for _, _, lst in groups)
+                    self._append_preview(self.lang_manager.get_text(
+                        "folder_episodes", folder=os.path.relpath(folder, directory), count=len(groups)))
+                self._append_preview(self.lang_manager.get_text("tree_total", folders=len(tree), files=parts))
+                self._append_preview(self.lang_manager.get_text("total_episodes", episodes=episodes, parts=parts))
+        elif mode == "BATCH":
             groups = scan_all_groups(directory, patt)
             if not groups:
                 self._append_preview(self.lang_manager.get_text("no_episode_parts"))
@@ -243,25 +284,23 @@ class MergeTab:
             self.page.update()
 
             try:
-                if mode == "BATCH":
+                if mode == "BATCH" and self.tree_checkbox.current.value:
+                    self._merge_tree(directory, patt, (out_sep, out_sw, out_ew), overwrite_all)
+                elif mode == "BATCH":
                     groups = scan_all_groups(directory, patt)
                     total = len(groups)
-                    for idx, (s, e2, lst) in enumerate(groups, start=1):
-                        inputs = [p for p, _ in lst]
-                        if not inputs:
-                            continue
-                        out_basename = f"{format_output_id(s, e2, out_sep, out_sw, out_ew)}.mp4"
-                        output_path = os.path.join(directory, out_basename)
-                        if os.path.exists(output_path) and not overwrite_all:
-                            output_path = next_available_name(output_path)
-                        self._append_preview(self.lang_manager.get_text("merging_file", name=out_basename))
-                        cmd = build_ffmpeg_concat_command(inputs, output_path, reencode=True)
-                        proc = subprocess.run(cmd)
-                        if proc.returncode != 0:
+
+                    def on_file(idx, out_basename, ok):
+                        if ok is None:
+                            self._append_preview(self.lang_manager.get_text("merging_file", name=out_basename))
+                        elif not ok:
                             self._append_preview(self.lang_manager.get_text("ffmpeg_failed"), "#ef4444")
-                        self.progress.current.value = idx / max(total, 1)
-                        self.status_text.current.value = f"{idx}/{total}"
+                        if ok is not None:
+                            self.progress.current.value = idx / max(total, 1)
+                            self.status_text.current.value = f"{idx}/{total}"
                         self.page.update()
+
+                    merge_directory(directory, groups, (out_sep, out_sw, out_ew), overwrite_all, on_file)
                 else:
                     ident = (self.identifier_field.current.value or "").strip()
                     parsed = parse_identifier(ident, patt)
@@ -292,9 +331,61 @@ class MergeTab:
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def _merge_tree(self, root, patt, out_format, overwrite_all):
+        """Merge every folder of the library, several folders at a time"""
+        tree = scan_tree_groups(root, patt)
+        if not tree:
+            self._append_preview(self.lang_manager.get_text("no_episode_parts"))
+            return
+        total = sum(len(groups) for _, groups in tree)
+        rows = {}
+        for folder, groups in tree:
+            rows[folder] = ft.Text(self.lang_manager.get_text(
+                "folder_episodes", folder=os.path.relpath(folder, root), count=len(groups)),
+                size=12, color=self._c("#374151", "#a6adc8"))
+            self.preview_list.current.controls.append(rows[folder])
+        self.page.update()
+
+        lock = threading.Lock()
+        merged = [0]
+
+        def job(folder, groups):
+            name = os.path.relpath(folder, root)
+
+            def on_file(idx, out_basename, ok):
+                with lock:
+                    if ok is None:
+                        rows[folder].value = f"{name}: {self.lang_manager.get_text('merging_file', name=out_basename)}"
+                    else:
+                        merged[0] += 1
+                        if not ok:
+                            self._append_preview(f"{name}/{out_basename}: {self.lang_manager.get_text('ffmpeg_failed')}", "#ef4444")
+                        self.progress.current.value = merged[0] / max(total, 1)
+                        self.status_text.current.value = f"{merged[0]}/{total}"
+                    self.page.update()
+
+            return merge_directory(folder, groups, out_format, overwrite_all, on_file)
+
+        def progress(folder, state, detail):
+            name = os.path.relpath(folder, root)
+            with lock:
+                if state == "done":
+                    rows[folder].value = self.lang_manager.get_text("folder_done", folder=name, count=detail)
+                    rows[folder].color = "#22c55e"
+                elif state == "failed":
+                    rows[folder].value = f"{self.lang_manager.get_text('folder_failed', folder=name)}: {detail}"
+                    rows[folder].color = "#ef4444"
+                self.page.update()
+
+        jobs = {folder: (lambda f=folder, g=groups: job(f, g)) for folder, groups in tree}
+        run_per_directory(jobs, MERGE_DIR_WORKERS, progress)
+
 ALLOWED_EXTS = {'.mp4', '.mkv', '.mov', '.m4v', '.avi', '.webm'}
 DEFAULT_ID_REGEX_TEXT = r"S(?P<season>\d{1,2})E(?P<episode>\d{2})(?P<part>[A-Z])?"
-FALLBACK_SIMPLE_EP_REGEX = re.compile(r"(?i)(?P<episode>\d{2})(?P<part>[a-z])?")
+# Two digits not embedded in a longer number, so years, 1080p or x264 aren't read as episodes
+FALLBACK_SIMPLE_EP_REGEX = re.compile(r"(?i)(?<!\d)(?P<episode>\d{2})(?P<part>[a-z])?(?!\d)")
+# Each merge is a full re-encode, so only a couple of folders run at once
+MERGE_DIR_WORKERS = 2
 
 def parse_output_id_sample(sample: str):
     if not sample:
@@ -335,7 +426,7 @@ def compile_id_regex(text: str) -> re.Pattern:
         patt = re.compile(text, re.IGNORECASE)
     except re.error:
         patt = re.compile(DEFAULT_ID_REGEX_TEXT, re.IGNORECASE)
-    if not {"season", "episode"}.issubset(set(patt.groupindex.keys())):
+    if not has_identifier_groups(patt):
         sample_se = re.search(r"(?i)s(?P<season>\d{1,2})e(?P<episode>\d{2})(?P<part>[a-z])?", text)
         sample_bare = re.search(r"(?i)(?P<episode>\d{1,2})(?P<part>[a-z])?", text)
         if sample_se or sample_bare:
@@ -347,79 +438,79 @@ def compile_id_regex(text: str) -> re.Pattern:
 def parse_identifier(text: str, patt: re.Pattern):
     m = patt.search(text)
     if not m:
+        # Typed identifiers are usually SxxEyy even when the files use another scheme
+        return IDENTIFIER_PATTERNS["SxxEyy"].parse(text)
+    return parse_match(m)
+
+def parse_part(name: str, patt: re.Pattern):
+    """(season, episode, part) for a video file that is one part of an episode, else None"""
+    if os.path.splitext(name)[1].lower() not in ALLOWED_EXTS:
         return None
-    season = int(m.group('season'))
-    episode = int(m.group('episode'))
-    part = m.groupdict().get('part')
-    return season, episode, (part.upper() if part else None)
+    m = patt.search(name)
+    if m:
+        parsed = parse_match(m)
+        return parsed if parsed and parsed[2] else None
+    fm = FALLBACK_SIMPLE_EP_REGEX.search(name)
+    if fm:
+        part = (fm.groupdict().get('part') or '').upper()
+        return (1, int(fm.group('episode')), part) if part else None
+    return None
+
+def episode_index(patt: re.Pattern) -> EpisodeIndex:
+    """Shared index of episode parts parsed with patt"""
+    return get_index(f"merge|{patt.flags}|{patt.pattern}", lambda name: parse_part(name, patt))
 
 def scan_matching_files(directory: str, patt: re.Pattern, season: int, episode: int):
-    matches = []
-    for name in os.listdir(directory):
-        path = os.path.join(directory, name)
-        if not os.path.isfile(path):
-            continue
-        root, ext = os.path.splitext(name)
-        if ext.lower() not in ALLOWED_EXTS:
-            continue
-        m = patt.search(name)
-        if m:
-            s = int(m.group('season'))
-            e = int(m.group('episode'))
-            if s == season and e == episode:
-                part = (m.groupdict().get('part') or '').upper()
-                if part:
-                    matches.append((path, part))
-            continue
-        fm = FALLBACK_SIMPLE_EP_REGEX.search(name)
-        if fm:
-            s = 1
-            e = int(fm.group('episode'))
-            if s == season and e == episode:
-                part = (fm.groupdict().get('part') or '').upper()
-                if part:
-                    matches.append((path, part))
-    matches.sort(key=lambda t: (t[1], t[0].lower()))
-    return matches
+    return [(rec.path, rec.part) for rec in episode_index(patt).lookup(directory, season, episode)]
 
 def scan_all_groups(directory: str, patt: re.Pattern):
-    groups = {}
-    for name in os.listdir(directory):
-        path = os.path.join(directory, name)
-        if not os.path.isfile(path):
-            continue
-        _, ext = os.path.splitext(name)
-        if ext.lower() not in ALLOWED_EXTS:
-            continue
-        m = patt.search(name)
-        if m:
-            s = int(m.group('season'))
-            e = int(m.group('episode'))
-            part = (m.groupdict().get('part') or '').upper()
-            if part:
-                groups.setdefault((s, e), []).append((path, part))
-            continue
-        fm = FALLBACK_SIMPLE_EP_REGEX.search(name)
-        if fm:
-            s = 1
-            e = int(fm.group('episode'))
-            part = (fm.groupdict().get('part') or '').upper()
-            if part:
-                groups.setdefault((s, e), []).append((path, part))
     result = []
-    for (s, e), lst in groups.items():
-        lst.sort(key=lambda t: (t[1], t[0].lower()))
+    for s, e, records in episode_index(patt).groups(directory):
         seen = set()
         unique = []
-        for p, part in lst:
-            if part in seen:
+        for rec in records:
+            if rec.part in seen:
                 continue
-            seen.add(part)
-            unique.append((p, part))
+            seen.add(rec.part)
+            unique.append((rec.path, rec.part))
         result.append((s, e, unique))
-    result.sort(key=lambda x: (x[0], x[1]))
     return result
 
+def scan_tree_groups(root: str, patt: re.Pattern):
+    """scan_all_groups for root and every folder below it; returns [(directory, groups)] with parts"""
+    result = []
+    for snap in scan_tree(root):
+        groups = scan_all_groups(snap.directory, patt)
+        if groups:
+            result.append((snap.directory, groups))
+    return result
+
+def merge_directory(directory: str, groups, out_format, overwrite_all: bool, on_file=None) -> int:
+    """Merge each episode group of one folder; returns the number of successful merges.
+
+    on_file(index, output_name, ok) is called with ok=None before each merge
+    and with True/False after it.
+    """
+    out_sep, out_sw, out_ew = out_format
+    merged = 0
+    for idx, (s, e2, lst) in enumerate(groups, start=1):
+        inputs = [p for p, _ in lst]
+        if not inputs:
+            continue
+        out_basename = f"{format_output_id(s, e2, out_sep, out_sw, out_ew)}.mp4"
+        output_path = os.path.join(directory, out_basename)
+        if os.path.exists(output_path) and not overwrite_all:
+            output_path = next_available_name(output_path)
+        if on_file:
+            on_file(idx, out_basename, None)
+        cmd = build_ffmpeg_concat_command(inputs, output_path, reencode=True)
+        proc = subprocess.run(cmd)
+        ok = proc.returncode == 0
+        merged += ok
+        if on_file:
+            on_file(idx, out_basename, ok)
+    return merged
+
 def ensure_ffmpeg() -> bool:
     return shutil.which('ffmpeg') is not None
 
@@ -4,8 +4,15 @@ import platform
 import subprocess
 import flet as ft
 import re
+import uuid
 from typing import List, Tuple, Dict, Optional
 
+from dir_snapshot import get_snapshot, invalidate as invalidate_snapshot
+from episode_index import EpisodeIndex, get_index, invalidate as invalidate_index
+from identifier_engine import detect_directory, has_identifier_groups, parse_match
+from library_tree import run_per_directory, scan_tree
+from rename_journal import RenameJournal, JournalError
+
 try:
     from flet import icons
 except (ImportError, AttributeError):
@@ -19,6 +26,7 @@ class RenamerTab:
 
         # Refs
         self.dir_field = ft.Ref[ft.TextField]()
+        self.tree_checkbox = ft.Ref[ft.Checkbox]()
         self.regex_field = ft.Ref[ft.TextField]()
         self.pattern_select = ft.Ref[ft.Dropdown]()
         self.template_field = ft.Ref[ft.TextField]()
@@ -28,6 +36,17 @@ class RenamerTab:
         self.preview_list = ft.Ref[ft.ListView]()
         self.progress = ft.Ref[ft.ProgressBar]()
         self.status_text = ft.Ref[ft.Text]()
+        self.undo_count = ft.Ref[ft.TextField]()
+
+        # Live preview state
+        self._preview_lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._preview_timer: Optional[threading.Timer] = None
+        self._preview_rows: Dict[str, ft.Text] = {}
+
+        self.journal = RenameJournal()
+        # Finish any rename batch a crash left half-applied
+        threading.Thread(target=self._recover_journal, daemon=True).start()
 
         # Picker
         self.folder_picker = ft.FilePicker(on_result=self._on_folder_picked)
@@ -44,10 +63,13 @@ class RenamerTab:
         dir_row = ft.Row([
             ft.TextField(ref=self.dir_field, width=500, label=self.lang_manager.get_text("directory"),
                          bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
-                         border_color="#6366f1", focused_border_color="#818cf8"),
+                         border_color="#6366f1", focused_border_color="#818cf8",
+                         on_change=self._schedule_preview),
             ft.IconButton(icon=icons.FOLDER_OPEN if icons else "folder_open", icon_color="#6366f1",
                           tooltip=self.lang_manager.get_text("choose_folder"),
-                          on_click=self._open_dir_dialog)
+                          on_click=self._open_dir_dialog),
+            ft.Checkbox(ref=self.tree_checkbox, label=self.lang_manager.get_text("include_subfolders"),
+                        value=False, on_change=self._schedule_preview),
         ], wrap=True, spacing=10)
 
         # Simple pattern selector to avoid writing regex manually
@@ -55,6 +77,7 @@ class RenamerTab:
             ft.dropdown.Option("SxxEyy"),
             ft.dropdown.Option("Sxx-Eyy"),
             ft.dropdown.Option("1x02"),
+            ft.dropdown.Option(key="Auto", text=self.lang_manager.get_text("auto_detect")),
         ]
 
         def on_pattern_change(e):
@@ -64,8 +87,12 @@ class RenamerTab:
                 "1x02": r"(?P<season>\d{1,2})x(?P<episode>\d{2})(?P<part>[A-Za-z])?",
             }
             choice = self.pattern_select.current.value
+            if choice == "Auto":
+                self._auto_detect()
+                return
             self.regex_field.current.value = mapping.get(choice, DEFAULT_REGEX)
             self.page.update()
+            self._schedule_preview()
 
         pattern_row = ft.Row([
             ft.Dropdown(ref=self.pattern_select, label=self.lang_manager.get_text("pattern"),
@@ -76,19 +103,21 @@ class RenamerTab:
             ft.TextField(ref=self.regex_field, width=500, label=self.lang_manager.get_text("identifier_regex"),
                          value=DEFAULT_REGEX,
                          bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
-                         border_color="#6366f1", focused_border_color="#818cf8"),
+                         border_color="#6366f1", focused_border_color="#818cf8",
+                         on_change=self._schedule_preview),
         ])
 
         template_row = ft.Row([
             ft.TextField(ref=self.template_field, width=600, label=self.lang_manager.get_text("new_name_template"),
                          value="Episode {episode} Staffel {season}",
                          bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
-                         border_color="#6366f1", focused_border_color="#818cf8"),
+                         border_color="#6366f1", focused_border_color="#818cf8",
+                         on_change=self._schedule_preview),
         ])
 
         mode_col = ft.Column([
             ft.Text(self.lang_manager.get_text("numbering_mode"), weight=ft.FontWeight.BOLD, color=self._c("#111827", "#cdd6f4")),
-            ft.RadioGroup(ref=self.use_parsed_radio, value="PARSED",
+            ft.RadioGroup(ref=self.use_parsed_radio, value="PARSED", on_change=self._schedule_preview,
                           content=ft.Column([
                               ft.Radio(value="PARSED", label=self.lang_manager.get_text("use_parsed_numbers")),
                               ft.Radio(value="MANUAL", label=self.lang_manager.get_text("manual_start_numbers")),
@@ -98,10 +127,12 @@ class RenamerTab:
         manual_row = ft.Row([
             ft.TextField(ref=self.start_season, width=140, label=self.lang_manager.get_text("start_season"), value="1",
                          bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
-                         border_color="#6366f1", focused_border_color="#818cf8"),
+                         border_color="#6366f1", focused_border_color="#818cf8",
+                         on_change=self._schedule_preview),
             ft.TextField(ref=self.start_episode, width=160, label=self.lang_manager.get_text("start_episode"), value="1",
                          bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
-                         border_color="#6366f1", focused_border_color="#818cf8"),
+                         border_color="#6366f1", focused_border_color="#818cf8",
+                         on_change=self._schedule_preview),
         ], spacing=10)
 
         buttons = ft.Row([
@@ -109,7 +140,12 @@ class RenamerTab:
                                on_click=self._preview, style=ft.ButtonStyle(bgcolor="#6366f1", color="#ffffff")),
             ft.ElevatedButton(text=self.lang_manager.get_text("rename"), icon=icons.DRIVE_FILE_RENAME_OUTLINE if icons else "drive_file_rename_outline",
                                on_click=self._rename, style=ft.ButtonStyle(bgcolor="#22c55e", color="#ffffff")),
-        ], spacing=10)
+            ft.ElevatedButton(text=self.lang_manager.get_text("undo_rename"), icon=icons.UNDO if icons else "undo",
+                               on_click=self._undo, style=ft.ButtonStyle(bgcolor="#f97316", color="#ffffff")),
+            ft.TextField(ref=self.undo_count, width=110, label=self.lang_manager.get_text("undo_batches"), value="1",
+                         bgcolor=self._c("#ffffff", "#1e1e2e"), color=self._c("#1e1e2e", "#cdd6f4"),
+                         border_color="#6366f1", focused_border_color="#818cf8"),
+        ], spacing=10, wrap=True)
 
         preview = ft.Container(
             content=ft.ListView(ref=self.preview_list, spacing=4, padding=10),
@@ -152,6 +188,26 @@ class RenamerTab:
         if e.path:
             self.dir_field.current.value = e.path
             self.page.update()
+            if self.pattern_select.current.value == "Auto":
+                self._auto_detect()
+            else:
+                self._schedule_preview()
+
+    def _auto_detect(self):
+        """Fill the identifier regex with the pattern that best fits the chosen folder"""
+        directory = (self.dir_field.current.value or os.getcwd()).strip()
+        try:
+            detection = detect_directory(directory)
+        except OSError:
+            detection = None
+        if detection is None:
+            self.status_text.current.value = self.lang_manager.get_text("no_pattern_detected")
+        else:
+            self.regex_field.current.value = detection.pattern.regex
+            self.status_text.current.value = self.lang_manager.get_text(
+                "pattern_detected", name=detection.pattern.name, coverage=round(detection.coverage * 100))
+        self.page.update()
+        self._schedule_preview()
 
     def _open_dir_dialog(self, e):
         if platform.system() == "Darwin":
@@ -163,6 +219,10 @@ class RenamerTab:
                 if result.returncode == 0 and result.stdout.strip():
                     self.dir_field.current.value = result.stdout.strip().rstrip('/')
                     self.page.update()
+                    if self.pattern_select.current.value == "Auto":
+                        self._auto_detect()
+                    else:
+                        self._schedule_preview()
                     return
             except Exception:
                 pass
@@ -174,45 +234,152 @@ class RenamerTab:
     def _append_preview(self, text: str, color: str | None = None):
         self.preview_list.current.controls.append(ft.Text(text, size=12, color=color or self._c("#374151", "#a6adc8")))
 
+    def _schedule_preview(self, e=None):
+        """Debounce live preview updates while the user is typing"""
+        with self._preview_lock:
+            if self._preview_timer is not None:
+                self._preview_timer.cancel()
+            self._preview_timer = threading.Timer(PREVIEW_DEBOUNCE_SECONDS, self._preview, args=(None,))
+            self._preview_timer.daemon = True
+            self._preview_timer.start()
+
+    def _show_rows(self, rows: List[Tuple[Optional[str], str, Optional[str]]]):
+        """Render (key, text, color) rows, reusing controls whose row didn't change.
+
+        Rows with a key (the source filename) keep their Text control between
+        previews, so only changed rows are sent to the client.
+        """
+        new_controls = []
+        new_rows: Dict[str, ft.Text] = {}
+        for key, text, color in rows:
+            ctrl = self._preview_rows.get(key) if key is not None else None
+            if ctrl is None:
+                ctrl = ft.Text(text, size=12, color=color or self._c("#374151", "#a6adc8"))
+            elif ctrl.value != text:
+                ctrl.value = text
+            if key is not None:
+                new_rows[key] = ctrl
+            new_controls.append(ctrl)
+        self._preview_rows = new_rows
+        self.preview_list.current.controls[:] = new_controls
+        self.page.update()
+
     def _preview(self, e):
-        self.preview_list.current.controls.clear()
+        # Serialize renders; a debounced timer and a button click may overlap
+        with self._render_lock:
+            self._show_rows(self._preview_rows_for_inputs())
+
+    def _preview_rows_for_inputs(self) -> List[Tuple[Optional[str], str, Optional[str]]]:
+        rows: List[Tuple[Optional[str], str, Optional[str]]] = []
         directory = (self.dir_field.current.value or os.getcwd()).strip()
         regex_text = (self.regex_field.current.value or DEFAULT_REGEX).strip()
         try:
             pattern = re.compile(regex_text)
         except re.error as ex:
-            self._append_preview(f"{self.lang_manager.get_text('invalid_regex')}: {ex}", "#ef4444")
-            self.page.update()
-            return
+            return [(None, f"{self.lang_manager.get_text('invalid_regex')}: {ex}", "#ef4444")]
         # Ensure required groups exist
-        required_groups = {"season", "episode"}
-        if not required_groups.issubset(set(pattern.groupindex.keys())):
-            try:
-                pattern = re.compile(DEFAULT_REGEX)
-                self._append_preview(self.lang_manager.get_text("identifier_missing_groups_default_used"), "#f97316")
-            except Exception:
-                self._append_preview("Internal error compiling default pattern.", "#ef4444")
-                self.page.update()
-                return
+        if not has_identifier_groups(pattern):
+            pattern = re.compile(DEFAULT_REGEX)
+            rows.append((None, self.lang_manager.get_text("identifier_missing_groups_default_used"), "#f97316"))
 
         if not os.path.isdir(directory):
-            self._append_preview(self.lang_manager.get_text("dir_not_exist"), "#ef4444")
-            self.page.update()
-            return
+            return [(None, self.lang_manager.get_text("dir_not_exist"), "#ef4444")]
 
-        files = scan_files(directory)
-        plan = compute_plan(directory, files, pattern, self.template_field.current.value or "Episode {episode} Staffel {season}",
-                               use_parsed=(self.use_parsed_radio.current.value == "PARSED"),
-                               start_season=int(self.start_season.current.value or 1),
-                               start_episode=int(self.start_episode.current.value or 1))
+        try:
+            if self.tree_checkbox.current.value:
+                return rows + self._tree_preview_rows(directory, pattern)
+            plan = compute_plan(directory, pattern, *self._plan_options())
+        except (KeyError, IndexError, ValueError) as ex:
+            # Half-typed template or number while previewing live
+            return rows + [(None, f"{self.lang_manager.get_text('invalid_template')}: {ex}", "#ef4444")]
+        except OSError as ex:
+            return rows + [(None, str(ex), "#ef4444")]
         if not plan:
-            self._append_preview(self.lang_manager.get_text("nothing_to_rename"))
+            rows.append((None, self.lang_manager.get_text("nothing_to_rename"), None))
         else:
             width = max(len(src) for src, _ in plan)
             for src, tgt in plan:
-                self._append_preview(f"{src.ljust(width)}  ->  {tgt}")
+                rows.append((src, f"{src.ljust(width)}  ->  {tgt}", None))
+        return rows
+
+    def _plan_options(self) -> Tuple[str, bool, int, int]:
+        """(template, use_parsed, start_season, start_episode) from the form"""
+        return (self.template_field.current.value or "Episode {episode} Staffel {season}",
+                self.use_parsed_radio.current.value == "PARSED",
+                int(self.start_season.current.value or 1),
+                int(self.start_episode.current.value or 1))
+
+    def _tree_preview_rows(self, root: str, pattern: re.Pattern) -> List[Tuple[Optional[str], str, Optional[str]]]:
+        """One summary row per folder with renames, the total and any cross-folder conflicts"""
+        plans = compute_tree_plan(root, pattern, *self._plan_options())
+        if not plans:
+            return [(None, self.lang_manager.get_text("nothing_to_rename"), None)]
+        rows: List[Tuple[Optional[str], str, Optional[str]]] = []
+        for directory, plan in plans.items():
+            rows.append((directory, self.lang_manager.get_text(
+                "folder_renames", folder=os.path.relpath(directory, root), count=len(plan)), None))
+        rows.append((None, self.lang_manager.get_text(
+            "tree_total", folders=len(plans), files=sum(len(p) for p in plans.values())), None))
+        ok, errors = check_tree_conflicts(plans)
+        if not ok:
+            rows.append((None, self.lang_manager.get_text("conflicts_detected"), "#ef4444"))
+            rows += [(None, f"- {err}", "#ef4444") for err in errors[:MAX_CONFLICT_LINES]]
+        return rows
+
+    def _rename_tree(self, root: str, pattern: re.Pattern):
+        """Plan the whole library, check it globally, then rename folders concurrently"""
+        plans = compute_tree_plan(root, pattern, *self._plan_options())
+        if not plans:
+            self._append_preview(self.lang_manager.get_text("nothing_to_rename"))
+            return
+        ok, errors = check_tree_conflicts(plans)
+        if not ok:
+            self._append_preview(self.lang_manager.get_text("conflicts_detected"), "#ef4444")
+            for err in errors[:MAX_CONFLICT_LINES]:
+                self._append_preview(f"- {err}", "#ef4444")
+            return
+
+        rows: Dict[str, ft.Text] = {}
+        for directory, plan in plans.items():
+            rows[directory] = ft.Text(self.lang_manager.get_text(
+                "folder_renames", folder=os.path.relpath(directory, root), count=len(plan)),
+                size=12, color=self._c("#374151", "#a6adc8"))
+            self.preview_list.current.controls.append(rows[directory])
         self.page.update()
 
+        lock = threading.Lock()
+        finished = [0]
+
+        def progress(directory, state, detail):
+            folder = os.path.relpath(directory, root)
+            with lock:
+                row = rows[directory]
+                if state == "started":
+                    row.value = self.lang_manager.get_text("folder_started", folder=folder)
+                elif state == "done":
+                    finished[0] += 1
+                    row.value = self.lang_manager.get_text("folder_done", folder=folder, count=len(plans[directory]))
+                    row.color = "#22c55e"
+                else:
+                    finished[0] += 1
+                    row.value = f"{self.lang_manager.get_text('folder_failed', folder=folder)}: {detail}"
+                    row.color = "#ef4444"
+                self.progress.current.value = finished[0] / len(plans)
+                self.status_text.current.value = f"{finished[0]}/{len(plans)}"
+                self.page.update()
+
+        # One journal group per library pass so a single undo reverts all folders
+        group = "tree-" + uuid.uuid4().hex[:8]
+        jobs = {d: (lambda d=d, p=p: apply_plan(d, p, self.journal, group=group)) for d, p in plans.items()}
+        try:
+            results = run_per_directory(jobs, RENAME_DIR_WORKERS, progress)
+        finally:
+            self.journal.prune()
+        failed = sum(1 for r in results.values() if isinstance(r, Exception))
+        if failed:
+            self._append_preview(self.lang_manager.get_text("folders_failed", count=failed), "#ef4444")
+        self.status_text.current.value = self.lang_manager.get_text("done_status")
+
     def _rename(self, e):
         directory = (self.dir_field.current.value or os.getcwd()).strip()
         regex_text = (self.regex_field.current.value or DEFAULT_REGEX).strip()
@@ -223,8 +390,7 @@ class RenamerTab:
             self.page.update()
             return
         # Ensure required groups exist
-        required_groups = {"season", "episode"}
-        if not required_groups.issubset(set(pattern.groupindex.keys())):
+        if not has_identifier_groups(pattern):
             pattern = re.compile(DEFAULT_REGEX)
 
         if not os.path.isdir(directory):
@@ -238,11 +404,10 @@ class RenamerTab:
             self.preview_list.current.controls.clear()
             self.page.update()
             try:
-                files = scan_files(directory)
-                plan = compute_plan(directory, files, pattern, self.template_field.current.value or "Episode {episode} Staffel {season}",
-                                       use_parsed=(self.use_parsed_radio.current.value == "PARSED"),
-                                       start_season=int(self.start_season.current.value or 1),
-                                       start_episode=int(self.start_episode.current.value or 1))
+                if self.tree_checkbox.current.value:
+                    self._rename_tree(directory, pattern)
+                    return
+                plan = compute_plan(directory, pattern, *self._plan_options())
                 if not plan:
                     self._append_preview(self.lang_manager.get_text("nothing_to_rename"))
                     return
@@ -252,7 +417,11 @@ class RenamerTab:
                     for err in errors:
                         self._append_preview(f"- {err}", "#ef4444")
                     return
-                apply_plan(directory, plan)
+                try:
+                    apply_plan(directory, plan, self.journal)
+                except (OSError, JournalError) as ex:
+                    self._append_preview(f"{self.lang_manager.get_text('rename_failed')}: {ex}", "#ef4444")
+                    return
                 for src, tgt in plan:
                     self._append_preview(f"{src} -> {tgt}")
                 self.progress.current.value = 1
@@ -263,28 +432,72 @@ class RenamerTab:
 
         threading.Thread(target=worker, daemon=True).start()
 
+    def _recover_journal(self):
+        try:
+            results = self.journal.recover()
+        except Exception:
+            return
+        if not results:
+            return
+        failed = [err for _, err in results if err]
+        msg = self.lang_manager.get_text("rename_recovered", count=len(results) - len(failed))
+        if failed:
+            msg += f" ({self.lang_manager.get_text('rename_failed')}: {failed[0]})"
+        if self.status_text.current is not None:
+            self.status_text.current.value = msg
+            try:
+                self.page.update()
+            except Exception:
+                pass
+
+    def _undo(self, e):
+        try:
+            count = max(int(self.undo_count.current.value or 1), 1)
+        except ValueError:
+            count = 1
+
+        def worker():
+            self.status_text.current.value = self.lang_manager.get_text("starting_status")
+            self.preview_list.current.controls.clear()
+            self.page.update()
+            try:
+                undone = self.journal.undo(count)
+                invalidate_snapshot((self.dir_field.current.value or os.getcwd()).strip())
+                invalidate_index((self.dir_field.current.value or os.getcwd()).strip())
+                if not undone:
+                    self._append_preview(self.lang_manager.get_text("nothing_to_undo"))
+                else:
+                    self._append_preview(self.lang_manager.get_text("undo_done", count=len(undone)), "#22c55e")
+                self.status_text.current.value = self.lang_manager.get_text("done_status")
+            except (OSError, JournalError) as ex:
+                self._append_preview(f"{self.lang_manager.get_text('rename_failed')}: {ex}", "#ef4444")
+            finally:
+                self.page.update()
+
+        threading.Thread(target=worker, daemon=True).start()
+
 DEFAULT_REGEX = r"S(?P<season>\d{2})E(?P<episode>\d{2})(?P<part>[A-Za-z])?"
-FALLBACK_SIMPLE_EP_REGEX = re.compile(r"(?P<episode>\d{2})(?P<part>[A-Za-z])?")
+# Two digits not embedded in a longer number, so years, 1080p or x264 aren't read as episodes
+FALLBACK_SIMPLE_EP_REGEX = re.compile(r"(?<!\d)(?P<episode>\d{2})(?P<part>[A-Za-z])?(?!\d)")
+
+PREVIEW_DEBOUNCE_SECONDS = 0.25
+# (inputs, index group listing, plan) of the last compute_plan call; Rename reuses the preview's plan
+_last_plan: Optional[Tuple[tuple, list, List[Tuple[str, str]]]] = None
+# Renames are metadata-only; a few folders at once hides network-share latency
+RENAME_DIR_WORKERS = 4
+MAX_CONFLICT_LINES = 20
 
 PartOrder = {chr(c): i for i, c in enumerate(range(ord('A'), ord('Z')+1), start=1)}
 
 def scan_files(directory: str) -> List[str]:
-    files = []
-    for name in os.listdir(directory):
-        path = os.path.join(directory, name)
-        if os.path.isfile(path):
-            files.append(name)
-    return files
+    return list(get_snapshot(directory).files)
 
 def parse_identifier(name: str, pattern: re.Pattern) -> Optional[Tuple[int, int, Optional[str]]]:
     m = pattern.search(name)
     if m:
-        season = int(m.group('season'))
-        episode = int(m.group('episode'))
-        part = m.groupdict().get('part')
-        if part:
-            part = part.upper()
-        return season, episode, part
+        parsed = parse_match(m)
+        if parsed:
+            return parsed
     fm = FALLBACK_SIMPLE_EP_REGEX.search(name)
     if fm:
         season = 1
@@ -295,11 +508,20 @@ def parse_identifier(name: str, pattern: re.Pattern) -> Optional[Tuple[int, int,
         return season, episode, part
     return None
 
+def episode_index(pattern: re.Pattern) -> EpisodeIndex:
+    """Shared index of files parsed with pattern (plus the bare-episode fallback)"""
+    return get_index(f"renamer|{pattern.flags}|{pattern.pattern}", lambda name: parse_identifier(name, pattern))
+
 def sort_key(item: Tuple[str, Tuple[int, int, Optional[str]]]):
     name, (season, episode, part) = item
     part_rank = PartOrder.get(part, 0) if part else 0
     return (season, episode, part_rank, name.lower())
 
+def parsed_sort_key(item: Tuple[str, int, int, Optional[str]]):
+    """sort_key for (name, season, episode, part) tuples, without repacking them"""
+    name, season, episode, part = item
+    return (season, episode, PartOrder.get(part, 0) if part else 0, name.lower())
+
 def build_numbering(parsed: List[Tuple[str, int, int, Optional[str]]], use_parsed: bool,
                     start_season: int, start_episode: int) -> Dict[str, Tuple[int, int, Optional[str]]]:
     mapping: Dict[str, Tuple[int, int, Optional[str]]] = {}
@@ -316,66 +538,120 @@ def build_numbering(parsed: List[Tuple[str, int, int, Optional[str]]], use_parse
 def render_new_name(template: str, season: int, episode: int, part: Optional[str], index: int, ext: str) -> str:
     return template.format(season=season, episode=episode, part=(part or ''), index=index, ext=ext)
 
-def compute_plan(directory: str, files: List[str], pattern: re.Pattern, template: str,
+def _ext(name: str) -> str:
+    """os.path.splitext(name)[1] without the dot, for a bare filename"""
+    dot = name.rfind('.')
+    if dot <= 0 or not name[:dot].lstrip('.'):
+        return ''
+    return name[dot + 1:]
+
+def compute_plan(directory: str, pattern: re.Pattern, template: str,
                  use_parsed: bool, start_season: int, start_episode: int) -> List[Tuple[str, str]]:
-    parsed: List[Tuple[str, int, int, Optional[str]]] = []
-    skipped: List[str] = []
-    for f in files:
-        res = parse_identifier(f, pattern)
-        if res:
-            parsed.append((f, res[0], res[1], res[2]))
-        else:
-            skipped.append(f)
-    if not parsed:
-        return []
-    parsed_sorted = sorted(parsed, key=lambda x: sort_key((x[0], (x[1], x[2], x[3]))))
-    numbering = build_numbering(parsed_sorted, use_parsed, start_season, start_episode)
+    global _last_plan
+    # The index's group listing is cached and already in sort_key order
+    groups = episode_index(pattern).groups(directory)
+    key = (os.path.abspath(directory), pattern.pattern, pattern.flags, template, use_parsed, start_season, start_episode)
+    last = _last_plan
+    if last is not None and last[0] == key and last[1] is groups:
+        return list(last[2])  # callers on other threads get their own list
+
+    parsed = [(rec.name, rec.season, rec.episode, rec.part) for _, _, records in groups for rec in records]
+    numbering = build_numbering(parsed, use_parsed, start_season, start_episode)
     plan: List[Tuple[str, str]] = []
-    for idx, (fname, _, _, _) in enumerate(parsed_sorted, start=1):
+    template_has_ext = '{ext' in template
+    for idx, (fname, _, _, _) in enumerate(parsed, start=1):
         season, episode, part = numbering[fname]
-        root, ext = os.path.splitext(fname)
-        new_base = render_new_name(template, season, episode, part, idx, ext.lstrip('.'))
-        target = f"{new_base}.{ext.lstrip('.')}" if '{ext' not in template and not new_base.endswith(f".{ext.lstrip('.')}") and ext else new_base
+        ext = _ext(fname)
+        new_base = render_new_name(template, season, episode, part, idx, ext)
+        target = f"{new_base}.{ext}" if not template_has_ext and ext and not new_base.endswith(f".{ext}") else new_base
         plan.append((fname, target))
-    return plan
+    _last_plan = (key, groups, plan)
+    return list(plan)
+
 
 def check_conflicts(directory: str, plan: List[Tuple[str, str]]) -> Tuple[bool, List[str]]:
-    targets = {}
+    targets = set()
     dupes = []
     for _, tgt in plan:
         if tgt in targets:
             dupes.append(tgt)
-        targets[tgt] = True
+        targets.add(tgt)
     errors = []
     if dupes:
         errors.append(f"Duplicate targets in plan: {sorted(set(dupes))}")
-    existing = set(os.listdir(directory))
+    existing = get_snapshot(directory).name_set
+    # Targets vacated by the same plan are fine; the journal orders chains and cycles
+    sources = {src for src, _ in plan}
     for src, tgt in plan:
-        if tgt != src and tgt in existing:
+        if tgt != src and tgt in existing and tgt not in sources:
             errors.append(f"Target exists already: {tgt}")
     return (len(errors) == 0), errors
 
-def apply_plan(directory: str, plan: List[Tuple[str, str]]) -> None:
-    temp_suffix = ".__renametemp__"
-    temps: Dict[str, str] = {}
-    plan_map = {src: tgt for src, tgt in plan}
-    targets = {tgt for _, tgt in plan}
-    for src, tgt in plan:
-        if tgt in plan_map and tgt != src:
-            src_path = os.path.join(directory, tgt)
-            tmp = tgt + temp_suffix
-            while os.path.exists(os.path.join(directory, tmp)):
-                tmp = tmp + "_x"
-            os.replace(src_path, os.path.join(directory, tmp))
-            temps[tmp] = tgt
-    for src, tgt in plan:
-        if src == tgt:
-            continue
-        src_path = os.path.join(directory, src)
-        tgt_path = os.path.join(directory, tgt)
-        os.replace(src_path, tgt_path)
-    for tmp, final in temps.items():
-        tmp_path = os.path.join(directory, tmp)
-        final_path = os.path.join(directory, final)
-        if os.path.exists(tmp_path):
-            os.replace(tmp_path, final_path)
+def compute_tree_plan(root: str, pattern: re.Pattern, template: str, use_parsed: bool,
+                      start_season: int, start_episode: int) -> Dict[str, List[Tuple[str, str]]]:
+    """compute_plan for root and every folder below it; returns {directory: plan} for folders with renames.
+
+    Numbering is per folder, so manual numbering restarts in each season folder.
+    """
+    plans: Dict[str, List[Tuple[str, str]]] = {}
+    for snap in scan_tree(root):
+        plan = compute_plan(snap.directory, pattern, template, use_parsed, start_season, start_episode)
+        if plan:
+            plans[snap.directory] = plan
+    return plans
+
+def _path_key(path: str) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+def check_tree_conflicts(plans: Dict[str, List[Tuple[str, str]]]) -> Tuple[bool, List[str]]:
+    """check_conflicts across a whole library plan.
+
+    Targets are compared as full paths, so templates containing a subfolder
+    can't collide with renames planned in another folder. Folders are applied
+    concurrently, so a target may only reuse a name vacated in its own folder.
+    """
+    sources: Dict[str, str] = {}
+    for directory, plan in plans.items():
+        for src, _ in plan:
+            sources[_path_key(os.path.join(directory, src))] = directory
+    errors: List[str] = []
+    targets = set()
+    for directory, plan in plans.items():
+        existing = get_snapshot(directory).name_set
+        dir_key = _path_key(directory)
+        for src, tgt in plan:
+            if tgt == src:
+                continue
+            path = os.path.normpath(os.path.join(directory, tgt))
+            key = _path_key(path)
+            if key in targets:
+                errors.append(f"Duplicate target: {path}")
+                continue
+            targets.add(key)
+            owner = sources.get(key)
+            if owner is not None:
+                if owner != directory:
+                    errors.append(f"Target is renamed in another folder: {path}")
+                continue
+            parent = os.path.dirname(path)
+            if _path_key(parent) == dir_key:
+                exists = tgt in existing
+            elif not os.path.isdir(parent):
+                errors.append(f"Target folder missing: {parent}")
+                continue
+            else:
+                exists = os.path.lexists(path)
+            if exists:
+                errors.append(f"Target exists already: {path}")
+    return (len(errors) == 0), errors
+
+def apply_plan(directory: str, plan: List[Tuple[str, str]], journal: Optional[RenameJournal] = None,
+               group: Optional[str] = None) -> Optional[str]:
+    """Apply a rename plan through the write-ahead journal; returns the batch id"""
+    try:
+        return (journal or RenameJournal()).apply(directory, plan, group=group)
+    finally:
+        # Targets may live in a subfolder when the template contains a path
+        for parent in {os.path.dirname(os.path.join(directory, tgt)) for _, tgt in plan} | {directory}:
+            invalidate_snapshot(parent)
+            invalidate_index(parent)
@@ -0,0 +1,149 @@
+"""HDR to SDR tone-mapping helpers for VidoEdit"""
+import json
+import re
+import subprocess
+import time
+from pathlib import Path
+
+from ffmpeg_utils import get_ffmpeg_path, get_ffmpeg_filters, get_video_stream
+
+# Transfer characteristics reported by ffprobe for HDR sources
+HDR_TRANSFERS = {
+    "smpte2084": "PQ",
+    "arib-std-b67": "HLG",
+}
+
+# Filter chains converting HDR (BT.2020 PQ/HLG) to 8-bit BT.709 SDR
+TONEMAP_CHAINS = {
+    "zscale": (
+        "zscale=t=linear:npl=100,format=gbrpf32le,zscale=p=bt709,"
+        "tonemap=tonemap=hable:desat=0,"
+        "zscale=t=bt709:m=bt709:r=tv,format=yuv420p"
+    ),
+    "libplacebo": (
+        "libplacebo=tonemapping=bt.2390:colorspace=bt709:"
+        "color_primaries=bt709:color_trc=bt709:range=tv:format=yuv420p"
+    ),
+}
+
+# Filters each method needs in the ffmpeg build
+TONEMAP_REQUIREMENTS = {
+    "zscale": ("zscale", "tonemap"),
+    "libplacebo": ("libplacebo",),
+}
+
+# Used when no benchmark results exist; zscale is CPU-only and usually fastest
+DEFAULT_PREFERENCE = ("zscale", "libplacebo")
+
+SDR_COLOR_ARGS = [
+    "-color_primaries", "bt709",
+    "-color_trc", "bt709",
+    "-colorspace", "bt709",
+]
+
+BENCH_FILE = Path.home() / ".vidoedit" / "tonemap_bench.json"
+
+
+def hdr_format(info):
+    """Return "PQ" or "HLG" if the probed video stream is HDR, else None"""
+    stream = get_video_stream(info or {})
+    if not stream:
+        return None
+    return HDR_TRANSFERS.get(stream.get("color_transfer", ""))
+
+
+def available_methods():
+    """Return the tone-mapping methods supported by the installed ffmpeg"""
+    filters = get_ffmpeg_filters()
+    return [m for m in DEFAULT_PREFERENCE if all(f in filters for f in TONEMAP_REQUIREMENTS[m])]
+
+
+def load_benchmarks():
+    """Load stored benchmark results: {method: {"ms_per_frame": float, "fps": float}}"""
+    try:
+        with open(BENCH_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_benchmarks(results):
+    try:
+        BENCH_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(BENCH_FILE, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    except Exception:
+        pass
+
+
+def select_method(methods=None, benchmarks=None):
+    """Pick the fastest available method, using benchmark results when present"""
+    methods = available_methods() if methods is None else methods
+    if not methods:
+        return None
+    benchmarks = load_benchmarks() if benchmarks is None else benchmarks
+    measured = [m for m in methods if benchmarks.get(m, {}).get("ms_per_frame")]
+    if measured:
+        return min(measured, key=lambda m: benchmarks[m]["ms_per_frame"])
+    return methods[0]
+
+
+def build_tonemap_filter(method):
+    """Return the filter chain for method; pair it with SDR_COLOR_ARGS on the output"""
+    return TONEMAP_CHAINS[method]
+
+
+def benchmark_method(input_file, method, seconds=10):
+    """Run a decode+tonemap pass over the first seconds of input_file without encoding.
+
+    method=None runs a plain decode pass, used as the baseline. Returns {"frames": int, "seconds": float, "fps": float, "ms_per_frame": float}
+    or None if ffmpeg failed.
+    """
+    cmd = [
+        get_ffmpeg_path(), "-hide_banner", "-nostdin",
+        "-progress", "pipe:1", "-nostats",
+        "-t", str(seconds), "-i", input_file,
+        "-an", "-sn",
+    ]
+    if method:
+        cmd += ["-vf", TONEMAP_CHAINS[method]]
+    cmd += ["-f", "null", "-"]
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        return None
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        return None
+    frames = 0
+    for m in re.finditer(r"^frame=(\d+)", result.stdout, re.MULTILINE):
+        frames = int(m.group(1))
+    if frames <= 0:
+        return None
+    return {
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2),
+        "ms_per_frame": round(elapsed * 1000 / frames, 3),
+    }
+
+
+def benchmark_all(input_file, seconds=10):
+    """Benchmark every available method on input_file and store the results.
+
+    Each entry also gets "tonemap_ms_per_frame": the cost on top of a plain decode
+    of the same window, so the decoder (VVC is expensive) doesn't hide the difference.
+    """
+    results = load_benchmarks()
+    baseline = benchmark_method(input_file, None, seconds)
+    if baseline:
+        results["decode"] = baseline
+    for method in available_methods():
+        res = benchmark_method(input_file, method, seconds)
+        if res:
+            if baseline:
+                res["tonemap_ms_per_frame"] = round(max(res["ms_per_frame"] - baseline["ms_per_frame"], 0.0), 3)
+            results[method] = res
+    save_benchmarks(results)
+    return results
@@ -48,6 +48,24 @@ TRANSLATIONS = {
         "done_status": "Done",
         "conflicts_detected": "Conflicts detected:",
         "nothing_to_rename": "Nothing to rename",
+        "undo_rename": "Undo",
+        "undo_batches": "Batches",
+        "nothing_to_undo": "Nothing to undo",
+        "undo_done": "Undid {count} rename batch(es)",
+        "rename_failed": "Rename failed",
+        "rename_recovered": "Finished {count} interrupted rename batch(es)",
+        "invalid_template": "Invalid template",
+        "include_subfolders": "Include subfolders",
+        "folder_renames": "{folder}: {count} file(s) to rename",
+        "folder_episodes": "{folder}: {count} episode(s)",
+        "tree_total": "{folders} folder(s), {files} file(s)",
+        "folder_started": "{folder}: working...",
+        "folder_done": "{folder}: done ({count})",
+        "folder_failed": "{folder}: failed",
+        "folders_failed": "{count} folder(s) failed",
+        "auto_detect": "Auto-detect",
+        "pattern_detected": "Detected pattern: {name} ({coverage}% of files)",
+        "no_pattern_detected": "No episode pattern detected",
         
         # Common buttons
         "add_files": "Add Files",
@@ -55,6 +73,70 @@ TRANSLATIONS = {
         "clear_queue": "Clear Queue",
         "start": "START",
         "cancel": "CANCEL",
+        "pause": "PAUSE",
+        "resume": "RESUME",
+        "paused": "Paused",
+        "performance": "Performance",
+        "low_priority": "Run encodes at low CPU and disk priority",
+        "cpu_limit_percent": "CPU limit (%)",
+        "memory_limit_mb": "Memory limit (MB)",
+        "limits_hint": "100% = one core, empty = no limit. Limits need a systemd user session (Linux) and apply to jobs started afterwards.",
+        "max_parallel_jobs": "Max parallel jobs",
+        "parallel_hint": "Empty = automatic. The number of parallel encodes is adjusted to the measured throughput.",
+        "parallel_progress": "{running} files in progress, {done}/{total} done",
+        "concurrency_decision": "Parallel jobs {old} → {new} ({reason})",
+        "memory_budget_mb": "RAM budget (MB)",
+        "memory_budget_hint": "Parallel jobs only start while their predicted memory fits. Empty = 80% of RAM.",
+        "memory_note": "Memory: {detail}",
+        "cpu_pinning": "Give each parallel job its own CPU cores",
+        "scratch_dir": "Scratch folder for outputs in progress",
+        "scratch_quota_mb": "Scratch quota (MB)",
+        "scratch_hint": "E.g. a local SSD. Finished files are moved to their destination in the background. Empty = write next to the source.",
+        "publish_failed": "✗ Could not move the output of {name} into place: {error}. It was kept in {folder}",
+        "publish_note": "After moving an output into place: {detail}",
+        "prefetch_depth": "Prefetch files",
+        "prefetch_mb_s": "Prefetch limit (MB/s)",
+        "prefetch_hint": "Network-hosted inputs (NAS) are copied to the scratch folder ahead of their encode. 0 = off, empty limit = unlimited.",
+        "prefetch_note": "Prefetch skipped: {detail}",
+        "device_max_jobs": "Jobs per disk",
+        "device_hint": "Parallel jobs reading or writing the same disk or share. Empty = 2 on hard disks and network shares, no limit on SSDs.",
+        "device_note": "Disk I/O: {detail}",
+        "space_note": "Disk space: {detail}",
+        "space_refused_note": "{name}  (skipped - not enough disk space)",
+        "space_refused": "{count} file(s) skipped for lack of disk space",
+        "size_guard": "Stop when the output would be larger than {percent}% of the original",
+        "size_guard_percent": "Stop above (% of original)",
+        "size_guard_hint": "Compressions projected to end above this size are stopped and the file is skipped in later runs. Empty = 95.",
+        "not_worth_aborted": "{name}: stopped, projected at {percent}% of the original - not worth compressing",
+        "not_worth_skipped": "{name}  (skipped - not worth compressing)",
+        "estimate_savings": "Estimate savings from samples first, skip files under {percent}%",
+        "min_savings_percent": "Minimum savings (%)",
+        "min_savings_hint": "Files whose sample encodes predict less savings are skipped. Empty = 15.",
+        "estimating_savings": "Estimating savings: {name}",
+        "estimated_savings": "{name}  (~{percent}% smaller, {low} to {high}%)",
+        "estimate_skipped": "{name}: skipped, only ~{percent}% smaller (minimum {minimum}%)",
+        "stall_timeout_s": "Stall timeout (s)",
+        "stall_retries": "Retries after a stall",
+        "stall_hint": "Jobs without progress for this long are stopped and retried, skipping damaged data. Empty timeout = 300 s.",
+        "stall_note": "Stalled: {detail}",
+        "stall_retry": "{name}: retry {attempt} of {retries}, skipping damaged data",
+        "orphans_removed": "Removed {count} partial output file(s) left by an interrupted session",
+        "prescan_inputs": "Pre-scan inputs for damage",
+        "prescan_started": "Scanning for damage: {done} of {count} files",
+        "prescan_suspect": "{name}: {detail} - reading it error-tolerantly",
+        "prescan_broken": "{name}: damaged ({detail}), skipped",
+        "prescan_quarantined": "{name}: damaged ({detail}), moved to {folder}",
+        "prescan_keyframes": "Pre-scan also decodes keyframes (slower, finds damaged video)",
+        "quarantine_dir": "Quarantine folder for damaged files",
+        "prescan_hint": "The pre-scan reads every queued file once without decoding it. Damaged files are skipped, or moved to the quarantine folder when one is set.",
+        "verify_before_replace": "Verify the output before replacing",
+        "verify_failed": "✗ {name}: output failed verification ({detail}), original kept",
+        "backup_originals": "Keep a backup of the original",
+        "backup_failed": "✗ {name}: the original couldn't be backed up ({error}), kept; the output is at {path}",
+        "backups_pruned": "Removed {count} backup(s) past their retention",
+        "backup_keep_days": "Keep backups (days)",
+        "backup_keep_gb": "Backups at most (GB)",
+        "backup_hint": "Backups of replaced originals sit in a .vidoedit-backup folder next to them: reflinks or hard links where possible, so they take no time. Empty days = 7, empty size = no limit.",
         
         # Convert Tab
         "target_codec": "Target Codec:",
@@ -70,6 +152,12 @@ TRANSLATIONS = {
         "conversion_cancelled": "Conversion cancelled.",
         "done": "✓ Done! {count} files converted",
         "conversion_complete": "\n=== Conversion complete! ({count} files) ===",
+        "tonemap_hdr": "Tone-map HDR sources to SDR (H.264)",
+        "tonemap_applied": "HDR ({hdr}) detected, tone-mapping via {method}",
+        "tonemap_unavailable": "HDR ({hdr}) detected, but ffmpeg has no tone-mapping filter",
+        "extra_outputs": "Also write:",
+        "compressed_copy": "Compressed copy",
+        "single_decode_outputs": "Single decode, {count} outputs",
         
         # Compress Tab
         "encoder": "Encoder:",
@@ -78,6 +166,24 @@ TRANSLATIONS = {
         "presets": "Presets:",
         "idle": "Idle",
         "compressing": "Compressing... ({percent}%)",
+        "auto_crop_deinterlace": "Auto-detect black bars and interlacing",
+        "analyzing": "Analyzing: {name}",
+        "analysis_filters": "Analysis: {filters}",
+        "stream_policy": "Select streams and re-encode lossless audio",
+        "keep_languages": "Keep languages",
+        "lossless_audio_to": "Lossless audio to",
+        "audio_bitrate": "Audio kbit/s",
+        "subtitles": "Subtitles",
+        "subtitles_all": "All",
+        "subtitles_text": "Text only",
+        "subtitles_none": "None",
+        "drop_commentary": "Drop commentary tracks",
+        "projected_savings": "Stream policy saves ~{size} across {count} files",
+        "output": "Output:",
+        "output_file": "Single file (MKV)",
+        "output_stream": "HLS/DASH (fMP4 segments)",
+        "abr_ladder": "ABR ladder",
+        "stream_mode_note": "Each rung uses the preset's CRF with its own bitrate cap and one AAC stereo track; target size and the stream policy don't apply.",
         
         # Presets
         "preset_film": "Film - Balances encoding quality with file size, suited for most films.",
@@ -140,6 +246,24 @@ TRANSLATIONS = {
         "done_status": "Fertig",
         "conflicts_detected": "Konflikte erkannt:",
         "nothing_to_rename": "Nichts zum Umbenennen",
+        "undo_rename": "Rückgängig",
+        "undo_batches": "Durchläufe",
+        "nothing_to_undo": "Nichts rückgängig zu machen",
+        "undo_done": "{count} Umbenennungs-Durchläufe rückgängig gemacht",
+        "rename_failed": "Umbenennen fehlgeschlagen",
+        "rename_recovered": "{count} unterbrochene Umbenennungen abgeschlossen",
+        "invalid_template": "Ungültiges Template",
+        "include_subfolders": "Unterordner einbeziehen",
+        "folder_renames": "{folder}: {count} Datei(en) umzubenennen",
+        "folder_episodes": "{folder}: {count} Episode(n)",
+        "tree_total": "{folders} Ordner, {files} Datei(en)",
+        "folder_started": "{folder}: läuft...",
+        "folder_done": "{folder}: fertig ({count})",
+        "folder_failed": "{folder}: fehlgeschlagen",
+        "folders_failed": "{count} Ordner fehlgeschlagen",
+        "auto_detect": "Automatisch erkennen",
+        "pattern_detected": "Erkanntes Muster: {name} ({coverage}% der Dateien)",
+        "no_pattern_detected": "Kein Episodenmuster erkannt",
         
         # Common buttons
         "add_files": "Dateien hinzufügen",
@@ -147,6 +271,70 @@ TRANSLATIONS = {
         "clear_queue": "Warteschlange leeren",
         "start": "START",
         "cancel": "ABBRECHEN",
+        "pause": "PAUSE",
+        "resume": "FORTSETZEN",
+        "paused": "Pausiert",
+        "performance": "Leistung",
+        "low_priority": "Kodierung mit niedriger CPU- und Festplattenpriorität",
+        "cpu_limit_percent": "CPU-Limit (%)",
+        "memory_limit_mb": "Speicherlimit (MB)",
+        "limits_hint": "100% = ein Kern, leer = kein Limit. Limits benötigen eine systemd-Benutzersitzung (Linux) und gelten für danach gestartete Jobs.",
+        "max_parallel_jobs": "Max. parallele Jobs",
+        "parallel_hint": "Leer = automatisch. Die Zahl paralleler Kodierungen wird am gemessenen Durchsatz ausgerichtet.",
+        "parallel_progress": "{running} Dateien in Arbeit, {done}/{total} fertig",
+        "concurrency_decision": "Parallele Jobs {old} → {new} ({reason})",
+        "memory_budget_mb": "RAM-Budget (MB)",
+        "memory_budget_hint": "Parallele Jobs starten nur, solange ihr erwarteter Speicherbedarf passt. Leer = 80% des RAM.",
+        "memory_note": "Speicher: {detail}",
+        "cpu_pinning": "Jedem parallelen Job eigene CPU-Kerne zuweisen",
+        "scratch_dir": "Arbeitsordner für laufende Ausgaben",
+        "scratch_quota_mb": "Arbeitsordner-Kontingent (MB)",
+        "scratch_hint": "Z. B. eine lokale SSD. Fertige Dateien werden im Hintergrund an ihr Ziel verschoben. Leer = neben der Quelle schreiben.",
+        "publish_failed": "✗ Ausgabe von {name} konnte nicht verschoben werden: {error}. Sie liegt weiterhin in {folder}",
+        "publish_note": "Nach dem Verschieben einer Ausgabe: {detail}",
+        "prefetch_depth": "Vorab kopieren (Dateien)",
+        "prefetch_mb_s": "Kopierlimit (MB/s)",
+        "prefetch_hint": "Eingaben im Netzwerk (NAS) werden vor ihrer Kodierung in den Arbeitsordner kopiert. 0 = aus, leeres Limit = unbegrenzt.",
+        "prefetch_note": "Vorab-Kopie übersprungen: {detail}",
+        "device_max_jobs": "Jobs pro Laufwerk",
+        "device_hint": "Parallele Jobs, die von derselben Festplatte oder Freigabe lesen oder darauf schreiben. Leer = 2 bei Festplatten und Netzwerkfreigaben, kein Limit bei SSDs.",
+        "device_note": "Laufwerks-I/O: {detail}",
+        "space_note": "Speicherplatz: {detail}",
+        "space_refused_note": "{name}  (übersprungen - zu wenig Speicherplatz)",
+        "space_refused": "{count} Datei(en) wegen zu wenig Speicherplatz übersprungen",
+        "size_guard": "Abbrechen, wenn die Ausgabe größer als {percent}% des Originals würde",
+        "size_guard_percent": "Abbruch über (% vom Original)",
+        "size_guard_hint": "Komprimierungen, die voraussichtlich größer ausfallen, werden abgebrochen und die Datei in späteren Läufen übersprungen. Leer = 95.",
+        "not_worth_aborted": "{name}: abgebrochen, voraussichtlich {percent}% des Originals - Komprimieren lohnt sich nicht",
+        "not_worth_skipped": "{name}  (übersprungen - Komprimieren lohnt sich nicht)",
+        "estimate_savings": "Ersparnis vorab mit Stichproben schätzen, Dateien unter {percent}% überspringen",
+        "min_savings_percent": "Mindestersparnis (%)",
+        "min_savings_hint": "Dateien, deren Stichproben weniger Ersparnis erwarten lassen, werden übersprungen. Leer = 15.",
+        "estimating_savings": "Schätze Ersparnis: {name}",
+        "estimated_savings": "{name}  (~{percent}% kleiner, {low} bis {high}%)",
+        "estimate_skipped": "{name}: übersprungen, nur ~{percent}% kleiner (Minimum {minimum}%)",
+        "stall_timeout_s": "Hänger-Timeout (s)",
+        "stall_retries": "Wiederholungen nach Hänger",
+        "stall_hint": "Jobs ohne Fortschritt in dieser Zeit werden gestoppt und wiederholt, beschädigte Daten werden übersprungen. Leerer Timeout = 300 s.",
+        "stall_note": "Hängt: {detail}",
+        "stall_retry": "{name}: Wiederholung {attempt} von {retries}, beschädigte Daten werden übersprungen",
+        "orphans_removed": "{count} unvollständige Ausgabedatei(en) einer abgebrochenen Sitzung entfernt",
+        "prescan_inputs": "Eingaben vorab auf Schäden prüfen",
+        "prescan_started": "Prüfe auf Schäden: {done} von {count} Dateien",
+        "prescan_suspect": "{name}: {detail} - wird fehlertolerant gelesen",
+        "prescan_broken": "{name}: beschädigt ({detail}), übersprungen",
+        "prescan_quarantined": "{name}: beschädigt ({detail}), verschoben nach {folder}",
+        "prescan_keyframes": "Vorab-Prüfung dekodiert auch Keyframes (langsamer, findet beschädigtes Video)",
+        "quarantine_dir": "Quarantäne-Ordner für beschädigte Dateien",
+        "prescan_hint": "Die Vorab-Prüfung liest jede Datei der Warteschlange einmal, ohne sie zu dekodieren. Beschädigte Dateien werden übersprungen oder, falls gesetzt, in den Quarantäne-Ordner verschoben.",
+        "verify_before_replace": "Ausgabe vor dem Ersetzen prüfen",
+        "verify_failed": "✗ {name}: Ausgabe hat die Prüfung nicht bestanden ({detail}), Original behalten",
+        "backup_originals": "Sicherung des Originals behalten",
+        "backup_failed": "✗ {name}: Original konnte nicht gesichert werden ({error}) und bleibt erhalten; die Ausgabe liegt unter {path}",
+        "backups_pruned": "{count} Sicherung(en) nach Ablauf der Aufbewahrung entfernt",
+        "backup_keep_days": "Sicherungen behalten (Tage)",
+        "backup_keep_gb": "Sicherungen höchstens (GB)",
+        "backup_hint": "Sicherungen ersetzter Originale liegen in einem Ordner .vidoedit-backup daneben: wo möglich als Reflinks oder Hardlinks, also ohne Zeitaufwand. Leere Tage = 7, leere Größe = unbegrenzt.",
         
         # Convert Tab
         "target_codec": "Zielcodec:",
@@ -162,6 +350,12 @@ TRANSLATIONS = {
         "conversion_cancelled": "Konvertierung abgebrochen.",
         "done": "✓ Fertig! {count} Dateien konvertiert",
         "conversion_complete": "\n=== Konvertierung abgeschlossen! ({count} Dateien) ===",
+        "tonemap_hdr": "HDR-Quellen auf SDR tone-mappen (H.264)",
+        "tonemap_applied": "HDR ({hdr}) erkannt, Tone-Mapping über {method}",
+        "tonemap_unavailable": "HDR ({hdr}) erkannt, aber ffmpeg hat keinen Tone-Mapping-Filter",
+        "extra_outputs": "Zusätzlich:",
+        "compressed_copy": "Komprimierte Kopie",
+        "single_decode_outputs": "Einmal dekodieren, {count} Ausgaben",
         
         # Compress Tab
         "encoder": "Encoder:",
@@ -170,6 +364,24 @@ TRANSLATIONS = {
         "presets": "Voreinstellungen:",
         "idle": "Bereit",
         "compressing": "Komprimiere... ({percent}%)",
+        "auto_crop_deinterlace": "Schwarze Balken und Zeilensprung automatisch erkennen",
+        "analyzing": "Analysiere: {name}",
+        "analysis_filters": "Analyse: {filters}",
+        "stream_policy": "Spuren auswählen und verlustfreies Audio neu kodieren",
+        "keep_languages": "Sprachen behalten",
+        "lossless_audio_to": "Verlustfreies Audio nach",
+        "audio_bitrate": "Audio kbit/s",
+        "subtitles": "Untertitel",
+        "subtitles_all": "Alle",
+        "subtitles_text": "Nur Text",
+        "subtitles_none": "Keine",
+        "drop_commentary": "Kommentarspuren entfernen",
+        "projected_savings": "Spurauswahl spart ca. {size} bei {count} Dateien",
+        "output": "Ausgabe:",
+        "output_file": "Einzelne Datei (MKV)",
+        "output_stream": "HLS/DASH (fMP4-Segmente)",
+        "abr_ladder": "ABR-Stufen",
+        "stream_mode_note": "Jede Stufe nutzt den CRF der Voreinstellung mit eigener Bitraten-Grenze und eine AAC-Stereospur; Zielgröße und Spurauswahl gelten hier nicht.",
         
         # Presets
         "preset_film": "Film - Ausgewogene Kodierungsqualität mit Dateigröße, geeignet für die meisten Filme.",
@@ -0,0 +1,165 @@
+"""Pre-encode crop and interlace analysis for VidoEdit"""
+import json
+import os
+import re
+import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from ffmpeg_utils import get_ffmpeg_path, get_video_stream, probe_media
+
+CACHE_FILE = Path.home() / ".vidoedit" / "analysis_cache.json"
+
+# Black threshold as a share of the range, so it means the same at 8 and 10 bit
+# (an integer limit is taken at the source's bit depth: 24 is ~9.4% only at 8 bit)
+CROP_LIMIT = 0.094
+
+CROP_PATTERN = re.compile(r"crop=(\d+):(\d+):(\d+):(\d+)")
+IDET_PATTERN = re.compile(
+    r"Multi frame detection:\s*TFF:\s*(\d+)\s*BFF:\s*(\d+)\s*Progressive:\s*(\d+)\s*Undetermined:\s*(\d+)"
+)
+
+_cache_lock = threading.Lock()
+
+
+def sample_timestamps(duration, count, window):
+    """Return count start times spread across the file, skipping intro/outro"""
+    if not duration or duration <= window:
+        return [0.0]
+    start = duration * 0.05
+    end = max(duration * 0.95 - window, start)
+    if count <= 1:
+        return [round((start + end) / 2, 2)]
+    step = (end - start) / (count - 1)
+    return [round(start + i * step, 2) for i in range(count)]
+
+
+def analyze_window(input_file, timestamp, window):
+    """Run cropdetect and idet on one window; returns (crop tuple or None, idet counts)"""
+    cmd = [
+        get_ffmpeg_path(), "-hide_banner", "-nostdin",
+        "-ss", str(timestamp), "-t", str(window),
+        "-i", input_file,
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", f"idet,cropdetect=limit={CROP_LIMIT}:round=2:reset=0",
+        "-f", "null", "-",
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except FileNotFoundError:
+        return None, (0, 0, 0, 0)
+    crops = CROP_PATTERN.findall(result.stderr)
+    # cropdetect converges over the window, so the last value is the most stable
+    crop = tuple(int(v) for v in crops[-1]) if crops else None
+    m = None
+    for m in IDET_PATTERN.finditer(result.stderr):
+        pass
+    counts = tuple(int(v) for v in m.groups()) if m else (0, 0, 0, 0)
+    return crop, counts
+
+
+def vote_crop(crops, width, height, min_agreement=0.6):
+    """Return the crop rectangle most windows agree on, or None to keep the full frame"""
+    crops = [c for c in crops if c]
+    if not crops:
+        return None
+    rect, votes = Counter(crops).most_common(1)[0]
+    if votes / len(crops) < min_agreement:
+        return None
+    w, h, _, _ = rect
+    if width and height and (w >= width and h >= height):
+        return None
+    if w <= 0 or h <= 0:
+        return None
+    return rect
+
+
+def vote_field_order(counts, min_ratio=0.5):
+    """Return "tff", "bff" or None (progressive) from summed idet counts"""
+    tff = sum(c[0] for c in counts)
+    bff = sum(c[1] for c in counts)
+    prog = sum(c[2] for c in counts)
+    interlaced = tff + bff
+    if interlaced == 0 or interlaced < (interlaced + prog) * min_ratio:
+        return None
+    return "tff" if tff >= bff else "bff"
+
+
+def build_filters(verdict):
+    """Return the video filters (deinterlace first, then crop) for a verdict"""
+    filters = []
+    if verdict.get("field_order"):
+        parity = verdict["field_order"]
+        filters.append(f"bwdif=mode=send_frame:parity={parity}:deint=all")
+    crop = verdict.get("crop")
+    if crop:
+        w, h, x, y = crop
+        filters.append(f"crop={w}:{h}:{x}:{y}")
+    return filters
+
+
+def _cache_key(input_file):
+    st = os.stat(input_file)
+    return f"{os.path.abspath(input_file)}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def _load_cache():
+    try:
+        with open(CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _store_cache(key, verdict):
+    with _cache_lock:
+        try:
+            cache = _load_cache()
+            cache[key] = verdict
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, CACHE_FILE)
+        except Exception:
+            pass
+
+
+def analyze(input_file, samples=6, window=4.0, workers=None):
+    """Detect a stable crop rectangle and field order for input_file.
+
+    Samples run concurrently; the verdict is cached per (path, size, mtime).
+    Returns {"crop": [w, h, x, y] or None, "field_order": "tff"/"bff"/None}.
+    """
+    try:
+        key = _cache_key(input_file)
+    except OSError:
+        return {"crop": None, "field_order": None}
+    with _cache_lock:
+        cached = _load_cache().get(key)
+    if cached is not None:
+        return cached
+
+    info = probe_media(input_file)
+    stream = get_video_stream(info) or {}
+    try:
+        duration = float(info.get("format", {}).get("duration", 0))
+    except (TypeError, ValueError):
+        duration = 0
+    stamps = sample_timestamps(duration, samples, window)
+    workers = workers or min(len(stamps), os.cpu_count() or 1)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda ts: analyze_window(input_file, ts, window), stamps))
+
+    crop = vote_crop([r[0] for r in results], stream.get("width"), stream.get("height"))
+    verdict = {
+        "crop": list(crop) if crop else None,
+        "field_order": vote_field_order([r[1] for r in results]),
+    }
+    # Don't remember a verdict when every window failed (e.g. ffmpeg missing)
+    if any(r[0] or any(r[1]) for r in results):
+        _store_cache(key, verdict)
+    return verdict